@@ -3,11 +3,13 @@
 Module quản lý assets (hình ảnh template) cho ứng dụng AutoSIC
 """
 import os
+import json
+import threading
 import cv2
 import numpy as np
 import pyautogui
-from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional, Any, Callable
+from dataclasses import dataclass, replace
 
 
 @dataclass
@@ -20,14 +22,128 @@ class AssetInfo:
     is_loaded: bool = False
     file_size: int = 0
     dimensions: Tuple[int, int] = (0, 0)
+    mtime: float = 0.0
+    # Cấu hình detect đọc từ manifest
+    target: str = ""
+    threshold: float = 0.8
+    match_mode: str = "best"
+    dedup_radius: int = 10
+    roi: Optional[Tuple[float, float, float, float]] = None
+    required: bool = True
+    engine: str = "template"
+
+
+# Manifest mặc định, dùng khi thư mục assets chưa có file assets.json
+DEFAULT_ASSET_MANIFEST: Dict[str, Dict[str, Any]] = {
+    "lesson_unfinish": {
+        "file": "Lesson_unfinish_image.png",
+        "description": "Hình ảnh lesson chưa hoàn thành - dùng để detect lessons có thể click",
+        "target": "lesson",
+        "threshold": 0.99,
+        "match_mode": "all",
+        "dedup_radius": 20,
+        "engine": "color"
+    },
+    "lesson_unfinish_bold": {
+        "file": "Lesson_unfinish_bold_image.png",
+        "description": "Hình ảnh lesson chưa hoàn thành (bold) - dùng để detect lessons có thể click",
+        "target": "lesson",
+        "threshold": 0.99,
+        "match_mode": "all",
+        "dedup_radius": 20,
+        "engine": "color"
+    },
+    "play_button": {
+        "file": "Play_button.png",
+        "description": "Nút play video - dùng để detect khi video kết thúc",
+        "threshold": 0.8,
+        "match_mode": "best"
+    },
+    "refresh_button": {
+        "file": "Refresh_page.png",
+        "description": "Nút refresh trang - dùng để reload trang sau khi hoàn thành video",
+        "threshold": 0.8,
+        "match_mode": "best"
+    },
+    "expand_button": {
+        "file": "Expand.png",
+        "description": "Nút expand section - dùng để mở rộng các section có lessons",
+        "threshold": 0.8,
+        "match_mode": "first",
+        "engine": "color"
+    },
+    "video_progress": {
+        "file": "Video_progress.png",
+        "description": "Núm kéo trên thanh tiến độ video - ROI phủ vừa thanh tiến độ để đọc % đã xem",
+        "threshold": 0.8,
+        "match_mode": "best",
+        "required": False
+    },
+    "video_buffering": {
+        "file": "Video_buffering.png",
+        "description": "Icon buffering/loading của player - ROI đặt bằng vùng video (dùng làm vùng theo dõi đứng hình)",
+        "threshold": 0.8,
+        "match_mode": "best",
+        "required": False
+    },
+    "speed_button": {
+        "file": "Speed_button.png",
+        "description": "Nút chọn tốc độ phát của player - dùng để mở menu tốc độ",
+        "threshold": 0.8,
+        "match_mode": "best",
+        "required": False
+    },
+    "speed_option_max": {
+        "file": "Speed_option_max.png",
+        "description": "Lựa chọn tốc độ cao nhất được phép trong menu tốc độ",
+        "threshold": 0.8,
+        "match_mode": "best",
+        "required": False
+    },
+    "speed_active_max": {
+        "file": "Speed_active_max.png",
+        "description": "Nút tốc độ khi đang ở tốc độ cao nhất - dùng để xác nhận đã đặt tốc độ",
+        "threshold": 0.8,
+        "match_mode": "best",
+        "required": False
+    }
+}
+
+# Các chế độ match hợp lệ:
+#   all   - tất cả vị trí khớp, sắp xếp từ trên xuống dưới
+#   first - vị trí khớp trên cùng
+#   best  - vị trí có độ khớp cao nhất (chỉ có 1 element trên màn hình)
+MATCH_MODES = ("all", "first", "best")
+
+# Các engine detect: template matching, đề xuất theo màu rồi xác nhận bằng template matching,
+# hoặc so khớp keypoints/descriptors
+MATCH_ENGINES = ("template", "color", "orb", "akaze")
+
+# Các engine xác nhận vị trí bằng template matching
+TEMPLATE_ENGINES = ("template", "color")
 
 
 class AssetManager:
     """Class quản lý tất cả assets cần thiết cho phần mềm"""
     
+    MANIFEST_FILE = "assets.json"
+    
     def __init__(self, assets_path: str = "Assets"):
         self.assets_path = assets_path
         self.assets: Dict[str, AssetInfo] = {}
+        self.manifest_path = os.path.join(assets_path, self.MANIFEST_FILE)
+        self.manifest_mtime = 0.0
+        self.manifest_invalid = False  # Lần đọc manifest gần nhất bị lỗi (đang dùng cấu hình mặc định)
+        
+        # Thread theo dõi file và UI cùng cập nhật assets: ghi tuần tự qua lock, thread detect chỉ đọc.
+        # AssetInfo đã đăng ký không bị sửa tại chỗ mà được thay bằng bản mới (template, kích thước, cấu hình
+        # đổi cùng lúc), thread detect đang giữ bản cũ vẫn thấy dữ liệu nhất quán
+        self._lock = threading.RLock()
+        
+        # Subscribers nhận thông báo khi asset thay đổi và thread theo dõi file
+        self._subscribers: List[Callable[[str], None]] = []
+        self._watch_stop_event = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
         
         # Định nghĩa các assets cần thiết
         self._define_required_assets()
@@ -36,37 +152,191 @@ class AssetManager:
         self.load_all_assets()
     
     def _define_required_assets(self):
-        """Định nghĩa tất cả assets cần thiết cho ứng dụng"""
-        required_assets = {
-            "lesson_unfinish": {
-                "file_name": "Lesson_unfinish_image.png",
-                "description": "Hình ảnh lesson chưa hoàn thành - dùng để detect lessons có thể click"
-            },
-            "lesson_unfinish_bold": {
-                "file_name": "Lesson_unfinish_bold_image.png",
-                "description": "Hình ảnh lesson chưa hoàn thành (bold) - dùng để detect lessons có thể click"
-            },
-            "play_button": {
-                "file_name": "Play_button.png",
-                "description": "Nút play video - dùng để detect khi video kết thúc"
-            },
-            "refresh_button": {
-                "file_name": "Refresh_page.png",
-                "description": "Nút refresh trang - dùng để reload trang sau khi hoàn thành video"
-            },
-            "expand_button": {
-                "file_name": "Expand.png",
-                "description": "Nút expand section - dùng để mở rộng các section có lessons"
-            }
-        }
-        
-        for asset_key, asset_data in required_assets.items():
-            file_path = os.path.join(self.assets_path, asset_data["file_name"])
+        """Định nghĩa tất cả assets cần thiết cho ứng dụng từ manifest"""
+        for asset_key, asset_data in self._read_manifest().items():
             self.assets[asset_key] = AssetInfo(
                 name=asset_key,
-                file_path=file_path,
-                description=asset_data["description"]
+                file_path=os.path.join(self.assets_path, asset_data["file"]),
+                description=asset_data.get("description", "")
             )
+            self._apply_asset_config(self.assets[asset_key], asset_data)
+    
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Đọc manifest assets.json, dùng manifest mặc định nếu không có hoặc bị lỗi
+        
+        Returns:
+            Dictionary asset_key -> cấu hình asset
+        """
+        self.manifest_invalid = False
+        if not os.path.exists(self.manifest_path):
+            return DEFAULT_ASSET_MANIFEST
+        
+        try:
+            self.manifest_mtime = os.path.getmtime(self.manifest_path)
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            
+            assets = manifest["assets"]
+            for asset_key, asset_data in assets.items():
+                if "file" not in asset_data:
+                    raise ValueError(f"asset '{asset_key}' thiếu 'file'")
+                if asset_data.get("match_mode", "best") not in MATCH_MODES:
+                    raise ValueError(f"asset '{asset_key}' có match_mode không hợp lệ")
+                if asset_data.get("engine", "template") not in MATCH_ENGINES:
+                    raise ValueError(f"asset '{asset_key}' có engine không hợp lệ")
+            return assets
+        
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"❌ Manifest {self.manifest_path} không hợp lệ ({str(e)}), dùng cấu hình mặc định")
+            self.manifest_invalid = True
+            return DEFAULT_ASSET_MANIFEST
+    
+    @staticmethod
+    def _apply_asset_config(asset_info: AssetInfo, asset_data: Dict[str, Any]):
+        """Gán cấu hình detect từ manifest vào AssetInfo"""
+        roi = asset_data.get("roi")
+        asset_info.target = asset_data.get("target") or asset_info.name
+        asset_info.threshold = float(asset_data.get("threshold", 0.8))
+        asset_info.match_mode = asset_data.get("match_mode", "best")
+        asset_info.dedup_radius = int(asset_data.get("dedup_radius", 10))
+        asset_info.roi = tuple(roi) if roi else None
+        asset_info.required = bool(asset_data.get("required", True))
+        asset_info.engine = asset_data.get("engine", "template")
+    
+    def reload_manifest(self) -> List[str]:
+        """
+        Đọc lại manifest và cập nhật cấu hình detect của assets
+        
+        Asset không còn trong manifest bị gỡ bỏ (trừ khi manifest đang lỗi và phải dùng cấu hình mặc định).
+        
+        Returns:
+            List các asset key có thay đổi (kể cả asset bị gỡ bỏ)
+        """
+        changed = []
+        
+        with self._lock:
+            manifest = self._read_manifest()
+            # Dựng dict mới rồi thay một lần: thread detect đang duyệt self.assets không thấy dict đổi kích thước
+            assets = dict(self.assets)
+            for asset_key, asset_data in manifest.items():
+                file_path = os.path.join(self.assets_path, asset_data["file"])
+                asset_info = assets.get(asset_key)
+            
+                if asset_info is None or asset_info.file_path != file_path:
+                    asset_info = AssetInfo(name=asset_key, file_path=file_path,
+                                           description=asset_data.get("description", ""))
+                    self._apply_asset_config(asset_info, asset_data)
+                    self._load_into(asset_key, asset_info)
+                else:
+                    asset_info = replace(asset_info, description=asset_data.get("description", asset_info.description))
+                    self._apply_asset_config(asset_info, asset_data)
+                assets[asset_key] = asset_info
+                changed.append(asset_key)
+            
+            if not self.manifest_invalid:
+                for asset_key in [key for key in assets if key not in manifest]:
+                    del assets[asset_key]
+                    print(f"🗑️ Đã gỡ asset '{asset_key}' (không còn trong manifest)")
+                    changed.append(asset_key)
+            self.assets = assets
+        
+        for asset_key in changed:
+            self._notify_asset_changed(asset_key)
+        
+        return changed
+    
+    def get_manifest(self) -> Dict[str, Any]:
+        """
+        Tạo manifest từ cấu hình hiện tại của assets
+        
+        Returns:
+            Dictionary theo định dạng của assets.json
+        """
+        assets = {}
+        for asset_key, asset_info in self.assets.items():
+            asset_data = {
+                "file": os.path.relpath(asset_info.file_path, self.assets_path),
+                "description": asset_info.description,
+                "threshold": asset_info.threshold,
+                "match_mode": asset_info.match_mode,
+                "dedup_radius": asset_info.dedup_radius,
+                "roi": list(asset_info.roi) if asset_info.roi else None
+            }
+            if asset_info.target != asset_key:
+                asset_data["target"] = asset_info.target
+            if not asset_info.required:
+                asset_data["required"] = False
+            if asset_info.engine != "template":
+                asset_data["engine"] = asset_info.engine
+            assets[asset_key] = asset_data
+        
+        return {"version": 1, "assets": assets}
+    
+    def update_asset_config(self, asset_key: str, **config) -> bool:
+        """
+        Cập nhật cấu hình detect của một asset (threshold, match_mode, roi, ...)
+        
+        Args:
+            asset_key: Key của asset
+            **config: Các trường cấu hình cần cập nhật
+        
+        Returns:
+            bool: True nếu cập nhật thành công
+        """
+        with self._lock:
+            if asset_key not in self.assets:
+                return False
+        
+            asset_data = self.get_manifest()["assets"][asset_key]
+            asset_data.update(config)
+            asset_info = replace(self.assets[asset_key])
+            self._apply_asset_config(asset_info, asset_data)
+            self.assets[asset_key] = asset_info
+        self._notify_asset_changed(asset_key)
+        return True
+    
+    def save_manifest(self) -> bool:
+        """
+        Ghi cấu hình hiện tại ra assets.json
+        
+        Returns:
+            bool: True nếu ghi thành công
+        """
+        try:
+            with open(self.manifest_path, "w", encoding="utf-8") as f:
+                json.dump(self.get_manifest(), f, ensure_ascii=False, indent=2)
+                f.write("\n")
+            self.manifest_mtime = os.path.getmtime(self.manifest_path)
+            return True
+        except OSError as e:
+            print(f"❌ Lỗi khi ghi manifest: {str(e)}")
+            return False
+    
+    def get_targets(self) -> List[str]:
+        """
+        Lấy danh sách các target (nhóm assets cùng detect một đối tượng)
+        
+        Returns:
+            List tên target theo thứ tự trong manifest
+        """
+        targets = []
+        for asset_info in self.assets.values():
+            if asset_info.target not in targets:
+                targets.append(asset_info.target)
+        return targets
+    
+    def get_target_assets(self, target: str) -> List[AssetInfo]:
+        """
+        Lấy các assets (variants) thuộc một target
+        
+        Args:
+            target: Tên target
+        
+        Returns:
+            List AssetInfo thuộc target
+        """
+        return [asset_info for asset_info in self.assets.values() if asset_info.target == target]
     
     def load_all_assets(self) -> bool:
         """
@@ -78,7 +348,7 @@ class AssetManager:
         all_loaded = True
         
         for asset_key, asset_info in self.assets.items():
-            if not self.load_asset(asset_key):
+            if not self.load_asset(asset_key) and asset_info.required:
                 all_loaded = False
         
         return all_loaded
@@ -93,21 +363,40 @@ class AssetManager:
         Returns:
             bool: True nếu load thành công, False nếu có lỗi
         """
-        if asset_key not in self.assets:
-            print(f"❌ Asset key '{asset_key}' không tồn tại")
-            return False
+        with self._lock:
+            if asset_key not in self.assets:
+                print(f"❌ Asset key '{asset_key}' không tồn tại")
+                return False
         
-        asset_info = self.assets[asset_key]
+            asset_info = replace(self.assets[asset_key])
+            loaded = self._load_into(asset_key, asset_info)
+            self.assets[asset_key] = asset_info
+            return loaded
+        
+    def _load_into(self, asset_key: str, asset_info: AssetInfo) -> bool:
+        """
+        Đọc file template vào một AssetInfo chưa đăng ký (bản mới sẽ thay bản cũ trong self.assets)
         
+        Args:
+            asset_key: Key của asset (dùng trong log)
+            asset_info: AssetInfo cần load
+        
+        Returns:
+            bool: True nếu load thành công
+        """
         try:
             # Kiểm tra file tồn tại
             if not os.path.exists(asset_info.file_path):
-                print(f"❌ Không tìm thấy file: {asset_info.file_path}")
+                if asset_info.required:
+                    print(f"❌ Không tìm thấy file: {asset_info.file_path}")
+                else:
+                    print(f"ℹ️ Asset tùy chọn '{asset_key}' chưa có file: {asset_info.file_path}")
                 asset_info.is_loaded = False
                 return False
             
             # Lấy thông tin file
             asset_info.file_size = os.path.getsize(asset_info.file_path)
+            asset_info.mtime = os.path.getmtime(asset_info.file_path)
             
             # Load template
             template = cv2.imread(asset_info.file_path)
@@ -180,7 +469,8 @@ class AssetManager:
                 'loaded': asset_info.is_loaded,
                 'file_size': asset_info.file_size,
                 'width': asset_info.dimensions[0] if asset_info.dimensions else 0,
-                'height': asset_info.dimensions[1] if asset_info.dimensions else 0
+                'height': asset_info.dimensions[1] if asset_info.dimensions else 0,
+                'threshold': asset_info.threshold
             }
         
         return assets_info
@@ -195,24 +485,26 @@ class AssetManager:
         Returns:
             bool: True nếu reload thành công
         """
-        if asset_key not in self.assets:
-            return False
-        
-        asset_info = self.assets[asset_key]
+        with self._lock:
+            if asset_key not in self.assets:
+                return False
+            asset_info = self.assets[asset_key]
         
         try:
             # Load lại template
             if os.path.exists(asset_info.file_path):
                 template = cv2.imread(asset_info.file_path)
                 if template is not None:
-                    asset_info.template = template
-                    asset_info.is_loaded = True
-                    
-                    # Cập nhật thông tin file
-                    asset_info.file_size = os.path.getsize(asset_info.file_path)
-                    asset_info.dimensions = (template.shape[1], template.shape[0])
+                    # Template, kích thước và thông tin file đổi cùng lúc bằng cách thay AssetInfo mới
+                    with self._lock:
+                        self.assets[asset_key] = replace(
+                            self.assets.get(asset_key, asset_info), template=template, is_loaded=True,
+                            file_size=os.path.getsize(asset_info.file_path),
+                            mtime=os.path.getmtime(asset_info.file_path),
+                            dimensions=(template.shape[1], template.shape[0]))
                     
                     print(f"✅ Đã reload asset '{asset_key}' thành công")
+                    self._notify_asset_changed(asset_key)
                     return True
                 else:
                     asset_info.is_loaded = False
@@ -237,12 +529,100 @@ class AssetManager:
         """
         print("🔄 Đang reload tất cả assets...")
         
-        # Reset trạng thái
+        # Mỗi asset được load vào bản AssetInfo mới rồi thay bản cũ (không reset tại chỗ khi đang detect)
+        success = self.load_all_assets()
+        
+        for asset_key in self.assets:
+            self._notify_asset_changed(asset_key)
+        
+        return success
+    
+    def subscribe(self, callback: Callable[[str], None]):
+        """
+        Đăng ký nhận thông báo khi một asset thay đổi
+        
+        Args:
+            callback: Hàm nhận asset_key của asset vừa thay đổi
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[str], None]):
+        """Hủy đăng ký nhận thông báo thay đổi asset"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def _notify_asset_changed(self, asset_key: str):
+        """Gửi thông báo asset thay đổi tới tất cả subscribers"""
+        for callback in list(self._subscribers):
+            try:
+                callback(asset_key)
+            except Exception as e:
+                print(f"❌ Lỗi trong subscriber của asset '{asset_key}': {str(e)}")
+    
+    def check_for_changes(self) -> List[str]:
+        """
+        Kiểm tra file của các assets có thay đổi (mtime/size) và reload nếu có
+        
+        Returns:
+            List các asset key đã được reload
+        """
+        changed = []
+        
+        # Manifest thay đổi thì cập nhật cấu hình detect
+        try:
+            if os.path.getmtime(self.manifest_path) != self.manifest_mtime:
+                print("🔄 Phát hiện manifest assets đã thay đổi")
+                self.reload_manifest()
+        except OSError:
+            pass
+        
+        for asset_key, asset_info in list(self.assets.items()):
+            try:
+                stat = os.stat(asset_info.file_path)
+            except OSError:
+                continue
+            
+            if stat.st_mtime != asset_info.mtime or stat.st_size != asset_info.file_size:
+                print(f"🔄 Phát hiện file của asset '{asset_key}' đã thay đổi")
+                if self.reload_asset(asset_key):
+                    changed.append(asset_key)
+                else:
+                    # Ghi nhận mtime để không reload lỗi liên tục khi file đang ghi dở
+                    asset_info.mtime = stat.st_mtime
+        
+        return changed
+    
+    def start_watching(self, interval: float = 2.0):
+        """
+        Bắt đầu thread theo dõi thay đổi file assets (polling mtime)
+        
+        Args:
+            interval: Chu kỳ kiểm tra (giây)
+        """
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+        
+        stop_event = threading.Event()
+        self._watch_stop_event = stop_event
+        
+        def watch_loop():
+            while not stop_event.wait(interval):
+                self.check_for_changes()
+        
+        self._watch_thread = threading.Thread(target=watch_loop, daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self):
+        """Dừng thread theo dõi thay đổi file assets"""
+        self._watch_stop_event.set()
+        self._watch_thread = None
+    
+    def unload_all_assets(self):
+        """Giải phóng tất cả templates đã load"""
         for asset_info in self.assets.values():
-            asset_info.is_loaded = False
             asset_info.template = None
-        
-        return self.load_all_assets()
+            asset_info.is_loaded = False
     
     def validate_assets(self) -> Dict[str, bool]:
         """
@@ -270,11 +650,23 @@ class AssetManager:
         Returns:
             String tóm tắt trạng thái
         """
-        total_assets = len(self.assets)
-        loaded_assets = sum(1 for asset in self.assets.values() if asset.is_loaded)
-        total_size = sum(asset.file_size for asset in self.assets.values() if asset.is_loaded)
+        status = self.get_assets_status()
         
-        return f"Assets: {loaded_assets}/{total_assets} loaded, Total size: {total_size} bytes"
+        return f"Assets: {status['loaded']}/{status['total']} loaded, Total size: {status['total_size']} bytes"
+    
+    def get_assets_status(self) -> Dict[str, Any]:
+        """
+        Lấy trạng thái load của assets dưới dạng có cấu trúc
+        
+        Returns:
+            Dictionary gồm total, loaded, total_size và trạng thái từng asset
+        """
+        return {
+            'total': len(self.assets),
+            'loaded': sum(1 for asset in self.assets.values() if asset.is_loaded),
+            'total_size': sum(asset.file_size for asset in self.assets.values() if asset.is_loaded),
+            'assets': {key: asset.is_loaded for key, asset in self.assets.items()}
+        }
     
     def _get_screenshot(self) -> np.ndarray:
         """
@@ -465,3 +857,52 @@ class AssetManager:
             stats[asset_key] = result["matches_found"] if result["success"] else 0
         
         return stats
+
+
+# Registry AssetManager dùng chung trong process theo thư mục assets: key -> [manager, số tham chiếu]
+_shared_asset_managers: Dict[str, List[Any]] = {}
+_shared_asset_managers_lock = threading.Lock()
+
+
+def acquire_asset_manager(assets_path: str = "Assets") -> AssetManager:
+    """
+    Lấy AssetManager dùng chung cho thư mục assets và tăng số tham chiếu
+    
+    Lần lấy đầu tiên sẽ load assets và bật theo dõi thay đổi file.
+    Mỗi lần acquire cần một lần release_asset_manager tương ứng.
+    
+    Args:
+        assets_path: Đường dẫn thư mục assets
+    
+    Returns:
+        AssetManager dùng chung
+    """
+    key = os.path.abspath(assets_path)
+    with _shared_asset_managers_lock:
+        entry = _shared_asset_managers.get(key)
+        if entry is None:
+            manager = AssetManager(assets_path)
+            manager.start_watching()
+            entry = [manager, 0]
+            _shared_asset_managers[key] = entry
+        entry[1] += 1
+        return entry[0]
+
+
+def release_asset_manager(manager: AssetManager):
+    """
+    Giảm số tham chiếu của AssetManager dùng chung, giải phóng templates khi không còn ai dùng
+    
+    Args:
+        manager: AssetManager đã lấy từ acquire_asset_manager
+    """
+    key = os.path.abspath(manager.assets_path)
+    with _shared_asset_managers_lock:
+        entry = _shared_asset_managers.get(key)
+        if entry is None or entry[0] is not manager:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _shared_asset_managers[key]
+            manager.stop_watching()
+            manager.unload_all_assets()
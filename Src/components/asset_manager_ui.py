@@ -8,16 +8,20 @@ from PIL import Image, ImageTk
 import os
 import shutil
 from typing import Dict, Optional, Callable
-from .asset_manager import AssetManager
+from .asset_manager import AssetManager, acquire_asset_manager, release_asset_manager
+from .threshold_calibrator import ThresholdCalibrator
 
 
 class AssetManagerWindow:
     """Cửa sổ quản lý assets"""
     
-    def __init__(self, parent: tk.Tk, assets_path: str = "Assets"):
+    def __init__(self, parent: tk.Tk, assets_path: str = "Assets",
+                 asset_manager: Optional[AssetManager] = None):
         self.parent = parent
         self.assets_path = assets_path
-        self.asset_manager = AssetManager(assets_path)
+        self._owns_asset_manager = asset_manager is None
+        self.asset_manager = asset_manager or acquire_asset_manager(assets_path)
+        self.calibrator = ThresholdCalibrator(self.asset_manager)
         
         # Tạo cửa sổ mới
         self.window = tk.Toplevel(parent)
@@ -29,6 +33,26 @@ class AssetManagerWindow:
         
         # Callbacks
         self.on_asset_updated: Optional[Callable] = None
+        
+        # Nhận thông báo khi asset thay đổi (ví dụ file bị thay thế từ bên ngoài)
+        self.asset_manager.subscribe(self._on_asset_changed)
+        self.window.bind("<Destroy>", self._on_window_destroyed)
+    
+    def _on_asset_changed(self, asset_key: str):
+        """Refresh danh sách assets khi có thay đổi (có thể được gọi từ thread theo dõi file)"""
+        try:
+            self.window.after(0, self.load_assets_list)
+        except (tk.TclError, RuntimeError):
+            pass
+    
+    def _on_window_destroyed(self, event):
+        """Hủy đăng ký nhận thông báo khi đóng cửa sổ"""
+        if event.widget is not self.window:
+            return
+        self.asset_manager.unsubscribe(self._on_asset_changed)
+        if self._owns_asset_manager:
+            release_asset_manager(self.asset_manager)
+            self._owns_asset_manager = False
     
     def setup_window(self):
         """Thiết lập cửa sổ Asset Manager"""
@@ -113,6 +137,11 @@ class AssetManagerWindow:
         self.dimensions_label = ttk.Label(info_frame, text="")
         self.dimensions_label.grid(row=2, column=1, sticky=tk.W)
         
+        # Threshold
+        ttk.Label(info_frame, text="Threshold:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10))
+        self.threshold_label = ttk.Label(info_frame, text="")
+        self.threshold_label.grid(row=3, column=1, sticky=tk.W)
+        
         # Image preview frame
         preview_frame = ttk.LabelFrame(right_frame, text="Xem trước", padding="5")
         preview_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -133,6 +162,24 @@ class AssetManagerWindow:
         # Test result label
         self.test_result_label = ttk.Label(test_frame, text="")
         self.test_result_label.pack(side=tk.LEFT)
+        
+        # Calibration frame
+        calibration_frame = ttk.LabelFrame(right_frame, text="Hiệu chỉnh Threshold", padding="5")
+        calibration_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        # Nút lưu frame mẫu (chụp màn hình hiện tại)
+        ttk.Button(calibration_frame, text="Lưu frame có asset",
+                   command=lambda: self.save_calibration_frame("positive")).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(calibration_frame, text="Lưu frame không có asset",
+                   command=lambda: self.save_calibration_frame("negative")).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Calibrate button
+        ttk.Button(calibration_frame, text="Hiệu chỉnh",
+                   command=self.calibrate_current_asset).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Số frame mẫu đã lưu
+        self.calibration_label = ttk.Label(calibration_frame, text="")
+        self.calibration_label.pack(side=tk.LEFT)
     
     def _setup_actions_panel(self, parent):
         """Thiết lập panel hành động"""
@@ -220,6 +267,9 @@ class AssetManagerWindow:
             self.replace_button.config(state=tk.DISABLED)
             self.clear_image_preview()
         
+        self.threshold_label.config(text=str(info['threshold']))
+        self.update_calibration_label(asset_key)
+        
         # Clear test result
         self.test_result_label.config(text="")
     
@@ -228,6 +278,8 @@ class AssetManagerWindow:
         self.asset_key_label.config(text="")
         self.file_path_label.config(text="")
         self.dimensions_label.config(text="")
+        self.threshold_label.config(text="")
+        self.calibration_label.config(text="")
         self.replace_button.config(state=tk.DISABLED)
         self.test_result_label.config(text="")
         self.clear_image_preview()
@@ -304,9 +356,8 @@ class AssetManagerWindow:
                 shutil.copy2(old_file, backup_path)
                 print(f"Đã backup file cũ: {backup_path}")
             
-            # Copy file mới
-            new_file_path = os.path.join(self.assets_path, 
-                                       self.asset_manager.asset_files[asset_key])
+            # Copy file mới đè lên file của asset
+            new_file_path = old_file
             shutil.copy2(file_path, new_file_path)
             
             # Reload asset
@@ -359,6 +410,76 @@ class AssetManagerWindow:
                 foreground="red"
             )
     
+    def update_calibration_label(self, asset_key: str):
+        """Hiển thị số frame mẫu đã lưu của asset"""
+        counts = self.calibrator.count_frames(asset_key)
+        self.calibration_label.config(text=f"Frames: {counts['positive']} có / {counts['negative']} không")
+    
+    def save_calibration_frame(self, label: str):
+        """
+        Chụp màn hình hiện tại làm frame mẫu cho asset đang chọn
+        
+        Args:
+            label: "positive" nếu asset đang hiển thị trên màn hình, "negative" nếu không
+        """
+        selection = self.assets_tree.selection()
+        if not selection:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn một asset")
+            return
+        
+        asset_key = self.assets_tree.item(selection[0], "text")
+        
+        # Ẩn cửa sổ Asset Manager để không bị chụp vào frame
+        self.window.withdraw()
+        self.window.after(300, lambda: self._capture_calibration_frame(asset_key, label))
+    
+    def _capture_calibration_frame(self, asset_key: str, label: str):
+        """Chụp và lưu frame mẫu sau khi đã ẩn cửa sổ"""
+        try:
+            file_path = self.calibrator.save_frame(asset_key, label)
+            print(f"📸 Đã lưu frame mẫu: {file_path}")
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Lỗi khi lưu frame mẫu: {str(e)}")
+        finally:
+            self.window.deiconify()
+        
+        self.update_calibration_label(asset_key)
+    
+    def calibrate_current_asset(self):
+        """Hiệu chỉnh threshold của asset đang chọn từ các frame mẫu"""
+        selection = self.assets_tree.selection()
+        if not selection:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn một asset")
+            return
+        
+        asset_key = self.assets_tree.item(selection[0], "text")
+        
+        try:
+            result = self.calibrator.calibrate_asset(asset_key)
+            if not result['success']:
+                messagebox.showwarning("Cảnh báo", result['error'])
+                return
+            
+            total = result['positives'] + result['negatives']
+            message = f"Asset: {asset_key}\n"
+            message += f"- Frames: {result['positives']} có / {result['negatives']} không\n"
+            message += f"- Độ khớp thấp nhất khi có asset: {result['min_positive']:.3f}\n"
+            message += f"- Độ khớp cao nhất khi không có asset: {result['max_negative']:.3f}\n"
+            message += f"- Threshold: {result['current_threshold']} → {result['threshold']}\n"
+            message += f"- Margin: {result['margin']:.3f}, phân loại sai: {result['errors']}/{total}\n\n"
+            message += "Áp dụng threshold mới vào assets.json?"
+            
+            if messagebox.askyesno("Kết quả hiệu chỉnh", message):
+                if self.calibrator.apply(result):
+                    self.display_asset_details(asset_key)
+                    if self.on_asset_updated:
+                        self.on_asset_updated(asset_key)
+                else:
+                    messagebox.showerror("Lỗi", "Không thể ghi threshold vào assets.json")
+        
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Lỗi khi hiệu chỉnh threshold: {str(e)}")
+    
     def test_all_assets(self):
         """Test detect tất cả assets"""
         try:
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Module chạy các phiên AutomationCore trên một asyncio event loop
+"""
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Callable
+from components.automation_core import AutomationCore
+
+
+class AsyncAutomationRunner:
+    """Class điều phối nhiều phiên automation: đợi bằng await, detect/click chạy trong executor của từng phiên"""
+    
+    def __init__(self):
+        # Mỗi phiên một thread: initial_step / poll_step còn đợi (trang tải, click, refresh) bên trong,
+        # dùng chung pool cố định thì các phiên vượt quá số worker phải xếp hàng
+        self.executors: Dict[str, ThreadPoolExecutor] = {}
+        self.sessions: Dict[str, AutomationCore] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        
+        # Callback khi một phiên kết thúc (tên phiên)
+        self.on_session_finished: Optional[Callable[[str], None]] = None
+    
+    def set_session_finished_callback(self, callback: Callable[[str], None]):
+        """Thiết lập callback khi một phiên automation kết thúc"""
+        self.on_session_finished = callback
+    
+    def add_session(self, name: str, automation: AutomationCore):
+        """
+        Thêm một phiên automation
+        
+        Args:
+            name: Tên phiên (ví dụ tên màn hình/cửa sổ)
+            automation: AutomationCore của phiên
+        """
+        self.sessions[name] = automation
+        if name not in self.executors:
+            self.executors[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"autosic-{name}")
+    
+    async def run_session(self, name: str):
+        """
+        Chạy một phiên: bước khởi tạo rồi lặp kiểm tra video cho đến khi bị dừng
+        
+        Args:
+            name: Tên phiên
+        """
+        automation = self.sessions[name]
+        executor = self.executors[name]
+        loop = asyncio.get_running_loop()
+        automation.begin_run()
+        automation._log(f"Bắt đầu automation (phiên {name})")
+        
+        try:
+            if await loop.run_in_executor(executor, automation.initial_step):
+                while automation.is_running:
+                    delay = await loop.run_in_executor(executor, automation.poll_step)
+                    if delay is None:
+                        break
+                    # Đợi bằng await: không tốn CPU và bị hủy ngay khi dừng phiên
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            automation._log(f"Dừng automation (phiên {name})")
+            raise
+        except Exception as e:
+            automation._log(f"Lỗi trong automation (phiên {name}): {str(e)}")
+            automation.dump_flight_recorder("exception", traceback.format_exc())
+        finally:
+            automation.request_stop()
+            if self.tasks.get(name) is asyncio.current_task():
+                del self.tasks[name]
+            if self.on_session_finished:
+                self.on_session_finished(name)
+    
+    def start_session(self, name: str) -> asyncio.Task:
+        """
+        Tạo task chạy phiên trên event loop hiện tại (gọi từ trong event loop)
+        
+        Args:
+            name: Tên phiên
+        
+        Returns:
+            asyncio.Task của phiên
+        """
+        task = self.tasks.get(name)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self.run_session(name))
+            self.tasks[name] = task
+        return task
+    
+    def stop_session(self, name: str):
+        """
+        Dừng một phiên ngay lập tức (gọi được từ bất kỳ thread nào)
+        
+        Args:
+            name: Tên phiên
+        """
+        automation = self.sessions.get(name)
+        if automation:
+            # Set stop event trước để bước đang chạy trong executor thoát khỏi các lần đợi
+            automation.request_stop()
+        
+        task = self.tasks.get(name)
+        if task is not None and self.loop is not None:
+            self.loop.call_soon_threadsafe(task.cancel)
+    
+    async def run(self):
+        """Chạy tất cả các phiên và đợi đến khi tất cả kết thúc"""
+        self.loop = asyncio.get_running_loop()
+        tasks = [self.start_session(name) for name in self.sessions]
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def start_background(self):
+        """Chạy event loop trên một thread nền để dùng runner từ code đồng bộ (Tkinter, headless)"""
+        if self._loop_thread and self._loop_thread.is_alive():
+            return
+        
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._loop_thread.start()
+    
+    def submit_session(self, name: str):
+        """
+        Bắt đầu một phiên trên event loop nền (gọi được từ bất kỳ thread nào)
+        
+        Args:
+            name: Tên phiên
+        """
+        if self.loop is None:
+            self.start_background()
+        self.loop.call_soon_threadsafe(self.start_session, name)
+    
+    def stop(self):
+        """Dừng tất cả các phiên"""
+        for name in list(self.sessions):
+            self.stop_session(name)
+    
+    async def _cancel_all(self):
+        """Hủy và đợi tất cả các task phiên kết thúc"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def shutdown(self):
+        """Dừng tất cả các phiên, event loop nền và executor của các phiên"""
+        self.stop()
+        if self.loop is not None and self._loop_thread is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_all(), self.loop).result(timeout=3.0)
+            except Exception as e:
+                print(f"⚠️ Không dừng được các phiên automation: {str(e)}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loop_thread.join(timeout=3.0)
+            self._loop_thread = None
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
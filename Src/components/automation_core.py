@@ -2,11 +2,23 @@
 """
 Module automation core chứa logic tự động hóa chính
 """
+import os
 import pyautogui
 import time
 import threading
-from typing import Tuple, Optional, Callable
+import traceback
+import numpy as np
+from typing import Dict, Any, Tuple, Optional, Callable
 from components.image_detector import ImageDetector
+from components.capture_pipeline import CapturePipeline
+from components.input_queue import InputQueue
+from components.flight_recorder import FlightRecorder
+from components.video_scheduler import VideoScheduler
+from components.playback_speed import PlaybackSpeedMemory
+from components.stall_detector import StallDetector
+from components.screen_state_index import ScreenStateIndex
+from components.click_verifier import ClickVerifier
+from components.scroll_calibrator import ScrollCalibrator
 
 
 class AutomationCore:
@@ -16,16 +28,97 @@ class AutomationCore:
     SCROLL_X_PERCENT = 0.15  # 15% chiều rộng màn hình cho vị trí scroll
     SCROLL_Y_PERCENT = 0.50  # 50% chiều cao màn hình cho vị trí scroll
     
-    def __init__(self):
-        self.image_detector = ImageDetector()
+    POLL_INTERVAL = 60.0  # Thời gian đợi giữa hai lần kiểm tra video khi chưa dự đoán được thời điểm kết thúc (giây)
+    PREFETCH_MAX_AGE = 30.0  # Kết quả tìm trước cũ hơn mức này được tìm lại ở lần kiểm tra video sau (giây)
+    
+    # Cách xử lý màn hình lạ: đợi rồi kiểm tra lại, refresh trang, coi là màn hình bình thường, dừng automation
+    UNKNOWN_SCREEN_ACTIONS = ("wait", "refresh", "learn", "stop")
+    UNKNOWN_RETRY_DELAY = 15.0  # Thời gian đợi trước khi kiểm tra lại màn hình lạ (giây)
+    
+    DEFAULT_COURSE = "default"  # Khóa học khi chưa đặt tên (lịch sử dùng chung cho mọi khóa học)
+    
+    # Khôi phục video đứng hình: chỉ khi có dấu hiệu treo (tiến độ không tăng, icon buffering),
+    # cả khi chỉ thấy hình đứng yên, hoặc tắt hẳn
+    STALL_RECOVERY_MODES = ("evidence", "always", "off")
+    
+    def __init__(self, assets_path: str = "Assets", image_detector: Optional[ImageDetector] = None,
+                 region: Optional[Tuple[int, int, int, int]] = None,
+                 input_queue: Optional[InputQueue] = None,
+                 frame_source: Optional[Callable[[], np.ndarray]] = None,
+                 name: str = "main", course: Optional[str] = None,
+                 video_roi: Optional[Tuple[float, float, float, float]] = None):
+        """
+        Args:
+            assets_path: Thư mục chứa assets
+            image_detector: ImageDetector dùng chung giữa nhiều phiên (None = tạo mới)
+            region: Vùng màn hình (x, y, width, height) của cửa sổ khóa học, None = toàn màn hình
+            input_queue: Hàng đợi thao tác chuột dùng chung (None = tạo hàng đợi riêng)
+            frame_source: Function trả về frame toàn màn hình dùng chung (None = detector tự chụp)
+            name: Tên phiên (dùng khi nhiều phiên chạy cùng lúc)
+            course: Tên khóa học đang chạy (lịch sử độ dài lesson, vị trí nút tốc độ lưu theo khóa học),
+                    None = DEFAULT_COURSE
+            video_roi: Vùng video (x, y, width, height theo tỉ lệ vùng của phiên) dùng để phát hiện đứng hình,
+                       None = ROI của asset 'video_buffering' nếu có, không thì StallDetector.VIDEO_ROI
+        """
+        self._owns_image_detector = image_detector is None
+        self.image_detector = image_detector or ImageDetector(assets_path)
+        self.region = region
+        # Mọi thao tác chuột đi qua hàng đợi (thread riêng, có motion profile)
+        self._owns_input_queue = input_queue is None
+        self.input_queue = input_queue or InputQueue()
+        self.frame_source = frame_source
+        self.name = name
+        self.course = (course or "").strip() or self.DEFAULT_COURSE
         self.is_running = False
         self.auto_thread = None
+        # Event dừng: mọi lần đợi đều thoát ngay khi được set, không cần vòng lặp sleep ngắn
+        self._stop_event = threading.Event()
+        
+        # Giữ các frame và quyết định gần nhất trong bộ nhớ, chỉ ghi đĩa khi bị lặp hoặc gặp lỗi
+        self.flight_recorder = FlightRecorder()
+        
+        # Dự đoán thời điểm video kết thúc để ngủ đến ngay trước đó rồi kiểm tra dày
+        self.video_scheduler = VideoScheduler(course=self.course, default_interval=self.POLL_INTERVAL)
+        
+        # Lesson tiếp theo (hoặc expand button) tìm trước trong lúc video đang phát, theo tọa độ trong region
+        self._prefetched: Optional[Dict[str, Any]] = None
+        self.prefetch_stats = {'scans': 0, 'hits': 0, 'misses': 0}
+        
+        # Nhớ vị trí nút tốc độ theo khóa học để đặt tốc độ phát cao nhất sau mỗi lần click lesson
+        self.playback_speed = PlaybackSpeedMemory(course=self.course)
+        self.maximize_speed = True
+        
+        # Phát hiện video đứng hình (treo/buffering) giữa các lần kiểm tra và leo thang hành động khôi phục
+        self.stall_detector = StallDetector(video_roi=video_roi or self._asset_video_roi())
+        self.stall_recovery = "evidence"
+        
+        # Fingerprint các màn hình đã gặp khi chạy bình thường (bỏ qua vùng video) để nhận ra màn hình lạ
+        # (modal, hết phiên đăng nhập, quiz) ngay trong một tick thay vì scroll tìm mù
+        self.screen_states = ScreenStateIndex(os.path.join("Data", f"screen_states_{name}.npz"),
+                                              ignore_roi=self.stall_detector.video_roi)
+        self.unknown_screen_action = "wait"
+        
+        # Xác nhận click lesson đã mở được video, click lại ngay nếu không thấy trang thay đổi
+        self.click_verifier = ClickVerifier()
+        self._screen_match: Optional[Dict[str, Any]] = None
+        self._unknown_since: Optional[float] = None
+        # Đã refresh trang do màn hình lạ: poll_step tìm lại lesson từ đầu ở lần kiểm tra tiếp theo
+        self._search_pending = False
+        
+        # Đo số pixel outline dịch chuyển mỗi đơn vị scroll để scroll đúng một trang mỗi lần
+        self.scroll_calibrator = ScrollCalibrator(name=name)
+        
+        # Pipeline chụp/detect chạy nền (tùy chọn, bật bằng enable_capture_pipeline)
+        self.capture_pipeline: Optional[CapturePipeline] = None
+        self._last_play_sequence = 0
         
         # Callbacks
         self.on_log_message: Optional[Callable] = None
         self.on_stats_update: Optional[Callable] = None
         self.on_step_update: Optional[Callable] = None
         self.on_loop_check: Optional[Callable] = None
+        self.on_metric: Optional[Callable] = None
+        self.on_unknown_screen: Optional[Callable] = None
     
     def set_log_callback(self, callback: Callable):
         """Thiết lập callback cho logging"""
@@ -43,8 +136,542 @@ class AutomationCore:
         """Thiết lập callback cho kiểm tra loop"""
         self.on_loop_check = callback
     
+    def set_metric_callback(self, callback: Callable):
+        """Thiết lập callback ghi metric có giá trị (ví dụ thời gian detect)"""
+        self.on_metric = callback
+    
+    def set_unknown_screen_callback(self, callback: Callable):
+        """Thiết lập callback xử lý màn hình lạ (nhận kết quả tra cứu, trả về một trong UNKNOWN_SCREEN_ACTIONS)"""
+        self.on_unknown_screen = callback
+    
+    def set_course(self, course: Optional[str]):
+        """
+        Chọn khóa học đang chạy, lịch sử độ dài lesson và vị trí nút tốc độ được lưu theo khóa học này
+        
+        Args:
+            course: Tên khóa học (None hoặc rỗng = DEFAULT_COURSE)
+        """
+        self.course = (course or "").strip() or self.DEFAULT_COURSE
+        self.video_scheduler.set_course(self.course)
+        self.playback_speed.set_course(self.course)
+    
+    def enable_capture_pipeline(self, capture_interval: float = 1.0, drop_policy: str = "latest"):
+        """
+        Bật pipeline chụp màn hình và detect play button ở thread riêng
+        
+        Khi bật, vòng lặp kiểm tra video đọc kết quả detect mới nhất thay vì tự chụp và detect.
+        
+        Args:
+            capture_interval: Chu kỳ chụp màn hình (giây)
+            drop_policy: "latest" (chỉ giữ frame mới nhất) hoặc "block" (đợi detect xong mới chụp tiếp)
+        """
+        # Pipeline chỉ detect trong region của phiên để không bấm nhầm play button của phiên khác
+        self.capture_pipeline = CapturePipeline(self.image_detector, ("play_button",),
+                                                capture_interval, drop_policy, region=self.region)
+        if self.is_running:
+            self.capture_pipeline.start()
+    
+    def _detect_play_button(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Detect play button, ưu tiên kết quả mới nhất từ capture pipeline nếu đang bật
+        
+        Returns:
+            Optional[Tuple[int, int, int, int]]: Vị trí play button hoặc None
+        """
+        if self.capture_pipeline and self.capture_pipeline.is_running():
+            result = self.capture_pipeline.get_result("play_button", newer_than=self._last_play_sequence,
+                                                      timeout=self.capture_pipeline.capture_interval * 3)
+            if result is not None:
+                self._last_play_sequence = result['sequence']
+                if self.on_metric:
+                    self.on_metric('detection_time', result['detect_time'])
+                play_btn = result['matches'][0] if result['matches'] else None
+                self.flight_recorder.record_frame(None, "play_button", play_btn, result['detect_time'],
+                                                  sequence=result['sequence'], region=self.region)
+                return self._to_screen(play_btn)
+            self._log("Capture pipeline chưa có kết quả mới - detect trực tiếp")
+        
+        play_btn, detect_time = self._observe("play_button", self.image_detector.detect_play_button)
+        if self.on_metric:
+            self.on_metric('detection_time', detect_time)
+        return self._to_screen(play_btn)
+    
+    def _screenshot(self) -> Optional[np.ndarray]:
+        """
+        Lấy frame của vùng màn hình thuộc phiên này
+        
+        Returns:
+            Frame đã cắt theo region, None nếu detector tự chụp toàn màn hình
+        """
+        if self.region is None and self.frame_source is None:
+            return None
+        
+        frame = self.frame_source() if self.frame_source else self.image_detector.capture_screenshot()
+        if self.region is None:
+            return frame
+        x, y, width, height = self.region
+        return frame[y:y + height, x:x + width]
+    
+    def _session_frame(self) -> np.ndarray:
+        """Chụp frame của vùng màn hình thuộc phiên này (luôn trả về frame)"""
+        frame = self._screenshot()
+        if frame is None:
+            frame = self.image_detector.capture_screenshot()
+        return frame
+    
+    def _to_screen(self, bbox: Optional[Tuple[int, int, int, int]]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Đổi bounding box từ tọa độ trong region sang tọa độ màn hình
+        
+        Args:
+            bbox: Tuple (x, y, width, height) trong region hoặc None
+        
+        Returns:
+            Bounding box theo tọa độ màn hình hoặc None
+        """
+        if bbox is None or self.region is None:
+            return bbox
+        x, y, width, height = bbox
+        return x + self.region[0], y + self.region[1], width, height
+    
+    def _observe(self, target: str, detect: Callable[[Optional[np.ndarray]], Any]) -> Tuple[Any, float]:
+        """
+        Detect trên frame của phiên và ghi lần detect vào flight recorder
+        
+        Args:
+            target: Tên target (ghi vào flight recorder)
+            detect: Function detect nhận frame (None = detector tự chụp)
+        
+        Returns:
+            Tuple (kết quả detect theo tọa độ trong region, thời gian detect)
+        """
+        frame = self._screenshot()
+        
+        detect_start = time.perf_counter()
+        result = detect(frame)
+        detect_time = time.perf_counter() - detect_start
+        if frame is None:
+            # Detector tự chụp: flight recorder và chỉ mục màn hình dùng lại đúng frame đó, không chụp thêm
+            frame = self.image_detector.last_frame
+        self.flight_recorder.record_frame(frame, target, result, detect_time, region=self.region)
+        
+        if frame is not None and self.screen_states.enabled:
+            # Detect được target thì màn hình chắc chắn bình thường (trạng thái mới được học luôn)
+            self._screen_match = self.screen_states.lookup(frame, target if result else None)
+            if not self._screen_match['unknown']:
+                self._unknown_since = None
+        return result, detect_time
+    
+    def _detect_lessons(self) -> list:
+        """Detect tất cả lessons trong vùng của phiên (tọa độ màn hình)"""
+        lessons, _ = self._observe("lesson", self.image_detector.detect_all_lesson_images)
+        return [self._to_screen(bbox) for bbox in lessons]
+    
+    def _detect_expand_button(self) -> Optional[Tuple[int, int, int, int]]:
+        """Detect expand button trong vùng của phiên (tọa độ màn hình)"""
+        expand_btn, _ = self._observe("expand_button", self.image_detector.detect_expand_button)
+        return self._to_screen(expand_btn)
+    
+    def _asset_video_roi(self) -> Optional[Tuple[float, float, float, float]]:
+        """ROI của asset 'video_buffering' (đặt bằng vùng video của player), None nếu chưa cấu hình"""
+        asset_info = self.image_detector.asset_manager.get_asset_info("video_buffering")
+        return asset_info.roi if asset_info is not None and asset_info.roi else None
+    
+    def _read_video_progress(self) -> Optional[float]:
+        """Đọc tiến độ video trong vùng của phiên và báo cho video scheduler"""
+        if not self.image_detector.has_video_progress():
+            return None
+        progress, _ = self._observe("video_progress", self.image_detector.detect_video_progress)
+        self.video_scheduler.observe_progress(progress)
+        return progress
+    
+    def prefetch_next_target(self):
+        """
+        Tìm trước lesson tiếp theo (hoặc expand button nếu không có lesson) trong lúc video đang phát
+        
+        Chỉ detect, không click hay scroll. Khi video kết thúc chỉ cần xác nhận lại vị trí
+        trong cửa sổ nhỏ (_take_prefetched) rồi click ngay thay vì quét lại toàn bộ.
+        """
+        if self._prefetched and time.time() - self._prefetched['time'] < self.PREFETCH_MAX_AGE:
+            return
+        
+        lessons, _ = self._observe("lesson_prefetch", self.image_detector.detect_all_lesson_images)
+        if lessons:
+            target, candidates = "lesson", lessons
+        else:
+            expand_btn, _ = self._observe("expand_button_prefetch", self.image_detector.detect_expand_button)
+            target, candidates = "expand_button", [expand_btn] if expand_btn else []
+        
+        self.prefetch_stats['scans'] += 1
+        self._prefetched = {'target': target, 'candidates': candidates, 'time': time.time()}
+    
+    def _take_prefetched(self) -> Tuple[Optional[str], Optional[Tuple[int, int, int, int]]]:
+        """
+        Lấy kết quả tìm trước và xác nhận lại trên frame hiện tại (kết quả chỉ dùng được một lần)
+        
+        Returns:
+            Tuple (target, vị trí theo tọa độ màn hình), (None, None) nếu không có hoặc không còn khớp
+        """
+        prefetched, self._prefetched = self._prefetched, None
+        if not prefetched or not prefetched['candidates']:
+            return None, None
+        
+        frame = self._session_frame()
+        
+        target = prefetched['target']
+        validate_start = time.perf_counter()
+        validated = None
+        for bbox in prefetched['candidates']:
+            validated = self.image_detector.validate_match(target, bbox, frame)
+            if validated:
+                break
+        self.flight_recorder.record_frame(frame, f"{target}_validate", validated,
+                                          time.perf_counter() - validate_start, region=self.region)
+        
+        if validated is None:
+            self.prefetch_stats['misses'] += 1
+            return None, None
+        self.prefetch_stats['hits'] += 1
+        return target, self._to_screen(validated)
+    
+    def _find_speed_control(self, target: str,
+                            hint: Optional[Tuple[int, int, int, int]] = None) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Tìm một phần của điều khiển tốc độ, thử xác nhận tại vị trí đã nhớ trước khi quét cả màn hình
+        
+        Args:
+            target: "speed_button", "speed_option_max" hoặc "speed_active_max"
+            hint: Vị trí đã nhớ trong region (None = quét luôn)
+        
+        Returns:
+            Vị trí (x, y, width, height) trong region hoặc None
+        """
+        frame = self._session_frame()
+        
+        if hint is not None:
+            found = self.image_detector.validate_match(target, hint, frame)
+            if found is not None:
+                self.playback_speed.stats['remembered_hits'] += 1
+                return found
+        
+        detect_start = time.perf_counter()
+        matches = self.image_detector.detect(target, frame)
+        found = matches[0] if matches else None
+        self.flight_recorder.record_frame(frame, target, found, time.perf_counter() - detect_start,
+                                          region=self.region)
+        return found
+    
+    def _click_and_settle(self, bbox: Tuple[int, int, int, int]) -> bool:
+        """
+        Click vào trung tâm của bounding box (tọa độ trong region) và đợi trang phản hồi
+        
+        Returns:
+            bool: True nếu automation vẫn đang chạy
+        """
+        x, y, w, h = self._to_screen(bbox)
+        return self._wait_settled(self._input("click", x + w//2, y + h//2))
+    
+    def _close_speed_menu(self) -> bool:
+        """
+        Đóng menu tốc độ (phím Escape) để menu không che player khi đặt tốc độ thất bại
+        
+        Returns:
+            bool: True nếu automation vẫn đang chạy
+        """
+        return self._wait_settled(self._input("press", "esc"))
+    
+    def maximize_playback_speed(self) -> bool:
+        """
+        Đặt tốc độ phát cao nhất cho video vừa mở và xác nhận đã có hiệu lực
+        
+        Cần các asset tùy chọn speed_button, speed_option_max và speed_active_max.
+        Vị trí nút tốc độ và lựa chọn tốc độ được nhớ theo khóa học nên các lesson sau
+        chỉ cần xác nhận trong cửa sổ nhỏ thay vì detect lại.
+        
+        Returns:
+            bool: True nếu video đang ở tốc độ cao nhất
+        """
+        if not self.maximize_speed or not self.playback_speed.should_try():
+            return False
+        if not all(self.image_detector.has_target(target)
+                   for target in ("speed_button", "speed_option_max", "speed_active_max")):
+            return False
+        
+        self.playback_speed.stats['attempts'] += 1
+        remembered = self.playback_speed.get_button()
+        
+        # Player thường giữ tốc độ giữa các lesson: đã ở tốc độ cao nhất thì không cần click
+        active = self._find_speed_control("speed_active_max", remembered)
+        if active is not None:
+            self.playback_speed.record_success(active)
+            self._log("⏩ Video đã ở tốc độ phát cao nhất")
+            return True
+        
+        button = self._find_speed_control("speed_button", remembered)
+        if button is None:
+            self.playback_speed.record_failure(forget=remembered is not None)
+            self._log("Không tìm thấy nút tốc độ phát")
+            return False
+        
+        # Mở menu tốc độ rồi đợi menu hiện ra
+        if not self._click_and_settle(button):
+            return False
+        
+        option = self._find_speed_control("speed_option_max", self.playback_speed.get_option(button))
+        if option is None:
+            self.playback_speed.record_failure(forget=True)
+            self._log("Không tìm thấy lựa chọn tốc độ cao nhất trong menu")
+            self._close_speed_menu()
+            return False
+        
+        if not self._click_and_settle(option):
+            return False
+        
+        if self._find_speed_control("speed_active_max", button) is None:
+            self.playback_speed.record_failure(forget=True)
+            self._log("⚠️ Đã chọn tốc độ cao nhất nhưng player chưa nhận")
+            self._close_speed_menu()
+            return False
+        
+        self.playback_speed.record_success(button, option)
+        self._log("⏩ Đã đặt tốc độ phát cao nhất")
+        return True
+    
+    def _check_stall(self, progress: Optional[float]) -> bool:
+        """
+        Kiểm tra video có bị đứng hình không và thực hiện hành động khôi phục tiếp theo nếu cần
+        
+        Args:
+            progress: Tiến độ video vừa đọc (None = không có)
+        
+        Returns:
+            bool: False nếu automation bị dừng trong lúc khôi phục
+        """
+        frame = self._session_frame()
+        buffering = (self.image_detector.has_target("video_buffering")
+                     and bool(self.image_detector.detect("video_buffering", frame)))
+        
+        recovered = self.stall_detector.observe(frame, progress, buffering)
+        if recovered:
+            self._log(f"▶️ Video chạy lại sau {recovered['duration']:.0f} giây đứng hình "
+                      f"(khôi phục bằng: {recovered['recovered_by']})")
+            if self.on_metric:
+                self.on_metric('video_stall', recovered['duration'])
+            return True
+        
+        if self.stall_recovery == "off":
+            return True
+        self.stall_detector.require_evidence = self.stall_recovery != "always"
+        unconfirmed = self.stall_detector.stats['unconfirmed']
+        action = self.stall_detector.next_action()
+        if self.stall_detector.stats['unconfirmed'] > unconfirmed:
+            self._log("ℹ️ Vùng video đứng yên nhưng tiến độ không đọc được và không thấy buffering "
+                      "(có thể là video slide tĩnh) - không khôi phục")
+        if action is None:
+            return True
+        
+        self.flight_recorder.record_event("stall", action=action, motion=round(self.stall_detector.last_motion, 3))
+        if action == "give_up":
+            stall = self.stall_detector.finish(recovered=False)
+            self._log(f"❌ Video đứng hình {stall['duration']:.0f} giây, đã thử {', '.join(stall['actions'])} "
+                      f"nhưng không khôi phục được")
+            if self.on_metric:
+                self.on_metric('video_stall', stall['duration'])
+            self.dump_flight_recorder("video_stall")
+            return True
+        
+        self._log(f"⚠️ Video đứng hình (dấu hiệu: {', '.join(sorted(self.stall_detector.evidence)) or 'hình đứng yên'}) "
+                  f"- thử khôi phục: {action}")
+        ok = self._recover_stall(action, frame.shape, progress)
+        self.stall_detector.record_action(action, ok)
+        return self.is_running
+    
+    def _recover_stall(self, action: str, frame_shape: Tuple[int, ...], progress: Optional[float]) -> bool:
+        """
+        Thực hiện một hành động khôi phục video đứng hình
+        
+        Args:
+            action: "click_video" (click giữa video để phát tiếp), "seek" (click thanh tiến độ tại vị trí
+                hiện tại để player tải lại) hoặc "refresh" (refresh trang rồi mở lại lesson)
+            frame_shape: Kích thước frame của phiên
+            progress: Tiến độ video đọc được gần nhất
+        
+        Returns:
+            bool: True nếu đã thực hiện được hành động
+        """
+        if action == "click_video":
+            x, y, width, height = self.stall_detector.get_video_rect(frame_shape)
+            self.click_center(self._to_screen((x, y, width, height)))
+            return True
+        
+        if action == "seek":
+            point = None
+            if progress is not None:
+                point = self.image_detector.get_video_progress_point(frame_shape, progress)
+            if point is None:
+                self._log("Không tua được: chưa đọc được thanh tiến độ")
+                return False
+            x, y, _, _ = self._to_screen((point[0], point[1], 0, 0))
+            self._input("click", x, y)
+            return True
+        
+        if action == "refresh":
+            return self.refresh_page()
+        
+        return False
+    
+    def refresh_page(self) -> bool:
+        """
+        Click refresh button rồi mở lại lesson đang xem
+        
+        Returns:
+            bool: True nếu đã refresh và automation vẫn đang chạy
+        """
+        if not self._click_refresh():
+            return False
+        # Lesson đang xem vẫn chưa hoàn thành nên bước khởi tạo sẽ mở lại đúng lesson đó
+        return self.initial_step()
+    
+    def _click_refresh(self) -> bool:
+        """
+        Click refresh button và đợi trang tải lại
+        
+        Returns:
+            bool: True nếu đã refresh và automation vẫn đang chạy
+        """
+        refresh_btn, _ = self._observe("refresh_button", self.image_detector.detect_refresh_button)
+        if not refresh_btn:
+            self._log("Không tìm thấy Refresh button")
+            return False
+        center_x, center_y = self.click_center(self._to_screen(refresh_btn))
+        self._log(f"Click Refresh button tại ({center_x}, {center_y})")
+        if self.on_stats_update:
+            self.on_stats_update('refresh_clicks')
+        return self._wait(5)  # Đợi trang tải lại
+    
+    def _check_unknown_screen(self) -> Optional[str]:
+        """
+        Xử lý nếu lần detect gần nhất rơi vào màn hình lạ (không giống trạng thái nào đã biết, không detect được gì)
+        
+        Returns:
+            Hành động đã thực hiện (một trong UNKNOWN_SCREEN_ACTIONS) hoặc None nếu màn hình bình thường
+        """
+        match = self._screen_match
+        if not match or not match['unknown']:
+            return None
+        self._screen_match = None
+        
+        first_time = self._unknown_since is None
+        if first_time:
+            self._unknown_since = time.time()
+            if self.on_metric:
+                self.on_metric('unknown_screen', match['distance'])
+        self._log(f"❓ Màn hình lạ (gần nhất: '{match['label']}', khoảng cách {match['distance']:.1f}) "
+                  f"- dừng tìm kiếm, đã kéo dài {time.time() - self._unknown_since:.0f} giây")
+        self.flight_recorder.record_event("unknown_screen", **match)
+        if first_time:
+            self.dump_flight_recorder("unknown_screen")
+        
+        action = (self.on_unknown_screen(match) if self.on_unknown_screen else None) or self.unknown_screen_action
+        if action not in self.UNKNOWN_SCREEN_ACTIONS:
+            self._log(f"Hành động xử lý màn hình lạ không hợp lệ: {action} - dùng 'wait'")
+            action = "wait"
+        
+        if action == "refresh":
+            # Chỉ refresh: hàm này được gọi giữa các vòng scroll, việc tìm lại lesson để poll_step làm
+            if self._click_refresh():
+                self._search_pending = True
+        elif action == "learn":
+            frame = self._session_frame()
+            self.screen_states.learn(frame, "manual")
+            self._unknown_since = None
+            self._log("Đã ghi nhận màn hình hiện tại là trạng thái bình thường")
+        elif action == "stop":
+            self._log("Dừng automation do gặp màn hình lạ")
+            self.request_stop()
+        return action
+    
+    def dump_flight_recorder(self, reason: str, detail: Optional[str] = None) -> Optional[str]:
+        """
+        Ghi flight recorder ra đĩa để phân tích sau
+        
+        Args:
+            reason: Lý do dump (ví dụ "loop_detected", "exception")
+            detail: Thông tin thêm (ví dụ traceback)
+        
+        Returns:
+            Đường dẫn thư mục dump hoặc None
+        """
+        directory = self.flight_recorder.dump(reason, detail, self.name)
+        if directory:
+            self._log(f"🛩️ Đã lưu flight recorder vào {directory}")
+        return directory
+    
+    def _input(self, action: str, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Thực hiện thao tác chuột qua hàng đợi và đợi đến khi thao tác xong
+        
+        Args:
+            action: Tên function của pyautogui ("moveTo", "click", "scroll")
+            *args: Tham số của thao tác
+            **kwargs: Tham số có tên của thao tác
+        
+        Returns:
+            Record của thao tác (completed, settled_at, ...)
+        """
+        record = self.input_queue.execute(action, *args, session=self.name, **kwargs)
+        self.flight_recorder.record_event("action", action=action, args=list(args), kwargs=kwargs,
+                                          moved=record['moved'],
+                                          queue_delay=round(record['started'] - record['submitted'], 4))
+        return record
+    
+    def _wait_settled(self, record: Dict[str, Any]) -> bool:
+        """
+        Đợi đến khi trang phản hồi xong thao tác (settled_at của record), thoát ngay nếu automation bị dừng
+        
+        Args:
+            record: Record trả về từ _input
+        
+        Returns:
+            bool: True nếu automation vẫn đang chạy
+        """
+        return self._wait(max(record['settled_at'] - time.time(), 0.0))
+    
+    def _wait(self, seconds: float) -> bool:
+        """
+        Đợi một khoảng thời gian, thoát ngay nếu automation bị dừng
+        
+        Args:
+            seconds: Thời gian đợi (giây)
+        
+        Returns:
+            bool: True nếu đợi hết thời gian và automation vẫn đang chạy
+        """
+        if self._stop_event.wait(seconds):
+            return False
+        return self.is_running
+    
+    def begin_run(self):
+        """Đánh dấu bắt đầu một lượt chạy (dùng chung cho thread và asyncio runner)"""
+        self._stop_event.clear()
+        self._prefetched = None
+        self._search_pending = False
+        self.stall_detector.reset()
+        self.is_running = True
+        if self.capture_pipeline:
+            self.capture_pipeline.start()
+    
+    def request_stop(self):
+        """Yêu cầu dừng ngay: mọi lần đợi đang diễn ra đều thoát, không đợi thread kết thúc"""
+        self.is_running = False
+        self._stop_event.set()
+        if self.capture_pipeline:
+            self.capture_pipeline.stop()
+        self.screen_states.save(force=True)
+    
     def _log(self, message: str):
         """Helper method để log message"""
+        self.flight_recorder.record_event("log", message=message)
         if self.on_log_message:
             self.on_log_message(message)
         else:
@@ -61,11 +688,23 @@ class AutomationCore:
         Returns:
             Tuple[int, int]: Tọa độ thực (x, y)
         """
-        screen_width, screen_height = pyautogui.size()
-        x = int(screen_width * x_percent)
-        y = int(screen_height * y_percent)
+        left, top, screen_width, screen_height = self.get_screen_rect()
+        x = left + int(screen_width * x_percent)
+        y = top + int(screen_height * y_percent)
         return x, y
     
+    def get_screen_rect(self) -> Tuple[int, int, int, int]:
+        """
+        Lấy vùng màn hình mà phiên điều khiển
+        
+        Returns:
+            Tuple[int, int, int, int]: (x, y, width, height) của region hoặc của toàn màn hình
+        """
+        if self.region is not None:
+            return self.region
+        screen_width, screen_height = pyautogui.size()
+        return 0, 0, screen_width, screen_height
+    
     def get_standard_scroll_position(self) -> Tuple[int, int]:
         """
         Lấy vị trí scroll chuẩn từ cấu hình % tọa độ
@@ -85,7 +724,7 @@ class AutomationCore:
             duration: Thời gian di chuyển (giây)
         """
         x, y = self.get_screen_position(x_percent, y_percent)
-        pyautogui.moveTo(x, y, duration=duration)
+        self._input("moveTo", x, y, duration=duration)
     
     def click_at_percent(self, x_percent: float, y_percent: float):
         """
@@ -96,7 +735,7 @@ class AutomationCore:
             y_percent: Phần trăm chiều cao màn hình (0.0 - 1.0)
         """
         x, y = self.get_screen_position(x_percent, y_percent)
-        pyautogui.click(x, y)
+        self._input("click", x, y)
     
     def scroll_at_percent(self, x_percent: float, y_percent: float, scroll_amount: int = -200):
         """
@@ -108,33 +747,44 @@ class AutomationCore:
             scroll_amount: Số đơn vị scroll (âm = xuống, dương = lên)
         """
         x, y = self.get_screen_position(x_percent, y_percent)
-        # Di chuyển chuột đến vị trí scroll
-        pyautogui.moveTo(x, y)
-        time.sleep(0.2)
-        # Scroll tại vị trí đã định
-        pyautogui.scroll(scroll_amount, x=x, y=y)
+        # Hàng đợi tự di chuyển chuột đến vị trí scroll (bỏ qua nếu chuột đã ở đó) rồi scroll
+        self._input("scroll", scroll_amount, x=x, y=y)
 
     def start_automation(self):
         """Bắt đầu automation"""
         if self.is_running:
             return
         
-        self.is_running = True
+        self.begin_run()
         self.auto_thread = threading.Thread(target=self.automation_loop, daemon=True)
         self.auto_thread.start()
-        self._log("Bắt đầu automation")
+        self._log(f"Bắt đầu automation (khóa học: {self.course})")
+        if self.course == self.DEFAULT_COURSE:
+            self._log("⚠️ Chưa đặt tên khóa học - lịch sử độ dài lesson và nút tốc độ dùng chung cho mọi khóa học")
     
     def stop_automation(self):
         """Dừng automation"""
-        self.is_running = False
+        self.request_stop()
         self._log("Dừng automation")
         
         # Đợi thread kết thúc hoặc force stop sau 3 giây
-        if self.auto_thread and self.auto_thread.is_alive():
+        # Không join khi được gọi từ chính automation thread (ví dụ auto restart từ LoopDetector)
+        if (self.auto_thread and self.auto_thread.is_alive()
+                and self.auto_thread is not threading.current_thread()):
             self.auto_thread.join(timeout=3.0)
             if self.auto_thread.is_alive():
                 self._log("Thread vẫn chạy - sẽ tự dừng khi có thể")
     
+    def close(self):
+        """Dừng automation và giải phóng hàng đợi chuột, ImageDetector do phiên tự tạo (dùng chung thì giữ nguyên)"""
+        if self.is_running:
+            self.stop_automation()
+        if self._owns_input_queue:
+            self.input_queue.stop()
+        if self._owns_image_detector:
+            self.image_detector.close()
+            self._owns_image_detector = False
+    
     def click_center(self, bbox: Tuple[int, int, int, int]) -> Tuple[int, int]:
         """
         Click vào trung tâm của bounding box
@@ -147,9 +797,147 @@ class AutomationCore:
         """
         x, y, w, h = bbox
         center_x, center_y = x + w//2, y + h//2
-        pyautogui.click(center_x, center_y)
+        self._input("click", center_x, center_y)
+        # Trang thay đổi sau click, kết quả tìm trước không còn đúng
+        self._prefetched = None
         return center_x, center_y
     
+    def _verify_lesson_started(self, bbox: Tuple[int, int, int, int], before: np.ndarray,
+                               clicked_at: float) -> Optional[float]:
+        """
+        Đợi trang chuyển sang video sau khi click lesson, tối đa timeout của click verifier
+        
+        Trang được coi là đã chuyển khi frame của phiên khác hẳn frame trước click
+        hoặc icon lesson chưa hoàn thành không còn ở vị trí vừa click.
+        
+        Args:
+            bbox: Vị trí lesson đã click (tọa độ màn hình)
+            before: Frame thu nhỏ trước khi click (ClickVerifier.snapshot)
+            clicked_at: Thời điểm click
+        
+        Returns:
+            Thời gian phản hồi (giây) hoặc None nếu hết timeout / automation bị dừng
+        """
+        x, y, width, height = bbox
+        if self.region is not None:
+            x, y = x - self.region[0], y - self.region[1]
+        deadline = clicked_at + self.click_verifier.get_timeout()
+        
+        while time.time() < deadline:
+            if not self._wait(self.click_verifier.CHECK_INTERVAL):
+                return None
+            frame = self._session_frame()
+            if (self.click_verifier.changed(before, frame)
+                    or self.image_detector.validate_match("lesson", (x, y, width, height), frame) is None):
+                return time.time() - clicked_at
+        return None
+    
+    def click_lesson(self, bbox: Tuple[int, int, int, int]) -> bool:
+        """
+        Click vào lesson và xác nhận video đã được mở, click lại ngay nếu không thấy trang thay đổi
+        
+        Args:
+            bbox: Vị trí lesson (tọa độ màn hình)
+        
+        Returns:
+            bool: True nếu đã xác nhận lesson được mở
+        """
+        for attempt in range(self.click_verifier.MAX_RETRIES + 1):
+            before = self.click_verifier.snapshot(self._session_frame())
+            clicked_at = time.time()
+            center_x, center_y = self.click_center(bbox)
+            self._log(f"Click vào lesson tại ({center_x}, {center_y})"
+                      + (f" (lần {attempt + 1})" if attempt else ""))
+            
+            latency = self._verify_lesson_started(bbox, before, clicked_at)
+            if not self.is_running:
+                return False
+            self.click_verifier.record_attempt(latency is not None, latency, attempt)
+            
+            if latency is not None:
+                self._log(f"✅ Lesson đã mở sau {latency:.1f} giây")
+                if self.on_stats_update:
+                    self.on_stats_update('lessons_clicked')
+                return True
+            
+            if attempt < self.click_verifier.MAX_RETRIES:
+                self._log(f"⚠️ Trang không thay đổi sau {self.click_verifier.get_timeout():.1f} giây - click lại")
+                if self.on_stats_update:
+                    self.on_stats_update('lesson_click_retries')
+        
+        self._log("❌ Không mở được lesson sau khi click lại")
+        if self.on_stats_update:
+            self.on_stats_update('lesson_clicks_failed')
+        return False
+    
+    def open_lesson(self, bbox: Tuple[int, int, int, int]) -> bool:
+        """
+        Click lesson, bắt đầu đếm thời gian video và đặt tốc độ phát
+        
+        Click không mở được lesson thì refresh trang, tìm lại lesson và click thêm một lần;
+        vẫn không được thì dừng automation thay vì đợi một video không chạy.
+        
+        Args:
+            bbox: Vị trí lesson (tọa độ màn hình)
+        
+        Returns:
+            bool: False nếu không mở được lesson hoặc automation bị dừng
+        """
+        opened = self.click_lesson(bbox)
+        if not opened and self.is_running:
+            self.dump_flight_recorder("lesson_click_failed")
+            self._log("🔄 Refresh trang rồi tìm lại lesson...")
+            if self._click_refresh():
+                lessons = self._detect_lessons()
+                if lessons and self.is_running:
+                    opened = self.click_lesson(lessons[0])
+        
+        if not opened:
+            if self.is_running:
+                self._log("❌ Không mở được lesson kể cả sau khi refresh trang - dừng automation")
+                self.request_stop()
+            return False
+        
+        self.video_scheduler.start_lesson()
+        if not self._wait(2):  # Đợi trang load, tránh click liên tiếp
+            return False
+        self.maximize_playback_speed()
+        return self.is_running
+    
+    def scroll_page(self, scroll_x: int, scroll_y: int) -> Optional[bool]:
+        """
+        Scroll outline xuống một trang (chồng lấn một ít) và đo lại độ dịch chuyển để hiệu chỉnh
+        
+        Khi chưa hiệu chỉnh chỉ scroll PROBE_UNITS đơn vị để đo số pixel mỗi đơn vị scroll; sau khi hiệu chỉnh,
+        thỉnh thoảng scroll một đoạn ngắn để đo lại (xem ScrollCalibrator.scroll_units).
+        
+        Args:
+            scroll_x: Tọa độ X để scroll
+            scroll_y: Tọa độ Y để scroll
+        
+        Returns:
+            True nếu outline đã dịch chuyển, False nếu không dịch chuyển (đã đến cuối outline),
+            None nếu automation bị dừng
+        """
+        calibrator = self.scroll_calibrator
+        left, top = (self.region[0], self.region[1]) if self.region is not None else (0, 0)
+        frame = self._session_frame()
+        before = calibrator.strip(frame, scroll_x - left)
+        units = calibrator.scroll_units(frame.shape[0])
+        
+        record = self._input("scroll", -units, x=scroll_x, y=scroll_y)
+        if not self._wait_settled(record):
+            return None
+        
+        was_calibrated = calibrator.is_calibrated()
+        shift = calibrator.observe(before, calibrator.strip(self._session_frame(), scroll_x - left), -units)
+        if shift == 0.0:
+            return False
+        if shift is not None and not was_calibrated:
+            self._log(f"📏 Hiệu chỉnh scroll: {calibrator.pixels_per_unit:.2f} pixel/đơn vị, "
+                      f"mỗi trang {calibrator.page_units(frame.shape[0])} đơn vị")
+        return True
+    
     def scroll_and_find_expand(self, last_expand_pos: Tuple[int, int], 
                               max_scrolls: int = 10) -> Optional[Tuple[int, int, int, int]]:
         """
@@ -171,20 +959,23 @@ class AutomationCore:
             self._log(f"Bắt đầu scroll tại vị trí ({scroll_x}, {scroll_y}) - 15% X, 50% Y màn hình để tìm expand button tiếp theo")
             
             while scroll_count < max_scrolls:
-                # Di chuyển chuột đến vị trí scroll
-                pyautogui.moveTo(scroll_x, scroll_y)
+                # Màn hình lạ thì scroll tiếp cũng vô ích
+                if self._check_unknown_screen():
+                    return None
                 
-                time.sleep(0.5)
-                
-                # Scroll xuống tại vị trí đã định
-                pyautogui.scroll(-200, x=scroll_x, y=scroll_y)  # Scroll xuống 200 đơn vị
-                time.sleep(1)  # Đợi scroll hoàn thành
+                # Scroll xuống một trang tại vị trí đã định (hàng đợi tự di chuyển chuột nếu cần)
+                moved = self.scroll_page(scroll_x, scroll_y)
+                if moved is None:
+                    return None
+                if not moved:
+                    self._log(f"Outline không dịch chuyển nữa - đã đến cuối trang sau {scroll_count + 1} lần scroll")
+                    return None
                 
                 scroll_count += 1
                 self._log(f"Scroll lần {scroll_count}/{max_scrolls}")
                 
                 # Kiểm tra có expand button mới không
-                expand_btn = self.image_detector.detect_expand_button()
+                expand_btn = self._detect_expand_button()
                 if expand_btn:
                     self._log(f"Tìm thấy expand button mới sau {scroll_count} lần scroll")
                     return expand_btn
@@ -214,8 +1005,16 @@ class AutomationCore:
                 self._log("Automation đã bị dừng - không tìm lesson tiếp theo")
                 return []
 
+            target, bbox = self._take_prefetched()
+            if target == "lesson":
+                self._log("Dùng lesson đã tìm trước trong lúc video phát (đã xác nhận lại vị trí)")
+                return [bbox]
+            if target == "expand_button":
+                self._log("Dùng expand button đã tìm trước trong lúc video phát (đã xác nhận lại vị trí)")
+                return self.handle_no_lessons_scenario(expand_btn=bbox)
+            
             self._log("Tìm lesson tiếp theo...")
-            lessons = self.image_detector.detect_all_lesson_images()
+            lessons = self._detect_lessons()
             
             # Kiểm tra lại trước khi xử lý
             if not self.is_running:
@@ -234,10 +1033,13 @@ class AutomationCore:
             self._log(f"Lỗi khi xử lý play button: {str(e)}")
             return []
     
-    def handle_no_lessons_scenario(self) -> list:
+    def handle_no_lessons_scenario(self, expand_btn: Optional[Tuple[int, int, int, int]] = None) -> list:
         """
         Xử lý khi không tìm thấy lessons
         
+        Args:
+            expand_btn: Expand button đã biết vị trí (None = detect lại)
+        
         Returns:
             list: Danh sách lessons tìm được sau khi xử lý, hoặc [] nếu không có
         """
@@ -245,10 +1047,10 @@ class AutomationCore:
         if not self.is_running:
             return []
             
-        self._log("Không tìm thấy lesson nào! Tìm kiếm Expand button...")
-        
         # Tìm expand button khi không có lesson
-        expand_btn = self.image_detector.detect_expand_button()
+        if expand_btn is None:
+            self._log("Không tìm thấy lesson nào! Tìm kiếm Expand button...")
+            expand_btn = self._detect_expand_button()
         if not expand_btn:
             self._log("Không tìm thấy Expand button! Thử scroll để tìm...")
             return self.scroll_and_find_lessons_or_expand()
@@ -265,14 +1067,12 @@ class AutomationCore:
             self.on_stats_update('expand_clicks')
         
         # Đợi expand với khả năng thoát sớm
-        for i in range(20):  # 2 giây
-            if not self.is_running:
-                return []
-            time.sleep(0.1)
+        if not self._wait(2):
+            return []
         
         # Tìm lại lessons sau khi expand
         self._log("Tìm lại lessons sau khi expand...")
-        lessons = self.image_detector.detect_all_lesson_images()
+        lessons = self._detect_lessons()
         
         if lessons:
             self._log(f"Tìm thấy {len(lessons)} lesson(s) sau khi expand!")
@@ -298,14 +1098,12 @@ class AutomationCore:
             self.on_stats_update('expand_clicks')
         
         # Đợi expand thứ 2
-        for i in range(20):  # 2 giây
-            if not self.is_running:
-                return []
-            time.sleep(0.1)
+        if not self._wait(2):
+            return []
         
         # Tìm lại lessons sau khi expand thứ 2
         self._log("Tìm lại lessons sau khi expand thứ 2...")
-        lessons = self.image_detector.detect_all_lesson_images()
+        lessons = self._detect_lessons()
         
         if lessons:
             self._log(f"Tìm thấy {len(lessons)} lesson(s) sau khi expand và scroll!")
@@ -326,7 +1124,7 @@ class AutomationCore:
             return []
             
         self._log("Không tìm thấy lesson - Tìm expand button...")
-        expand_btn = self.image_detector.detect_expand_button()
+        expand_btn = self._detect_expand_button()
         
         if not expand_btn:
             # Không tìm thấy expand button, thử scroll để tìm
@@ -344,14 +1142,12 @@ class AutomationCore:
             self.on_stats_update('expand_clicks')
         
         # Đợi expand với khả năng thoát sớm
-        for i in range(20):  # 2 giây
-            if not self.is_running:
-                return []
-            time.sleep(0.1)
+        if not self._wait(2):
+            return []
         
         # Tìm lại lessons sau khi expand
         self._log("Tìm lại lessons sau khi expand...")
-        lessons = self.image_detector.detect_all_lesson_images()
+        lessons = self._detect_lessons()
         
         if lessons:
             return lessons
@@ -374,97 +1170,142 @@ class AutomationCore:
             self.on_stats_update('expand_clicks')
         
         # Đợi expand thứ 2
-        for i in range(20):  # 2 giây
-            if not self.is_running:
-                return []
-            time.sleep(0.1)
+        if not self._wait(2):
+            return []
         
         # Tìm lessons sau expand thứ 2
-        lessons = self.image_detector.detect_all_lesson_images()
+        lessons = self._detect_lessons()
         if lessons:
             return lessons
         else:
             self._log("Vẫn không tìm thấy lesson sau expand! Thử scroll liên tục để tìm...")
             return self.scroll_and_find_lessons_or_expand((center_x2, center_y2))
     
-    def automation_loop(self):
-        """Vòng lặp automation chính"""
-        try:
-            if self.on_step_update:
-                self.on_step_update("Khởi tạo", ["Tìm lessons", "Click lesson đầu tiên"])
-              # Bước 1: Tìm và click vào lesson đầu tiên
-            self._log("Tìm kiếm lessons...")
-            lessons = self.image_detector.detect_all_lesson_images()
+    def initial_step(self) -> bool:
+        """
+        Bước khởi tạo: tìm và click vào lesson đầu tiên
             
-            # Kiểm tra dừng trước khi xử lý lessons
-            if not self.is_running:
-                return
+        Returns:
+            bool: False nếu automation bị dừng trong lúc thực hiện
+        """
+        if self.on_step_update:
+            self.on_step_update("Khởi tạo", ["Tìm lessons", "Click lesson đầu tiên"])
             
-            if not lessons:
-                lessons = self.handle_no_lessons_scenario()
+        self._log("Tìm kiếm lessons...")
+        lessons = self._detect_lessons()
             
-            # Kiểm tra dừng trước khi click lesson
-            if not self.is_running:
-                return
+        # Kiểm tra dừng trước khi xử lý lessons
+        if not self.is_running:
+            return False
                 
+        if not lessons:
+            lessons = self.handle_no_lessons_scenario()
+        
+        # Kiểm tra dừng trước khi click lesson
+        if not self.is_running:
+            return False
+        
+        if lessons:
+            # Click vào lesson đầu tiên và xác nhận video đã mở
+            return self.open_lesson(lessons[0])
+        
+        return True
+    
+    def poll_step(self) -> Optional[float]:
+        """
+        Một lần kiểm tra video: detect play button và chuyển sang lesson tiếp theo nếu video đã kết thúc
+        
+        Returns:
+            Optional[float]: Số giây cần đợi trước lần kiểm tra tiếp theo, None nếu vòng lặp phải dừng
+        """
+        if self.on_step_update:
+            self.on_step_update("Kiểm tra video", ["Detect play button", "Chờ đến lần kiểm tra tiếp theo"])
+        
+        self._log("Kiểm tra Play button...")
+        
+        # Kiểm tra dừng trước khi detect
+        if not self.is_running:
+            return None
+        
+        # Kiểm tra loop detection
+        if self.on_loop_check and self.on_loop_check("check_play_button"):
+            self.dump_flight_recorder("loop_detected")
+            return None  # Auto restart được kích hoạt
+        
+        if self._search_pending:
+            # Trang vừa được refresh do màn hình lạ: tìm và mở lại lesson từ đầu
+            self._search_pending = False
+            self._log("Tìm lại lesson sau khi refresh trang...")
+            if not self.initial_step():
+                return None
+            if self._search_pending:
+                return self.UNKNOWN_RETRY_DELAY
+            return self.video_scheduler.next_delay()
+        
+        self._screen_match = None
+        play_btn = self._detect_play_button()
+        
+        # Kiểm tra dừng sau khi detect
+        if not self.is_running:
+            return None
+        
+        if not play_btn and self._check_unknown_screen():
+            return self.UNKNOWN_RETRY_DELAY if self.is_running else None
+        
+        if play_btn:
+            self.stall_detector.reset()
+            duration = self.video_scheduler.finish_lesson()
+            if duration is not None:
+                self._log(f"Lesson kéo dài {duration:.0f} giây")
+            lessons = self.handle_play_button_detected()
             if lessons:
-                # Click vào lesson đầu tiên
-                center_x, center_y = self.click_center(lessons[0])
-                self._log(f"Click vào lesson đầu tiên tại ({center_x}, {center_y})")
-                
-                if self.on_stats_update:
-                    self.on_stats_update('lessons_clicked')
-                
-                time.sleep(2)  # Đợi trang load
-              # Bước 2: Vòng lặp kiểm tra play button mỗi phút
+                if not self.open_lesson(lessons[0]):
+                    return None
+            elif self._search_pending:
+                # Vòng scroll gặp màn hình lạ và đã refresh: lần kiểm tra sau sẽ tìm lại lesson
+                return self.UNKNOWN_RETRY_DELAY if self.is_running else None
+            else:
+                self._log("Có lỗi khi xử lý play button hoặc không tìm thấy lesson mới")
+                return None
+        else:
+            progress = self._read_video_progress()
+            if progress is not None:
+                self._log(f"Không phát hiện Play button - Video vẫn đang chạy ({progress * 100:.0f}%)")
+            else:
+                self._log("Không phát hiện Play button - Video vẫn đang chạy")
+            if not self._check_stall(progress):
+                return None
+            self.prefetch_next_target()
+        
+        delay = self.video_scheduler.next_delay()
+        if self.stall_detector.is_still():
+            # Vùng video đứng yên: kiểm tra lại sớm để xác nhận đứng hình
+            delay = min(delay, self.stall_detector.CHECK_INTERVAL)
+        self._log(f"Đợi {delay:.0f} giây trước khi kiểm tra lại "
+                  f"(dự đoán: {self.video_scheduler.prediction_source})...")
+        return delay
+    
+    def automation_loop(self):
+        """Vòng lặp automation chính (chạy trên thread riêng)"""
+        try:
+            # Bước 1: Tìm và click vào lesson đầu tiên
+            if not self.initial_step():
+                return
+            
+            # Bước 2: Vòng lặp kiểm tra play button mỗi phút
             while self.is_running:
-                if self.on_step_update:
-                    self.on_step_update("Kiểm tra video", ["Detect play button", "Chờ 60s"])
-                
-                self._log("Kiểm tra Play button...")
-                
-                # Kiểm tra dừng trước khi detect
-                if not self.is_running:
-                    return
-                
-                # Kiểm tra loop detection
-                if self.on_loop_check and self.on_loop_check("check_play_button"):
-                    break  # Auto restart được kích hoạt
+                delay = self.poll_step()
+                if delay is None:
+                    break
                 
-                play_btn = self.image_detector.detect_play_button()
-                  # Kiểm tra dừng sau khi detect
-                if not self.is_running:
+                # Đợi đến lần kiểm tra tiếp theo - dừng ngay lập tức khi được yêu cầu
+                if not self._wait(delay):
+                    self._log("Dừng automation được yêu cầu")
                     return
-                
-                if play_btn:
-                    lessons = self.handle_play_button_detected()
-                    if lessons:
-                        center_x, center_y = self.click_center(lessons[0])
-                        self._log(f"Click vào lesson đầu tiên tại ({center_x}, {center_y})")
-                        
-                        if self.on_stats_update:
-                            self.on_stats_update('lessons_clicked')
-                        
-                        # Thêm delay ngắn để tránh click liên tiếp
-                        for i in range(20):  # 2 seconds delay với khả năng thoát sớm
-                            if not self.is_running:
-                                return
-                            time.sleep(0.1)
-                    else:
-                        self._log("Có lỗi khi xử lý play button hoặc không tìm thấy lesson mới")
-                        break
-                else:
-                    self._log("Không phát hiện Play button - Video vẫn đang chạy")
-                  # Đợi 1 phút trước khi kiểm tra lại - với khả năng dừng ngay lập tức
-                self._log("Đợi 60 giây trước khi kiểm tra lại...")
-                for i in range(600):  # 60 giây = 600 lần 0.1 giây
-                    if not self.is_running:
-                        self._log("Dừng automation được yêu cầu")
-                        return  # Thoát ngay lập tức
-                    time.sleep(0.1)  # Sleep ngắn để có thể phản hồi nhanh
                     
         except Exception as e:
             self._log(f"Lỗi trong automation: {str(e)}")
+            self.dump_flight_recorder("exception", traceback.format_exc())
             self.stop_automation()
     
     def test_detect(self):
@@ -472,11 +1313,11 @@ class AutomationCore:
         self._log("=== Bắt đầu test detect ===")
         
         # Test detect lessons
-        lessons = self.image_detector.detect_all_lesson_images()
+        lessons = self._detect_lessons()
         self._log(f"Tìm thấy {len(lessons)} lesson(s)")
         
         # Test detect play button
-        play_btn = self.image_detector.detect_play_button()
+        play_btn = self.image_detector.detect_play_button(self._screenshot())
         if play_btn:
             self._log("Tìm thấy Play button")
         else:
@@ -485,7 +1326,7 @@ class AutomationCore:
 
 
         # Test detect expand button
-        expand_btn = self.image_detector.detect_expand_button()
+        expand_btn = self._detect_expand_button()
         if expand_btn:
             self._log("Tìm thấy Expand button")
         else:
@@ -501,7 +1342,7 @@ class AutomationCore:
                 self.on_step_update("Auto restarting", ["Dừng automation", "Đợi 3 giây", "Bắt đầu lại"])
             
             # Dừng automation hiện tại
-            self.is_running = False
+            self.request_stop()
             time.sleep(3)  # Đợi 3 giây
             
             # Bắt đầu lại nếu chưa được bắt đầu thủ công
@@ -534,46 +1375,38 @@ class AutomationCore:
             self._log(f"Bắt đầu scroll liên tục tại vị trí ({scroll_x}, {scroll_y}) - 15% X, 50% Y màn hình để tìm lesson hoặc expand button")
             
             while scroll_count < max_scrolls and self.is_running:
-                # Di chuyển chuột đến vị trí scroll
-                pyautogui.moveTo(scroll_x, scroll_y)
-                
-                # Đợi với khả năng thoát sớm
-                for i in range(5):  # 0.5 giây
-                    if not self.is_running:
-                        return []
-                    time.sleep(0.1)
-                
-                # Scroll xuống tại vị trí đã định
-                pyautogui.scroll(-200, x=scroll_x, y=scroll_y)  # Scroll xuống 200 đơn vị
+                # Màn hình lạ thì scroll tiếp cũng vô ích
+                if self._check_unknown_screen():
+                    return []
                 
-                # Đợi scroll hoàn thành với khả năng thoát sớm
-                for i in range(10):  # 1 giây
-                    if not self.is_running:
-                        return []
-                    time.sleep(0.1)
+                # Scroll xuống một trang tại vị trí đã định (hàng đợi tự di chuyển chuột nếu cần)
+                moved = self.scroll_page(scroll_x, scroll_y)
+                if moved is None:
+                    return []
+                if not moved:
+                    self._log(f"Outline không dịch chuyển nữa - đã đến cuối trang sau {scroll_count + 1} lần scroll")
+                    return []
                 
                 scroll_count += 1
                 self._log(f"Scroll lần {scroll_count}/{max_scrolls}")
                 
                 # Kiểm tra có lessons không
-                lessons = self.image_detector.detect_all_lesson_images()
+                lessons = self._detect_lessons()
                 if lessons and self.is_running:
                     self._log(f"Tìm thấy {len(lessons)} lesson(s) sau {scroll_count} lần scroll")
                     return lessons
                 
                 # Kiểm tra có expand button mới không
-                expand_btn = self.image_detector.detect_expand_button()
+                expand_btn = self._detect_expand_button()
                 if expand_btn and self.is_running:
                     self._log(f"Tìm thấy expand button mới sau {scroll_count} lần scroll")
                     center_x, center_y = self.click_center(expand_btn)
                     self._log(f"Click Expand button tại ({center_x}, {center_y})")
                     if self.on_stats_update:
                         self.on_stats_update('expand_clicks')
-                    for i in range(20):
-                        if not self.is_running:
-                            return []
-                        time.sleep(0.1)
-                    lessons = self.image_detector.detect_all_lesson_images()
+                    if not self._wait(2):
+                        return []
+                    lessons = self._detect_lessons()
                     if lessons and self.is_running:
                         self._log(f"Click lesson sau expand tại ({center_x}, {center_y})")
                         return lessons
@@ -595,15 +1428,8 @@ class AutomationCore:
             scroll_y: Tọa độ Y để scroll  
             scroll_amount: Số đơn vị scroll (âm = xuống, dương = lên)
         """
-        # Di chuyển chuột đến vị trí scroll
-        pyautogui.moveTo(scroll_x, scroll_y)
-        time.sleep(0.2)  # Đợi di chuyển chuột
-        
-        # Click để focus
-        time.sleep(0.3)
-        
-        # Scroll tại vị trí đã định
-        pyautogui.scroll(scroll_amount, x=scroll_x, y=scroll_y)
+        # Hàng đợi di chuyển chuột theo motion profile rồi scroll tại vị trí đã định
+        self._input("scroll", scroll_amount, x=scroll_x, y=scroll_y)
     
     def configure_scroll_position(self, x_percent: float = 0.15, y_percent: float = 0.50):
         """
@@ -624,7 +1450,7 @@ class AutomationCore:
         Returns:
             dict: Thông tin chi tiết về màn hình và vị trí scroll
         """
-        screen_width, screen_height = pyautogui.size()
+        _, _, screen_width, screen_height = self.get_screen_rect()
         scroll_x, scroll_y = self.get_standard_scroll_position()
         
         return {
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Module pipeline chụp màn hình bất đồng bộ: thread chụp và thread detect tách khỏi logic automation
+"""
+import time
+import zlib
+import threading
+import cv2
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from components.image_detector import ImageDetector
+from components.frame_pool import FramePool
+
+
+# Chính sách khi thread detect chưa kịp xử lý frame trước
+DROP_POLICIES = ("latest", "block")
+
+
+class CapturePipeline:
+    """Class chụp màn hình theo chu kỳ và detect các target trên frame mới nhất ở thread riêng"""
+    
+    FINGERPRINT_SIZE = (64, 36)  # Kích thước ảnh thu nhỏ để tính fingerprint frame
+    
+    def __init__(self, image_detector: ImageDetector, targets: Sequence[str] = ("play_button",),
+                 capture_interval: float = 1.0, drop_policy: str = "latest",
+                 region: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Args:
+            image_detector: ImageDetector dùng để detect
+            targets: Các target được detect trên mỗi frame mới
+            capture_interval: Chu kỳ chụp màn hình (giây)
+            drop_policy: "latest" = ghi đè frame chưa được xử lý (chỉ giữ frame mới nhất),
+                "block" = thread chụp đợi thread detect xử lý xong mới chụp tiếp
+            region: Vùng màn hình (x, y, width, height) cần detect, None = toàn màn hình.
+                Khi có region, frame và kết quả detect tính theo tọa độ trong region
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy không hợp lệ: {drop_policy}")
+        
+        self.image_detector = image_detector
+        self.targets = list(targets)
+        self.capture_interval = capture_interval
+        self.drop_policy = drop_policy
+        self.region = region
+        
+        # Các slot frame dùng lại: 1 slot đang publish, 1 slot detect đang đọc, 1 slot đang chụp
+        self.frame_pool = FramePool()
+        self._slots: List[Dict[str, Any]] = [
+            {'index': i, 'sequence': 0, 'timestamp': 0.0, 'fingerprint': None, 'readers': 0}
+            for i in range(3)
+        ]
+        self._latest: Optional[Dict[str, Any]] = None
+        self._processed_sequence = 0
+        self._condition = threading.Condition()
+        
+        # Kết quả detect mới nhất của từng target
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._last_fingerprint: Optional[int] = None
+        
+        self._stop_event = threading.Event()
+        self._capture_thread: Optional[threading.Thread] = None
+        self._detect_thread: Optional[threading.Thread] = None
+        
+        self.stats = {'captured': 0, 'dropped': 0, 'processed': 0, 'unchanged': 0, 'errors': 0}
+    
+    def start(self):
+        """Bắt đầu thread chụp và thread detect"""
+        if self.is_running():
+            return
+        
+        self._stop_event.clear()
+        # Frame do pipeline chụp cũng được ghi vào frame corpus của detector (nếu đang ghi)
+        self.image_detector.add_capture_pool(self.frame_pool)
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._detect_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        self._capture_thread.start()
+        self._detect_thread.start()
+        print(f"🎥 Capture pipeline: chụp mỗi {self.capture_interval}s, "
+              f"targets {', '.join(self.targets)}, drop policy '{self.drop_policy}'")
+    
+    def stop(self):
+        """Dừng pipeline và đợi các thread kết thúc"""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        
+        for thread in (self._capture_thread, self._detect_thread):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=3.0)
+        self._capture_thread = None
+        self._detect_thread = None
+        self.image_detector.remove_capture_pool(self.frame_pool)
+    
+    def is_running(self) -> bool:
+        """Kiểm tra pipeline có đang chạy không"""
+        return self._capture_thread is not None and self._capture_thread.is_alive()
+    
+    def _fingerprint(self, frame: np.ndarray) -> int:
+        """Tính fingerprint của frame từ ảnh thu nhỏ (frame giống nhau cho cùng fingerprint)"""
+        small = cv2.resize(frame, self.FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+        return zlib.crc32(small.tobytes())
+    
+    def _acquire_write_slot(self) -> Optional[Dict[str, Any]]:
+        """Lấy slot trống để chụp frame tiếp theo (gọi khi đang giữ _condition)"""
+        for slot in self._slots:
+            if slot is not self._latest and slot['readers'] == 0:
+                return slot
+        return None
+    
+    def _capture_loop(self):
+        """Thread chụp màn hình theo chu kỳ vào slot trống rồi publish làm frame mới nhất"""
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            
+            with self._condition:
+                # Back-pressure: đợi frame trước được xử lý xong
+                if self.drop_policy == "block":
+                    while (self._latest is not None and self._latest['sequence'] > self._processed_sequence
+                           and not self._stop_event.is_set()):
+                        self._condition.wait(0.5)
+                slot = self._acquire_write_slot()
+            
+            if slot is None or self._stop_event.is_set():
+                self._stop_event.wait(self.capture_interval)
+                continue
+            
+            try:
+                frame = self.frame_pool.capture(("slot", slot['index']))
+                if self.region is not None:
+                    x, y, width, height = self.region
+                    frame = frame[y:y + height, x:x + width]
+                fingerprint = self._fingerprint(frame)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Lỗi khi chụp màn hình: {str(e)}")
+                self._stop_event.wait(self.capture_interval)
+                continue
+            
+            with self._condition:
+                if self._latest is not None and self._latest['sequence'] > self._processed_sequence:
+                    self.stats['dropped'] += 1
+                slot['frame'] = frame
+                slot['sequence'] = self.frame_pool.sequence
+                slot['timestamp'] = time.time()
+                slot['fingerprint'] = fingerprint
+                self._latest = slot
+                self.stats['captured'] += 1
+                self._condition.notify_all()
+            
+            elapsed = time.perf_counter() - started
+            self._stop_event.wait(max(self.capture_interval - elapsed, 0.0))
+    
+    def _detect_loop(self):
+        """Thread detect các targets trên frame mới nhất"""
+        while not self._stop_event.is_set():
+            with self._condition:
+                while ((self._latest is None or self._latest['sequence'] <= self._processed_sequence)
+                       and not self._stop_event.is_set()):
+                    self._condition.wait(0.5)
+                if self._stop_event.is_set():
+                    return
+                slot = self._latest
+                slot['readers'] += 1
+            
+            try:
+                self._process_frame(slot)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Lỗi khi detect trong capture pipeline: {str(e)}")
+            finally:
+                with self._condition:
+                    slot['readers'] -= 1
+                    self._processed_sequence = slot['sequence']
+                    self._condition.notify_all()
+    
+    def _process_frame(self, slot: Dict[str, Any]):
+        """
+        Detect các targets trên một frame và lưu kết quả
+        
+        Frame có fingerprint giống frame trước thì dùng lại kết quả cũ.
+        
+        Args:
+            slot: Slot chứa frame cần xử lý
+        """
+        unchanged = slot['fingerprint'] == self._last_fingerprint and len(self._results) == len(self.targets)
+        results = {}
+        
+        for target in self.targets:
+            if unchanged:
+                result = dict(self._results[target])
+                result['detect_time'] = 0.0
+            else:
+                detect_start = time.perf_counter()
+                # Slot được chụp đè tại chỗ, định danh theo sequence của pool riêng để detector không dùng nhầm cache
+                matches = self.image_detector.detect(target, slot['frame'],
+                                                     frame_id=("capture_pipeline", id(self), slot['sequence']))
+                result = {'matches': matches, 'detect_time': time.perf_counter() - detect_start}
+            result['sequence'] = slot['sequence']
+            result['timestamp'] = slot['timestamp']
+            results[target] = result
+        
+        with self._condition:
+            self._results.update(results)
+            self._last_fingerprint = slot['fingerprint']
+            self.stats['processed'] += 1
+            if unchanged:
+                self.stats['unchanged'] += 1
+    
+    def get_result(self, target: str, newer_than: int = 0,
+                   timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Lấy kết quả detect mới nhất của target
+        
+        Args:
+            target: Tên target (phải nằm trong targets của pipeline)
+            newer_than: Chỉ nhận kết quả của frame có sequence lớn hơn giá trị này
+            timeout: Thời gian chờ tối đa (giây), None = không chờ
+        
+        Returns:
+            Dict gồm matches, sequence, timestamp, detect_time hoặc None nếu chưa có kết quả đủ mới
+        """
+        deadline = time.time() + timeout if timeout else None
+        
+        with self._condition:
+            while True:
+                result = self._results.get(target)
+                if result is not None and result['sequence'] > newer_than:
+                    return dict(result)
+                if deadline is None or self._stop_event.is_set():
+                    return None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+    
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        """
+        Lấy bản copy của frame mới nhất (đã cắt theo region nếu có)
+        
+        Returns:
+            Frame BGR hoặc None nếu chưa chụp được frame nào
+        """
+        with self._condition:
+            if self._latest is None:
+                return None
+            return self._latest['frame'].copy()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Lấy thống kê của pipeline
+        
+        Returns:
+            Dict gồm số frame đã chụp, bị bỏ, đã xử lý, không đổi và số lỗi
+        """
+        return self.stats.copy()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Module xác nhận click lesson đã mở được video (trang thay đổi) với timeout tự điều chỉnh
+"""
+import cv2
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+
+class ClickVerifier:
+    """Class so sánh frame thu nhỏ trước/sau click và học thời gian trang phản hồi để chọn timeout xác nhận"""
+    
+    THUMB_SIZE = (64, 36)      # Kích thước frame thu nhỏ dùng để so sánh
+    CHANGE_THRESHOLD = 4.0     # Chênh lệch trung bình (0 - 255) lớn hơn mức này coi như trang đã chuyển
+    CHECK_INTERVAL = 0.2       # Khoảng giữa hai lần kiểm tra sau click (giây)
+    DEFAULT_TIMEOUT = 4.0      # Timeout khi chưa có lịch sử (giây)
+    MIN_TIMEOUT = 1.5
+    MAX_TIMEOUT = 10.0
+    TIMEOUT_FACTOR = 2.0       # Timeout = thời gian phản hồi chậm (phân vị 90) x hệ số này
+    MAX_RETRIES = 2            # Số lần click lại ngay khi không xác nhận được
+    HISTORY_SIZE = 50          # Số lần phản hồi gần nhất dùng để tính timeout
+    
+    def __init__(self):
+        self._small = np.empty((self.THUMB_SIZE[1], self.THUMB_SIZE[0], 3), dtype=np.uint8)
+        self._gray = np.empty(self._small.shape[:2], dtype=np.uint8)
+        
+        # Thời gian từ lúc click đến lúc thấy trang thay đổi của các lần thành công gần nhất
+        self.latencies: List[float] = []
+        self.stats = {'clicks': 0, 'verified': 0, 'first_try': 0, 'retries': 0, 'failed': 0}
+    
+    def snapshot(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Lấy frame thu nhỏ (grayscale) để so sánh
+        
+        Args:
+            frame: Frame BGR của phiên
+        
+        Returns:
+            Ảnh grayscale THUMB_SIZE (bản copy, không bị ghi đè ở lần sau)
+        """
+        cv2.resize(frame, self.THUMB_SIZE, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray.copy()
+    
+    def changed(self, before: np.ndarray, frame: np.ndarray) -> bool:
+        """
+        Kiểm tra trang đã thay đổi so với trước khi click chưa
+        
+        Args:
+            before: Frame thu nhỏ từ snapshot() trước khi click
+            frame: Frame BGR hiện tại
+        
+        Returns:
+            bool: True nếu chênh lệch vượt CHANGE_THRESHOLD
+        """
+        cv2.resize(frame, self.THUMB_SIZE, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return cv2.norm(self._gray, before, cv2.NORM_L1) / self._gray.size > self.CHANGE_THRESHOLD
+    
+    def get_timeout(self) -> float:
+        """
+        Timeout xác nhận hiện tại, tính từ thời gian phản hồi chậm của các lần trước
+        
+        Returns:
+            Số giây
+        """
+        if not self.latencies:
+            return self.DEFAULT_TIMEOUT
+        slow = float(np.percentile(self.latencies, 90))
+        return min(max(slow * self.TIMEOUT_FACTOR, self.MIN_TIMEOUT), self.MAX_TIMEOUT)
+    
+    def record_attempt(self, verified: bool, latency: Optional[float] = None, attempt: int = 0):
+        """
+        Ghi nhận kết quả của một lần click
+        
+        Args:
+            verified: True nếu đã xác nhận trang chuyển
+            latency: Thời gian từ lúc click đến lúc xác nhận (giây)
+            attempt: Lần click thứ mấy của cùng lesson (0 = lần đầu)
+        """
+        self.stats['clicks'] += 1
+        if attempt > 0:
+            self.stats['retries'] += 1
+        if verified:
+            self.stats['verified'] += 1
+            if attempt == 0:
+                self.stats['first_try'] += 1
+            if latency is not None:
+                self.latencies = (self.latencies + [latency])[-self.HISTORY_SIZE:]
+        elif attempt >= self.MAX_RETRIES:
+            self.stats['failed'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê xác nhận click
+        
+        Returns:
+            Dict gồm số lần click, đã xác nhận, thành công ngay lần đầu, click lại, lesson không mở được,
+            tỉ lệ click thành công, thời gian phản hồi trung bình và timeout hiện tại
+        """
+        stats = self.stats.copy()
+        stats['success_rate'] = stats['verified'] / stats['clicks'] if stats['clicks'] else 1.0
+        stats['mean_latency'] = float(np.mean(self.latencies)) if self.latencies else 0.0
+        stats['timeout'] = self.get_timeout()
+        return stats
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Module đề xuất vị trí ứng viên theo màu của template, để chỉ chạy matchTemplate trong các cửa sổ nhỏ
+"""
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple, Optional, Any
+from components.frame_pool import FramePool
+
+
+class ColorProposals:
+    """Class dựng dải màu HSV từ template, tìm các blob cùng màu trên frame và trả về cửa sổ cần xác nhận"""
+    
+    BACKGROUND_TOLERANCE = 30      # Pixel lệch màu nền (viền template) hơn mức này là pixel của icon
+    MIN_SATURATION = 60            # Pixel có độ bão hòa và độ sáng từ mức này trở lên được nhóm theo hue, còn lại theo độ sáng
+    HUE_BIN = 15                   # Độ rộng nhóm hue (OpenCV: 0 - 179)
+    VALUE_BIN = 64                 # Độ rộng nhóm độ sáng của pixel xám
+    MIN_CLUSTER_FRACTION = 0.15    # Nhóm màu ít hơn tỉ lệ này của icon (viền khử răng cưa) thì bỏ qua
+    RANGE_TOLERANCE = (8, 30, 20)  # Nới dải (H, S, V) quanh phân vị 2 - 98 của nhóm màu
+    BACKGROUND_MARGIN = 10         # Dải màu luôn cách màu nền ít nhất mức này theo độ sáng
+    MASK_SCALE = 2                 # Thu nhỏ mask theo hệ số này trước khi tìm blob (giữ mọi pixel bằng INTER_AREA)
+    MIN_BLOB_SHRINK = 0.5          # Blob hẹp/thấp hơn tỉ lệ này của blob tương ứng trong template (chữ, viền khử răng cưa) thì bỏ qua
+    MAX_BLOB_GROWTH = 3            # Blob rộng/cao hơn blob tương ứng của template quá số lần này (vùng màu lớn) thì bỏ qua
+    MAX_BLOBS = 256                # Quá nhiều blob thì quét cả vùng sẽ rẻ hơn
+    MAX_WINDOW_FRACTION = 0.25     # Tổng diện tích cửa sổ vượt tỉ lệ này của vùng tìm kiếm thì quét cả vùng
+    FALLBACK_SKIP = 10             # Sau một lần phải quét cả vùng, bỏ qua đề xuất theo màu của asset trong số lần detect này
+    
+    def __init__(self, frame_pool: Optional[FramePool] = None):
+        self.frame_pool = frame_pool or FramePool()
+        
+        # Mô hình màu theo asset (None = template không có nhóm màu dùng được)
+        self._models: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Frame HSV theo vùng tìm kiếm, dùng chung cho mọi asset trong cùng một frame
+        self._hsv: Dict[Tuple[int, int, int, int], np.ndarray] = {}
+        # Số lần detect còn bỏ qua đề xuất theo màu của asset (màn hình quá nhiều ứng viên)
+        self._skip: Dict[str, int] = {}
+        self.stats = {'proposals': 0, 'windows': 0, 'empty': 0, 'fallbacks': 0, 'skipped': 0}
+    
+    def new_frame(self):
+        """Báo có frame mới, frame HSV sẽ được tính lại ở lần đề xuất tiếp theo"""
+        self._hsv = {}
+    
+    def invalidate(self, asset_key: str):
+        """Bỏ mô hình màu đã dựng của asset (template vừa thay đổi)"""
+        self._models.pop(asset_key, None)
+        self._skip.pop(asset_key, None)
+    
+    def _build_model(self, template: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Dựng mô hình màu từ template: mỗi nhóm màu chính của icon gồm dải HSV, bounding box
+        của blob lớn nhất trong template và diện tích blob tối thiểu trên frame
+        
+        Args:
+            template: Template BGR
+        
+        Returns:
+            Dict gồm clusters hoặc None nếu template không có nhóm màu nào đủ lớn
+        """
+        border = np.concatenate([template[0], template[-1], template[:, 0], template[:, -1]])
+        background = np.median(border, axis=0)
+        foreground = np.abs(template.astype(np.int16) - background).max(axis=2) > self.BACKGROUND_TOLERANCE
+        total = int(foreground.sum())
+        if total == 0:
+            return None
+        
+        hsv = cv2.cvtColor(template, cv2.COLOR_BGR2HSV)
+        background_value = int(cv2.cvtColor(background.astype(np.uint8).reshape(1, 1, 3), cv2.COLOR_BGR2HSV)[0, 0, 2])
+        colored = (hsv[..., 1] >= self.MIN_SATURATION) & (hsv[..., 2] >= self.MIN_SATURATION)
+        # Pixel có màu nhóm theo hue, pixel xám nhóm theo độ sáng (sau các nhóm hue)
+        bins = np.where(colored, hsv[..., 0] // self.HUE_BIN, 180 // self.HUE_BIN + hsv[..., 2] // self.VALUE_BIN)
+        
+        tolerance = np.array(self.RANGE_TOLERANCE, dtype=np.float64)
+        clusters = []
+        for bin_index in np.unique(bins[foreground]):
+            pixels = foreground & (bins == bin_index)
+            count = int(pixels.sum())
+            if count < total * self.MIN_CLUSTER_FRACTION:
+                continue
+            
+            values = hsv[pixels].astype(np.float64)
+            lower = np.clip(np.percentile(values, 2, axis=0) - tolerance, 0, 255)
+            upper = np.clip(np.percentile(values, 98, axis=0) + tolerance, 0, 255)
+            upper[0] = min(upper[0], 179)
+            if not colored[pixels].any():
+                lower[0], upper[0] = 0, 179
+            
+            # Không để dải màu chứa màu nền, nếu không cả trang sẽ thành một blob
+            if np.median(values[:, 2]) < background_value:
+                upper[2] = min(upper[2], background_value - self.BACKGROUND_MARGIN)
+            else:
+                lower[2] = max(lower[2], background_value + self.BACKGROUND_MARGIN)
+            if lower[2] > upper[2]:
+                continue
+            
+            _, _, blob_stats, _ = cv2.connectedComponentsWithStats(pixels.astype(np.uint8), connectivity=8)
+            largest = 1 + int(np.argmax(blob_stats[1:, cv2.CC_STAT_AREA]))
+            x, y, width, height, area = (int(value) for value in blob_stats[largest])
+            clusters.append({
+                'lower': lower.astype(np.uint8),
+                'upper': upper.astype(np.uint8),
+                'anchor': (x, y, x + width - 1, y + height - 1),
+                'min_area': max(area // 2, 1)
+            })
+        
+        return {'clusters': clusters} if clusters else None
+    
+    def _get_model(self, asset_key: str, template: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Lấy (hoặc dựng) mô hình màu của asset"""
+        if asset_key not in self._models:
+            self._models[asset_key] = self._build_model(template)
+        return self._models[asset_key]
+    
+    def _get_hsv(self, region: np.ndarray, bounds: Tuple[int, int, int, int]) -> np.ndarray:
+        """Frame HSV của vùng tìm kiếm, chỉ chuyển đổi một lần cho mỗi frame"""
+        hsv = self._hsv.get(bounds)
+        if hsv is None:
+            hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV, dst=self.frame_pool.get(("hsv", bounds), region.shape))
+            self._hsv[bounds] = hsv
+        return hsv
+    
+    def _find_blobs(self, hsv: np.ndarray, cluster: Dict[str, Any],
+                    bounds: Tuple[int, int, int, int]) -> np.ndarray:
+        """
+        Tìm các blob cùng màu với nhóm màu có kích thước gần với blob tương ứng của template
+        
+        Mask được thu nhỏ MASK_SCALE lần trước khi tìm blob: ô nhỏ khác 0 nếu có ít nhất một pixel khớp màu,
+        diện tích blob thu nhỏ không dưới 1/MASK_SCALE^2 diện tích thật nên không bỏ sót blob đủ lớn.
+        
+        Args:
+            hsv: Vùng tìm kiếm dạng HSV
+            cluster: Nhóm màu trong mô hình
+            bounds: Vùng tìm kiếm (key của buffers)
+        
+        Returns:
+            Mảng stats (x, y, width, height, area) của các blob theo tọa độ mask thu nhỏ
+        """
+        scale = self.MASK_SCALE
+        mask = cv2.inRange(hsv, cluster['lower'], cluster['upper'],
+                           dst=self.frame_pool.get(("color_mask", bounds), hsv.shape[:2]))
+        small_size = (max(hsv.shape[1] // scale, 1), max(hsv.shape[0] // scale, 1))
+        small = cv2.resize(mask, small_size, interpolation=cv2.INTER_AREA,
+                           dst=self.frame_pool.get(("color_mask_small", bounds), small_size[::-1]))
+        _, _, blob_stats, _ = cv2.connectedComponentsWithStats(small, connectivity=8)
+        
+        anchor_x0, anchor_y0, anchor_x1, anchor_y1 = cluster['anchor']
+        anchor_width, anchor_height = anchor_x1 - anchor_x0 + 1, anchor_y1 - anchor_y0 + 1
+        widths = blob_stats[1:, cv2.CC_STAT_WIDTH]
+        heights = blob_stats[1:, cv2.CC_STAT_HEIGHT]
+        keep = ((blob_stats[1:, cv2.CC_STAT_AREA] >= max(cluster['min_area'] // (scale * scale), 1))
+                & (widths >= int(anchor_width * self.MIN_BLOB_SHRINK) // scale)
+                & (heights >= int(anchor_height * self.MIN_BLOB_SHRINK) // scale)
+                & (widths <= anchor_width * self.MAX_BLOB_GROWTH // scale + 1)
+                & (heights <= anchor_height * self.MAX_BLOB_GROWTH // scale + 1))
+        return blob_stats[1:][keep]
+    
+    def propose(self, asset_key: str, template: np.ndarray, region: np.ndarray,
+                bounds: Tuple[int, int, int, int]) -> Optional[List[Tuple[int, int, int, int]]]:
+        """
+        Tìm các cửa sổ trong vùng tìm kiếm có thể chứa template
+        
+        Chọn nhóm màu của template cho ít blob nhất trên frame; mỗi blob của nhóm màu đó sinh ra một cửa sổ
+        chứa mọi vị trí template mà blob lớn nhất của nhóm màu trong template có thể chồng lên blob.
+        
+        Args:
+            asset_key: Key của asset (cache mô hình màu)
+            template: Template BGR
+            region: Vùng tìm kiếm của frame (BGR)
+            bounds: Vùng tìm kiếm (x0, y0, x1, y1) theo pixel, dùng làm key cache
+        
+        Returns:
+            List cửa sổ (x0, y0, x1, y1) theo tọa độ của region ([] = chắc chắn không có template),
+            None nếu không dùng được đề xuất theo màu (nên quét cả vùng)
+        """
+        model = self._get_model(asset_key, template)
+        if model is None:
+            return None
+        if self._skip.get(asset_key, 0) > 0:
+            self._skip[asset_key] -= 1
+            self.stats['skipped'] += 1
+            return None
+        
+        hsv = self._get_hsv(region, bounds)
+        
+        best = None
+        for cluster in model['clusters']:
+            blobs = self._find_blobs(hsv, cluster, bounds)
+            if len(blobs) == 0:
+                self.stats['empty'] += 1
+                return []
+            if best is None or len(blobs) < len(best[1]):
+                best = (cluster, blobs)
+        
+        cluster, blobs = best
+        if len(blobs) > self.MAX_BLOBS:
+            return self._fallback(asset_key)
+        
+        # Cửa sổ của mỗi blob: mọi vị trí template mà blob lớn nhất (anchor) chồng lên blob
+        template_height, template_width = template.shape[:2]
+        region_height, region_width = region.shape[:2]
+        anchor_x0, anchor_y0, anchor_x1, anchor_y1 = cluster['anchor']
+        scale = self.MASK_SCALE
+        windows = []
+        for x, y, width, height, _ in blobs.tolist():
+            windows.append((max(x * scale - anchor_x1, 0),
+                            max(y * scale - anchor_y1, 0),
+                            min((x + width) * scale - anchor_x0 + template_width, region_width),
+                            min((y + height) * scale - anchor_y0 + template_height, region_height)))
+        windows = [window for window in self._merge_windows(windows)
+                   if window[2] - window[0] >= template_width and window[3] - window[1] >= template_height]
+        
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in windows)
+        if area > region_height * region_width * self.MAX_WINDOW_FRACTION:
+            return self._fallback(asset_key)
+        
+        self.stats['proposals'] += 1
+        self.stats['windows'] += len(windows)
+        return windows
+    
+    def _fallback(self, asset_key: str) -> None:
+        """Ghi nhận phải quét cả vùng và tạm bỏ qua đề xuất theo màu của asset trong FALLBACK_SKIP lần detect"""
+        self.stats['fallbacks'] += 1
+        self._skip[asset_key] = self.FALLBACK_SKIP
+        return None
+    
+    @staticmethod
+    def _merge_windows(windows: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """
+        Gộp các cửa sổ chồng nhau khi cửa sổ gộp không lớn hơn tổng hai cửa sổ (matchTemplate một lần rẻ hơn)
+        
+        Args:
+            windows: List cửa sổ (x0, y0, x1, y1)
+        
+        Returns:
+            List cửa sổ đã gộp
+        """
+        merged: List[Tuple[int, int, int, int]] = []
+        for window in sorted(windows):
+            x0, y0, x1, y1 = window
+            # Gộp lặp lại vì cửa sổ vừa mở rộng có thể chồng lên các cửa sổ đã giữ trước đó
+            overlapping = True
+            while overlapping:
+                overlapping = False
+                for index, (mx0, my0, mx1, my1) in enumerate(merged):
+                    union = (max(x1, mx1) - min(x0, mx0)) * (max(y1, my1) - min(y0, my0))
+                    if (x0 < mx1 and mx0 < x1 and y0 < my1 and my0 < y1
+                            and union <= (x1 - x0) * (y1 - y0) + (mx1 - mx0) * (my1 - my0)):
+                        x0, y0, x1, y1 = min(x0, mx0), min(y0, my0), max(x1, mx1), max(y1, my1)
+                        del merged[index]
+                        overlapping = True
+                        break
+            merged.append((x0, y0, x1, y1))
+        return merged
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê đề xuất theo màu
+        
+        Returns:
+            Dict gồm số lần đề xuất được, tổng số cửa sổ, số lần không có ứng viên,
+            số lần phải quét cả vùng, số lần bỏ qua và số cửa sổ trung bình mỗi lần
+        """
+        stats = self.stats.copy()
+        stats['mean_windows'] = stats['windows'] / stats['proposals'] if stats['proposals'] else 0.0
+        return stats
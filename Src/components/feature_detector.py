@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Module detect hình ảnh bằng keypoints/descriptors (ORB, AKAZE) thay cho template matching
+"""
+import threading
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple, Optional, Any
+from components.asset_manager import AssetManager
+
+
+class FeatureDetector:
+    """Class detect assets bằng cách so khớp descriptors của template với descriptors của frame"""
+    
+    TEMPLATE_BORDER = 16     # Viền thêm quanh template để lấy được keypoints sát mép
+    RATIO_TEST = 0.75        # Lowe's ratio test
+    MIN_GOOD_MATCHES = 6     # Số cặp khớp tối thiểu để ước lượng homography
+    RANSAC_THRESHOLD = 5.0   # Sai số reprojection tối đa (pixel)
+    MAX_INSTANCES = 16       # Số vị trí tối đa tìm cho một asset trong một frame
+    MIN_SCALE = 0.25         # Loại homography co/giãn bất thường
+    MAX_SCALE = 4.0
+    
+    def __init__(self, asset_manager: AssetManager):
+        self.asset_manager = asset_manager
+        
+        # Descriptors của template tính một lần cho mỗi (asset, engine)
+        self._template_features: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        # Descriptors của frame hiện tại theo (engine, vùng ROI), xóa khi có frame mới
+        self._frame_gray: Optional[np.ndarray] = None
+        self._frame_features: Dict[Tuple[str, Tuple[int, int, int, int]], Tuple[List, Optional[np.ndarray]]] = {}
+        self._lock = threading.Lock()
+        
+        # Extractors (cho template, cho frame) theo engine, tạo khi cần
+        self._extractors: Dict[str, Optional[Tuple[Any, Any]]] = {}
+        # Cả ORB và AKAZE (MLDB) đều là descriptors nhị phân
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    
+    def _get_extractors(self, engine: str) -> Optional[Tuple[Any, Any]]:
+        """
+        Lấy cặp extractor (cho template, cho frame) của engine
+        
+        Args:
+            engine: "orb" hoặc "akaze"
+        
+        Returns:
+            Tuple (extractor template, extractor frame) hoặc None nếu bản OpenCV không hỗ trợ
+        """
+        if engine not in self._extractors:
+            extractors = None
+            if engine == "orb":
+                extractors = (cv2.ORB_create(nfeatures=500, edgeThreshold=15, patchSize=15),
+                              cv2.ORB_create(nfeatures=5000, edgeThreshold=15, patchSize=15))
+            elif engine == "akaze" and hasattr(cv2, "AKAZE_create"):
+                extractors = (cv2.AKAZE_create(), cv2.AKAZE_create())
+            
+            if extractors is None:
+                print(f"❌ Bản OpenCV hiện tại không hỗ trợ engine '{engine}'")
+            self._extractors[engine] = extractors
+        
+        return self._extractors[engine]
+    
+    def new_frame(self):
+        """Xóa descriptors của frame trước, gọi mỗi khi có frame mới"""
+        with self._lock:
+            self._frame_gray = None
+            self._frame_features = {}
+    
+    def invalidate(self, asset_key: Optional[str] = None):
+        """
+        Xóa descriptors đã cache của template
+        
+        Args:
+            asset_key: Asset cần xóa, None = tất cả
+        """
+        with self._lock:
+            if asset_key is None:
+                self._template_features = {}
+            else:
+                for key in [k for k in self._template_features if k[0] == asset_key]:
+                    del self._template_features[key]
+    
+    def _get_template_features(self, asset_key: str, engine: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy keypoints/descriptors của template (tính một lần rồi cache)
+        
+        Args:
+            asset_key: Key của asset
+            engine: "orb" hoặc "akaze"
+        
+        Returns:
+            Dict gồm points (tọa độ keypoints trong template), descriptors, size
+            hoặc None nếu template không có đủ keypoints
+        """
+        cache_key = (asset_key, engine)
+        if cache_key in self._template_features:
+            return self._template_features[cache_key]
+        
+        features = None
+        template = self.asset_manager.get_asset_template(asset_key)
+        if template is not None:
+            gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            border = self.TEMPLATE_BORDER
+            padded = cv2.copyMakeBorder(gray, border, border, border, border, cv2.BORDER_REPLICATE)
+            keypoints, descriptors = self._get_extractors(engine)[0].detectAndCompute(padded, None)
+            
+            if descriptors is not None and len(keypoints) >= self.MIN_GOOD_MATCHES:
+                points = np.float32([kp.pt for kp in keypoints]) - border
+                features = {
+                    'points': points,
+                    'descriptors': descriptors,
+                    'size': (template.shape[1], template.shape[0])
+                }
+            else:
+                print(f"⚠️ Asset '{asset_key}' có quá ít keypoints cho engine {engine}, "
+                      f"nên dùng engine template")
+        
+        self._template_features[cache_key] = features
+        return features
+    
+    def _get_frame_features(self, frame: np.ndarray, engine: str,
+                            bounds: Tuple[int, int, int, int]) -> Tuple[List, Optional[np.ndarray]]:
+        """
+        Lấy keypoints/descriptors của vùng bounds trong frame (mỗi frame chỉ tính một lần,
+        người gọi phải gọi new_frame() khi chuyển sang frame mới)
+        
+        Args:
+            frame: Screenshot dạng OpenCV
+            engine: "orb" hoặc "akaze"
+            bounds: Vùng (x0, y0, x1, y1) theo pixel
+        
+        Returns:
+            Tuple (keypoints, descriptors) với tọa độ keypoints theo màn hình
+        """
+        if self._frame_gray is None:
+            self._frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        cache_key = (engine, bounds)
+        if cache_key not in self._frame_features:
+            x0, y0, x1, y1 = bounds
+            keypoints, descriptors = self._get_extractors(engine)[1].detectAndCompute(
+                self._frame_gray[y0:y1, x0:x1], None)
+            points = [(kp.pt[0] + x0, kp.pt[1] + y0) for kp in keypoints]
+            self._frame_features[cache_key] = (points, descriptors)
+        
+        return self._frame_features[cache_key]
+    
+    def match_asset(self, frame: np.ndarray, asset_info,
+                    bounds: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int, float]]:
+        """
+        Detect một asset bằng descriptors trong vùng bounds của frame
+        
+        Mỗi keypoint của frame được so với descriptors của template (ratio test),
+        sau đó lặp RANSAC homography để tách từng vị trí xuất hiện của asset.
+        Độ khớp là tỉ lệ inliers trên số keypoints của template.
+        
+        Args:
+            frame: Screenshot dạng OpenCV
+            asset_info: AssetInfo chứa cấu hình detect (engine, threshold, match_mode)
+            bounds: Vùng tìm kiếm (x0, y0, x1, y1) theo pixel
+        
+        Returns:
+            List (x, y, width, height, score) theo tọa độ màn hình
+        """
+        engine = asset_info.engine
+        
+        with self._lock:
+            if self._get_extractors(engine) is None:
+                return []
+            template_features = self._get_template_features(asset_info.name, engine)
+            if template_features is None:
+                return []
+            frame_points, frame_descriptors = self._get_frame_features(frame, engine, bounds)
+        
+        if frame_descriptors is None or len(frame_points) < self.MIN_GOOD_MATCHES:
+            return []
+        
+        # So khớp frame -> template để nhiều vị trí giống nhau không làm hỏng ratio test
+        good = []
+        for pair in self._matcher.knnMatch(frame_descriptors, template_features['descriptors'], k=2):
+            if len(pair) == 2 and pair[0].distance < self.RATIO_TEST * pair[1].distance:
+                good.append(pair[0])
+        
+        template_points = template_features['points']
+        template_width, template_height = template_features['size']
+        corners = np.float32([[0, 0], [template_width, 0],
+                              [template_width, template_height], [0, template_height]]).reshape(-1, 1, 2)
+        max_instances = 1 if asset_info.match_mode == "best" else self.MAX_INSTANCES
+        
+        matches = []
+        while len(good) >= self.MIN_GOOD_MATCHES and len(matches) < max_instances:
+            src = np.float32([template_points[m.trainIdx] for m in good]).reshape(-1, 1, 2)
+            dst = np.float32([frame_points[m.queryIdx] for m in good]).reshape(-1, 1, 2)
+            homography, inlier_mask = cv2.findHomography(src, dst, cv2.RANSAC, self.RANSAC_THRESHOLD)
+            if homography is None:
+                break
+            
+            inlier_mask = inlier_mask.ravel().astype(bool)
+            inliers = int(inlier_mask.sum())
+            if inliers < self.MIN_GOOD_MATCHES:
+                break
+            
+            projected = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+            x, y, w, h = cv2.boundingRect(projected)
+            scale = np.sqrt(max(w * h, 1) / float(template_width * template_height))
+            score = min(inliers / float(len(template_points)), 1.0)
+            if self.MIN_SCALE <= scale <= self.MAX_SCALE and score >= asset_info.threshold:
+                matches.append((x, y, w, h, score))
+            
+            # Bỏ các inliers đã dùng để tìm vị trí tiếp theo
+            good = [m for m, used in zip(good, inlier_mask) if not used]
+        
+        return matches
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Module flight recorder: giữ trong bộ nhớ các frame thu nhỏ và quyết định gần nhất để phân tích khi automation bị kẹt
+"""
+import os
+import json
+import time
+import shutil
+import threading
+import cv2
+import numpy as np
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+
+class FlightRecorder:
+    """Class ghi các frame (thu nhỏ) và sự kiện vào ring buffer cố định, chỉ nén JPEG và ghi đĩa khi dump"""
+    
+    MAX_DUMPS = 20  # Số lần dump giữ lại trên đĩa, cũ hơn sẽ bị xóa
+    
+    def __init__(self, frame_capacity: int = 60, event_capacity: int = 1000,
+                 scale: float = 0.25, jpeg_quality: int = 60,
+                 dump_path: str = os.path.join("Data", "flight_recorder")):
+        """
+        Args:
+            frame_capacity: Số frame gần nhất được giữ
+            event_capacity: Số sự kiện (detect, thao tác, log) gần nhất được giữ
+            scale: Tỉ lệ thu nhỏ frame trước khi nén
+            jpeg_quality: Chất lượng JPEG (0 - 100)
+            dump_path: Thư mục chứa các lần dump
+        """
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self.dump_path = dump_path
+        self.enabled = True
+        
+        # Ring buffers: deque có maxlen tự bỏ phần tử cũ nhất, bộ nhớ không tăng theo thời gian chạy
+        self._frames: deque = deque(maxlen=frame_capacity)
+        self._events: deque = deque(maxlen=event_capacity)
+        self._frame_id = 0
+        self._lock = threading.Lock()
+        
+        self.stats = {'frames': 0, 'events': 0, 'dumps': 0, 'resize_time': 0.0, 'encode_time': 0.0}
+    
+    def record_frame(self, frame: Optional[np.ndarray], target: str, detections: Any,
+                     detect_time: float, **info) -> Optional[int]:
+        """
+        Ghi một lần detect: frame thu nhỏ kèm kết quả detect và thời gian
+        
+        Frame chỉ được thu nhỏ vào buffer của ring buffer (không nén), nên có thể truyền thẳng
+        buffer chụp dùng lại của detector.
+        
+        Args:
+            frame: Frame đã detect (None = chỉ ghi kết quả, ví dụ kết quả lấy từ capture pipeline)
+            target: Target đã detect
+            detections: Kết quả detect (bbox, list bbox hoặc None)
+            detect_time: Thời gian detect (giây)
+            **info: Thông tin thêm của tick (ví dụ region, sequence)
+        
+        Returns:
+            Id của frame đã ghi hoặc None
+        """
+        if not self.enabled:
+            return None
+        
+        frame_id = None
+        if frame is not None:
+            resize_start = time.perf_counter()
+            height, width = frame.shape[:2]
+            size = (max(int(width * self.scale), 1), max(int(height * self.scale), 1))
+            shape = (size[1], size[0]) + frame.shape[2:]
+            with self._lock:
+                # Ring buffer đầy: dùng lại mảng của frame cũ nhất sắp bị bỏ
+                small = self._frames[0][1] if len(self._frames) == self._frames.maxlen else None
+                if small is None or small.shape != shape or small.dtype != frame.dtype:
+                    small = np.empty(shape, dtype=frame.dtype)
+                cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+                self._frame_id += 1
+                frame_id = self._frame_id
+                self._frames.append((frame_id, small))
+                self.stats['frames'] += 1
+                self.stats['resize_time'] += time.perf_counter() - resize_start
+        
+        self.record_event("detect", target=target, detections=self._plain(detections),
+                          detect_time=round(detect_time, 4), frame=frame_id, **info)
+        return frame_id
+    
+    @classmethod
+    def _plain(cls, value: Any) -> Any:
+        """Đổi bbox (tuple, numpy int) sang kiểu Python thuần để ghi JSON"""
+        if isinstance(value, (list, tuple)):
+            return [cls._plain(item) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+    
+    def record_event(self, kind: str, **info):
+        """
+        Ghi một sự kiện (thao tác chuột, quyết định, log, ...)
+        
+        Args:
+            kind: Loại sự kiện ("detect", "action", "log", ...)
+            **info: Dữ liệu của sự kiện (phải chuyển được sang JSON)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._events.append({'time': time.time(), 'kind': kind, **info})
+            self.stats['events'] += 1
+    
+    def dump(self, reason: str, detail: Optional[str] = None, name: str = "main") -> Optional[str]:
+        """
+        Ghi toàn bộ nội dung ring buffer ra đĩa
+        
+        Args:
+            reason: Lý do dump (ví dụ "loop_detected", "exception")
+            detail: Thông tin thêm (ví dụ traceback)
+            name: Tên phiên automation
+        
+        Returns:
+            Đường dẫn thư mục dump hoặc None nếu lỗi
+        """
+        with self._lock:
+            # Nén ngay trong lock vì mảng của frame có thể bị dùng lại cho frame mới
+            encode_start = time.perf_counter()
+            frames = []
+            for frame_id, small in self._frames:
+                ok, encoded = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if ok:
+                    frames.append((frame_id, encoded.tobytes()))
+            self.stats['encode_time'] += time.perf_counter() - encode_start
+            events = list(self._events)
+        
+        directory = os.path.join(self.dump_path, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{reason}")
+        try:
+            os.makedirs(os.path.join(directory, "frames"), exist_ok=True)
+            for frame_id, data in frames:
+                with open(os.path.join(directory, "frames", f"{frame_id:06d}.jpg"), "wb") as f:
+                    f.write(data)
+            
+            with open(os.path.join(directory, "events.jsonl"), "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            
+            with open(os.path.join(directory, "summary.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    'reason': reason,
+                    'detail': detail,
+                    'session': name,
+                    'dumped_at': time.time(),
+                    'frames': len(frames),
+                    'events': len(events)
+                }, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"❌ Lỗi khi dump flight recorder: {str(e)}")
+            return None
+        
+        self.stats['dumps'] += 1
+        self._prune_dumps()
+        print(f"🛩️ Flight recorder: đã dump {len(frames)} frames, {len(events)} sự kiện vào {directory}")
+        return directory
+    
+    def _prune_dumps(self):
+        """Xóa các lần dump cũ, chỉ giữ MAX_DUMPS lần gần nhất"""
+        try:
+            dumps = sorted(entry for entry in os.listdir(self.dump_path)
+                           if os.path.isdir(os.path.join(self.dump_path, entry)))
+        except OSError:
+            return
+        for entry in dumps[:-self.MAX_DUMPS]:
+            shutil.rmtree(os.path.join(self.dump_path, entry), ignore_errors=True)
+    
+    def get_events(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Lấy các sự kiện đang giữ trong bộ nhớ
+        
+        Args:
+            kind: Chỉ lấy một loại sự kiện (None = tất cả)
+        
+        Returns:
+            List sự kiện từ cũ đến mới
+        """
+        with self._lock:
+            events = list(self._events)
+        return [event for event in events if kind is None or event['kind'] == kind]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê của flight recorder
+        
+        Returns:
+            Dict gồm số frame/sự kiện đã ghi, số lần dump, tổng thời gian thu nhỏ và nén, số bytes đang giữ
+        """
+        with self._lock:
+            stats = self.stats.copy()
+            stats['frames_held'] = len(self._frames)
+            stats['events_held'] = len(self._events)
+            stats['bytes_held'] = sum(small.nbytes for _, small in self._frames)
+        return stats
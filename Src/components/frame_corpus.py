@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Module lưu nhiều frame màn hình vào một file memory-mapped (kèm index) để benchmark / hiệu chỉnh offline
+"""
+import os
+import time
+import threading
+import cv2
+import numpy as np
+from typing import Dict, Any, Iterator, List, Optional
+from components.frame_pool import FramePool
+
+
+# Mỗi frame một bản ghi cố định trong file index (.idx)
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),      # Vị trí dữ liệu frame trong file corpus
+    ('length', '<u8'),      # Số bytes dữ liệu
+    ('timestamp', '<f8'),   # Thời điểm chụp
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u1'),
+    ('kind', '<u1'),        # 0 = keyframe (ảnh đầy đủ), 1 = delta (các tile thay đổi so với frame trước)
+    ('tiles', '<u4'),       # Số tile thay đổi của frame delta
+    ('keyframe', '<u4'),    # Index của keyframe mà frame delta dựa vào
+])
+
+KIND_KEYFRAME = 0
+KIND_DELTA = 1
+
+
+class FrameCorpus:
+    """Class ghi / đọc frames trong một file corpus memory-mapped, đọc keyframe không cần copy"""
+    
+    MAGIC = b"AUTOSICF"
+    VERSION = 1
+    HEADER_SIZE = 16
+    TILE_SIZE = 32             # Kích thước tile của frame delta (pixel)
+    KEYFRAME_INTERVAL = 100    # Sau số frame delta này thì ghi keyframe để đọc ngẫu nhiên nhanh
+    MAX_DELTA_FRACTION = 0.5   # Quá tỉ lệ tile thay đổi này thì ghi keyframe thay cho delta
+    
+    def __init__(self, path: str, delta: bool = True):
+        """
+        Args:
+            path: Đường dẫn file corpus (index nằm ở path + ".idx"), đã có thì ghi tiếp vào cuối
+            delta: Ghi frame dưới dạng delta so với frame trước khi có thể
+        """
+        self.path = path
+        self.index_path = path + ".idx"
+        self.delta = delta
+        
+        # Trạng thái ghi
+        self._data_file = None
+        self._index_file = None
+        self._previous: Optional[np.ndarray] = None
+        self._last_keyframe = 0
+        self._write_lock = threading.Lock()
+        self._buffers = FramePool()
+        
+        # Trạng thái đọc: memmap và frame đang dựng lại từ keyframe + các delta
+        self._index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._appended: List[np.ndarray] = []  # Bản ghi index mới, gộp vào _index khi đọc
+        self._data: Optional[np.memmap] = None
+        self._decoded: Optional[np.ndarray] = None
+        self._decoded_position = -1
+        self._decoded_keyframe = -1
+        
+        # Ghi theo chu kỳ từ các FramePool (detector, capture pipeline)
+        self._frame_pools: List[FramePool] = []
+        self._record_every = 1
+        self._capture_count = 0
+        
+        self.stats = {'appended': 0, 'keyframes': 0, 'deltas': 0, 'bytes': 0, 'errors': 0}
+        
+        if os.path.exists(self.path):
+            self._check_header()
+            self._load_index()
+    
+    def _check_header(self):
+        """Kiểm tra header của file corpus có sẵn"""
+        with open(self.path, "rb") as f:
+            header = f.read(self.HEADER_SIZE)
+        if header[:8] != self.MAGIC:
+            raise ValueError(f"File không phải frame corpus: {self.path}")
+        version, tile_size = np.frombuffer(header[8:16], dtype='<u4')
+        if version != self.VERSION or tile_size != self.TILE_SIZE:
+            raise ValueError(f"Frame corpus không tương thích (version {version}, tile {tile_size}): {self.path}")
+    
+    def _open_for_write(self):
+        """Mở file corpus và index để ghi tiếp vào cuối"""
+        if self._data_file is not None:
+            return
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        if os.path.exists(self.path):
+            self._truncate_tail()
+        self._data_file = open(self.path, "ab")
+        if self._data_file.tell() == 0:
+            self._data_file.write(self.MAGIC + np.array([self.VERSION, self.TILE_SIZE], dtype='<u4').tobytes())
+        self._index_file = open(self.index_path, "ab")
+    
+    def _truncate_tail(self):
+        """
+        Cắt phần ghi dở ở cuối file index và file corpus (lần ghi trước bị ngắt) trước khi ghi tiếp,
+        nếu không các bản ghi mới sẽ lệch vị trí so với bản ghi index
+        """
+        index_size = len(self._index) * INDEX_DTYPE.itemsize
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > index_size:
+            os.truncate(self.index_path, index_size)
+        
+        data_end = self.HEADER_SIZE
+        if len(self._index):
+            data_end = int(self._index['offset'][-1]) + int(self._index['length'][-1])
+        if os.path.getsize(self.path) > data_end:
+            self._data = None
+            os.truncate(self.path, data_end)
+    
+    def _changed_tiles(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Tìm các tile thay đổi so với frame trước
+        
+        Returns:
+            Mảng index (theo thứ tự row-major) của các tile thay đổi, None nếu phải ghi keyframe
+        """
+        previous = self._previous
+        if (not self.delta or previous is None or previous.shape != frame.shape
+                or self._count() - self._last_keyframe >= self.KEYFRAME_INTERVAL):
+            return None
+        
+        tile = self.TILE_SIZE
+        height, width = frame.shape[:2]
+        tiles_y = (height + tile - 1) // tile
+        tiles_x = (width + tile - 1) // tile
+        
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        
+        # Diff ghi vào buffer làm tròn lên bội số của tile (phần thừa luôn bằng 0), lấy max theo hàng trước
+        diff = self._buffers.get(("diff", frame.shape), (tiles_y * tile, tiles_x * tile) + frame.shape[2:])
+        diff[height:] = 0
+        diff[:height, width:] = 0
+        cv2.absdiff(previous, frame, dst=diff[:height, :width])
+        row_max = self._buffers.get(("diff_rows", frame.shape), (tiles_y * tile, tiles_x))
+        np.max(diff.reshape(tiles_y * tile, tiles_x, tile * channels), axis=2, out=row_max)
+        changed = row_max.reshape(tiles_y, tile, tiles_x).max(axis=1) > 0
+        
+        if changed.mean() > self.MAX_DELTA_FRACTION:
+            return None
+        return np.flatnonzero(changed).astype('<u4')
+    
+    def _tile_slices(self, tile_index: int, width: int, height: int):
+        """Vùng pixel (slice y, slice x) của một tile"""
+        tile = self.TILE_SIZE
+        tiles_x = (width + tile - 1) // tile
+        ty, tx = divmod(int(tile_index), tiles_x)
+        return slice(ty * tile, min((ty + 1) * tile, height)), slice(tx * tile, min((tx + 1) * tile, width))
+    
+    def append(self, frame: np.ndarray, timestamp: Optional[float] = None) -> int:
+        """
+        Ghi thêm một frame vào cuối corpus
+        
+        Args:
+            frame: Frame (BGR hoặc grayscale, uint8)
+            timestamp: Thời điểm chụp (None = hiện tại)
+        
+        Returns:
+            Index của frame trong corpus
+        """
+        if frame.dtype != np.uint8:
+            raise ValueError("Frame corpus chỉ lưu ảnh uint8")
+        
+        with self._write_lock:
+            self._open_for_write()
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            position = self._count()
+            
+            tiles = self._changed_tiles(frame)
+            record = np.zeros(1, dtype=INDEX_DTYPE)
+            record['offset'] = self._data_file.tell()
+            record['timestamp'] = timestamp if timestamp is not None else time.time()
+            record['height'], record['width'], record['channels'] = height, width, channels
+            
+            if tiles is None:
+                self._data_file.write(np.ascontiguousarray(frame).data)
+                record['kind'] = KIND_KEYFRAME
+                record['keyframe'] = position
+                self._last_keyframe = position
+                self.stats['keyframes'] += 1
+            else:
+                # Delta: danh sách index tile rồi tới dữ liệu pixel của từng tile theo cùng thứ tự
+                self._data_file.write(tiles.tobytes())
+                for tile_index in tiles:
+                    ys, xs = self._tile_slices(tile_index, width, height)
+                    self._data_file.write(np.ascontiguousarray(frame[ys, xs]).data)
+                record['kind'] = KIND_DELTA
+                record['tiles'] = len(tiles)
+                record['keyframe'] = self._last_keyframe
+                self.stats['deltas'] += 1
+            
+            record['length'] = self._data_file.tell() - int(record['offset'][0])
+            self._index_file.write(record.tobytes())
+            self._appended.append(record)
+            
+            if self._previous is None or self._previous.shape != frame.shape:
+                self._previous = frame.copy()
+            else:
+                np.copyto(self._previous, frame)
+            
+            self.stats['appended'] += 1
+            self.stats['bytes'] += int(record['length'][0])
+            return position
+    
+    def flush(self):
+        """Đẩy dữ liệu đã ghi xuống đĩa"""
+        with self._write_lock:
+            if self._data_file is not None:
+                self._data_file.flush()
+                self._index_file.flush()
+    
+    def close(self):
+        """Ngừng ghi theo FramePool và đóng các file"""
+        self.detach()
+        with self._write_lock:
+            if self._data_file is not None:
+                self._data_file.close()
+                self._index_file.close()
+                self._data_file = None
+                self._index_file = None
+        self._data = None
+    
+    def attach(self, frame_pool: FramePool, every: int = 1):
+        """
+        Ghi các frame được chụp bởi FramePool (cùng đường chụp mà ImageDetector dùng),
+        có thể gắn nhiều FramePool vào cùng một corpus
+        
+        Args:
+            frame_pool: FramePool cần ghi theo
+            every: Chỉ ghi 1 trong mỗi every lần chụp (tính chung cho mọi FramePool)
+        """
+        if frame_pool not in self._frame_pools:
+            self._frame_pools.append(frame_pool)
+        self._record_every = max(every, 1)
+        frame_pool.set_capture_callback(self._on_capture)
+    
+    def detach(self, frame_pool: Optional[FramePool] = None):
+        """
+        Ngừng ghi theo FramePool
+        
+        Args:
+            frame_pool: FramePool cần ngừng ghi (None = tất cả)
+        """
+        pools = self._frame_pools if frame_pool is None else [frame_pool]
+        for pool in list(pools):
+            if pool in self._frame_pools:
+                pool.set_capture_callback(None)
+                self._frame_pools.remove(pool)
+    
+    def _on_capture(self, frame: np.ndarray):
+        """Nhận frame vừa chụp từ FramePool"""
+        self._capture_count += 1
+        if (self._capture_count - 1) % self._record_every:
+            return
+        try:
+            self.append(frame)
+        except (OSError, ValueError) as e:
+            self.stats['errors'] += 1
+            print(f"❌ Lỗi khi ghi frame corpus: {str(e)}")
+    
+    def _count(self) -> int:
+        """Số frame trong corpus (kể cả các frame vừa ghi)"""
+        return len(self._index) + len(self._appended)
+    
+    def _sync_index(self) -> np.ndarray:
+        """Gộp các bản ghi index vừa ghi vào mảng index dùng để đọc"""
+        if self._appended:
+            with self._write_lock:
+                self._index = np.concatenate([self._index] + self._appended)
+                self._appended = []
+        return self._index
+    
+    def _load_index(self):
+        """Đọc file index (bỏ bản ghi cuối nếu bị ghi dở hoặc trỏ ra ngoài dữ liệu đã ghi)"""
+        if not os.path.exists(self.index_path):
+            self._index = np.zeros(0, dtype=INDEX_DTYPE)
+            return
+        raw = np.fromfile(self.index_path, dtype=np.uint8)
+        usable = len(raw) - len(raw) % INDEX_DTYPE.itemsize
+        index = raw[:usable].view(INDEX_DTYPE)
+        beyond = np.flatnonzero(index['offset'] + index['length'] > os.path.getsize(self.path))
+        self._index = index[:beyond[0] if len(beyond) else len(index)].copy()
+        keyframes = np.flatnonzero(self._index['kind'] == KIND_KEYFRAME)
+        self._last_keyframe = int(keyframes[-1]) if len(keyframes) else 0
+    
+    def _get_data(self, end: int) -> np.memmap:
+        """Lấy memmap của file corpus, map lại khi file đã dài thêm"""
+        if self._data is None or len(self._data) < end:
+            self.flush()
+            self._data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        return self._data
+    
+    def __len__(self) -> int:
+        return self._count()
+    
+    def _raw(self, position: int) -> np.ndarray:
+        """Dữ liệu bytes (view trên memmap) của một frame"""
+        record = self._index[position]
+        offset, length = int(record['offset']), int(record['length'])
+        return self._get_data(offset + length)[offset:offset + length]
+    
+    def _shape(self, position: int):
+        record = self._index[position]
+        if record['channels'] == 1:
+            return int(record['height']), int(record['width'])
+        return int(record['height']), int(record['width']), int(record['channels'])
+    
+    def _apply_delta(self, position: int, target: np.ndarray):
+        """Ghi các tile của frame delta vào target"""
+        record = self._index[position]
+        raw = self._raw(position)
+        count = int(record['tiles'])
+        tiles = raw[:count * 4].view('<u4')
+        height, width = int(record['height']), int(record['width'])
+        
+        cursor = count * 4
+        for tile_index in tiles:
+            ys, xs = self._tile_slices(tile_index, width, height)
+            block = target[ys, xs]
+            size = block.size
+            block[...] = raw[cursor:cursor + size].reshape(block.shape)
+            cursor += size
+    
+    def get_frame(self, position: int) -> np.ndarray:
+        """
+        Lấy một frame theo index
+        
+        Keyframe được trả về dưới dạng view trên memmap (không copy, chỉ đọc).
+        Frame delta được dựng lại vào buffer dùng chung, bị ghi đè ở lần đọc frame delta tiếp theo.
+        
+        Args:
+            position: Index của frame (hỗ trợ index âm)
+        
+        Returns:
+            Frame dạng numpy array
+        """
+        index = self._sync_index()
+        if position < 0:
+            position += len(index)
+        if not 0 <= position < len(index):
+            raise IndexError(f"Frame {position} nằm ngoài corpus ({len(index)} frames)")
+        
+        record = index[position]
+        shape = self._shape(position)
+        if record['kind'] == KIND_KEYFRAME:
+            return self._raw(position).reshape(shape)
+        
+        # Đọc tuần tự thì chỉ cần áp thêm delta lên frame vừa dựng, ngược lại dựng lại từ keyframe
+        keyframe = int(record['keyframe'])
+        if (self._decoded is None or self._decoded.shape != shape or self._decoded_keyframe != keyframe
+                or not keyframe <= self._decoded_position <= position):
+            self._decoded = np.array(self._raw(keyframe).reshape(shape))
+            self._decoded_position = keyframe
+            self._decoded_keyframe = keyframe
+        
+        for step in range(self._decoded_position + 1, position + 1):
+            self._apply_delta(step, self._decoded)
+        self._decoded_position = position
+        return self._decoded
+    
+    def __getitem__(self, position: int) -> np.ndarray:
+        return self.get_frame(position)
+    
+    def iter_frames(self, start: int = 0, stop: Optional[int] = None, step: int = 1) -> Iterator[np.ndarray]:
+        """
+        Duyệt các frame trong corpus
+        
+        Args:
+            start: Index bắt đầu
+            stop: Index kết thúc (không bao gồm), None = hết corpus
+            step: Bước nhảy
+        
+        Yields:
+            Frame (xem get_frame: frame delta bị ghi đè ở lần lặp tiếp theo, cần copy nếu muốn giữ)
+        """
+        count = self._count()
+        stop = count if stop is None else min(stop, count)
+        for position in range(start, stop, step):
+            yield self.get_frame(position)
+    
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return self.iter_frames()
+    
+    def get_timestamp(self, position: int) -> float:
+        """Lấy thời điểm chụp của frame"""
+        return float(self._sync_index()[position]['timestamp'])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê của corpus
+        
+        Returns:
+            Dict gồm số frame, số keyframe / delta, kích thước file và tỉ lệ nén so với lưu ảnh đầy đủ
+        """
+        index = self._sync_index()
+        raw_bytes = int((index['height'].astype(np.int64) * index['width'] * index['channels']).sum())
+        stored_bytes = int(index['length'].sum())
+        return {
+            'frames': len(index),
+            'keyframes': int((index['kind'] == KIND_KEYFRAME).sum()),
+            'deltas': int((index['kind'] == KIND_DELTA).sum()),
+            'stored_bytes': stored_bytes,
+            'compression': raw_bytes / stored_bytes if stored_bytes else 0.0,
+            'errors': self.stats['errors']
+        }
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Module quản lý các buffer dùng lại cho chụp màn hình và detect (tránh cấp phát mỗi tick)
+"""
+import threading
+import cv2
+import numpy as np
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+class FramePool:
+    """Class cấp phát sẵn và dùng lại các buffer frame, ảnh grayscale, score map, ..."""
+    
+    def __init__(self):
+        # Kích thước màn hình (width, height) mà các buffer đang được cấp phát theo
+        self.geometry: Optional[Tuple[int, int]] = None
+        self._buffers: Dict[Hashable, np.ndarray] = {}
+        self._lock = threading.Lock()
+        
+        # Số thứ tự frame, tăng mỗi lần chụp vào buffer dùng chung
+        self.sequence = 0
+        self.stats = {'allocations': 0, 'allocated_bytes': 0, 'captures': 0}
+        
+        # Callback nhận mỗi frame vừa chụp (ví dụ ghi frame corpus)
+        self.on_capture: Optional[Callable[[np.ndarray], None]] = None
+    
+    def set_capture_callback(self, callback: Optional[Callable[[np.ndarray], None]]):
+        """Thiết lập callback nhận mỗi frame vừa chụp (None = bỏ callback)"""
+        self.on_capture = callback
+    
+    def get(self, name: Hashable, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """
+        Lấy buffer theo tên, chỉ cấp phát khi chưa có hoặc khác kích thước
+        
+        Args:
+            name: Tên (key) của buffer
+            shape: Kích thước cần dùng
+            dtype: Kiểu dữ liệu
+        
+        Returns:
+            Buffer (nội dung cũ không được xóa)
+        """
+        shape = tuple(shape)
+        with self._lock:
+            buffer = self._buffers.get(name)
+            if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+                buffer = np.empty(shape, dtype=dtype)
+                self._buffers[name] = buffer
+                self.stats['allocations'] += 1
+                self.stats['allocated_bytes'] += buffer.nbytes
+            return buffer
+    
+    def ensure_geometry(self, width: int, height: int) -> bool:
+        """
+        Giải phóng tất cả buffer khi kích thước màn hình thay đổi
+        
+        Args:
+            width: Chiều rộng màn hình
+            height: Chiều cao màn hình
+        
+        Returns:
+            bool: True nếu kích thước màn hình đã thay đổi
+        """
+        if self.geometry == (width, height):
+            return False
+        
+        with self._lock:
+            if self.geometry is not None:
+                print(f"🖥️ Kích thước màn hình đổi {self.geometry[0]}x{self.geometry[1]} → {width}x{height}, "
+                      f"cấp phát lại buffers")
+            self.geometry = (width, height)
+            self._buffers = {}
+        return True
+    
+    def capture(self, name: Hashable = "frame") -> np.ndarray:
+        """
+        Chụp màn hình vào buffer frame dùng chung (định dạng BGR của OpenCV)
+        
+        Frame trả về bị ghi đè ở lần chụp tiếp theo vào cùng buffer, cần copy nếu muốn giữ lại.
+        
+        Args:
+            name: Tên buffer để chụp vào (dùng nhiều tên khi cần nhiều frame cùng lúc)
+        
+        Returns:
+            Buffer frame BGR
+        """
+        # Import khi chụp: các component chỉ dùng buffers (matcher, corpus, ...) không cần màn hình
+        import pyautogui
+        screenshot = pyautogui.screenshot()
+        width, height = screenshot.size
+        self.ensure_geometry(width, height)
+        
+        # np.asarray đọc trực tiếp từ PIL image, cvtColor ghi thẳng vào buffer có sẵn
+        frame = self.get(name, (height, width, 3))
+        cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR, dst=frame)
+        
+        self.sequence += 1
+        self.stats['captures'] += 1
+        if self.on_capture:
+            self.on_capture(frame)
+        return frame
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Lấy thống kê cấp phát của pool
+        
+        Returns:
+            Dict gồm số lần cấp phát, tổng bytes đã cấp phát, số lần chụp và số buffer hiện có
+        """
+        with self._lock:
+            stats = self.stats.copy()
+            stats['buffers'] = len(self._buffers)
+            stats['bytes'] = sum(buffer.nbytes for buffer in self._buffers.values())
+        return stats
@@ -2,20 +2,94 @@
 """
 Module phát hiện hình ảnh sử dụng template matching
 """
-import pyautogui
 import cv2
 import numpy as np
 import os
-from typing import List, Tuple, Optional
-from components.asset_manager import AssetManager
+import threading
+from typing import Dict, Hashable, List, Tuple, Optional, Any
+from components.asset_manager import AssetManager, TEMPLATE_ENGINES, acquire_asset_manager, release_asset_manager
+from components.feature_detector import FeatureDetector
+from components.incremental_matcher import IncrementalMatcher
+from components.color_proposals import ColorProposals
+from components.frame_pool import FramePool
+from components.frame_corpus import FrameCorpus
 
 
 class ImageDetector:
     """Class chứa các hàm detect hình ảnh trên màn hình"""
     
-    def __init__(self, assets_path: str = "Assets"):
+    # Cấu hình gộp variants của một target thành một lượt quét (proposal template)
+    PROPOSAL_MIN_SIMILARITY = 0.5  # Variant khớp với proposal thấp hơn mức này thì quét riêng từng variant
+    PROPOSAL_SLACK = 0.15          # Nới threshold của lượt quét proposal so với threshold của variants
+    PROPOSAL_MIN_THRESHOLD = 0.3
+    PROPOSAL_MAX_PEAKS = 64        # Quá nhiều ứng viên thì quét riêng từng variant sẽ rẻ hơn
+    PROPOSAL_WINDOW_PAD = 8        # Bán kính cửa sổ xác nhận variant quanh mỗi ứng viên (pixel)
+    
+    VALIDATE_WINDOW_PAD = 12       # Bán kính cửa sổ xác nhận lại vị trí đã biết của target (pixel)
+    
+    # Vùng tìm kiếm thay đổi ít hơn tỉ lệ này so với frame trước thì so khớp tăng dần rẻ hơn đề xuất theo màu
+    COLOR_MIN_CHANGED = 0.3
+    
+    def __init__(self, assets_path: str = "Assets", asset_manager: Optional[AssetManager] = None):
         self.assets_path = assets_path
-        self.asset_manager = AssetManager(assets_path)
+        # Dùng chung AssetManager trong process để không load/decode assets nhiều lần
+        self._owns_asset_manager = asset_manager is None
+        self.asset_manager = asset_manager or acquire_asset_manager(assets_path)
+    
+        # Cache proposal template theo target (None = target không gộp được)
+        self._proposal_cache: Dict[str, Optional[Dict[str, Any]]] = {}
+    
+        # Engine so khớp descriptors cho các asset có engine "orb" / "akaze"
+        self.feature_detector = FeatureDetector(self.asset_manager)
+    
+        # Buffers dùng lại cho chụp màn hình, grayscale và score maps
+        self.frame_pool = FramePool()
+        
+        # Giữ frame trước và score maps để chỉ match lại những vùng màn hình đã thay đổi
+        self.incremental_matcher = IncrementalMatcher(self.frame_pool)
+        self._frame_id: Optional[Hashable] = None  # Định danh frame đang detect (None = frame chưa có định danh)
+        # Frame detector tự chụp ở lần detect gần nhất (buffer dùng lại, bị ghi đè ở lần chụp sau)
+        self.last_frame: Optional[np.ndarray] = None
+        self._peak_kernels: Dict[int, np.ndarray] = {}
+        
+        # Đề xuất cửa sổ ứng viên theo màu cho các asset có engine "color"
+        self.color_proposals = ColorProposals(self.frame_pool)
+        
+        # Frame corpus đang ghi các frame được chụp (bật bằng start_recording)
+        self.frame_corpus: Optional[FrameCorpus] = None
+        self._record_every = 1
+        # FramePool của các nguồn chụp khác (capture pipeline), frame của chúng cũng được ghi vào corpus
+        self._capture_pools: List[FramePool] = []
+        
+        # Các cache ở trên không thread-safe, detect từ nhiều thread (automation, capture pipeline) phải lấy lock
+        self._detect_lock = threading.RLock()
+    
+        # Đăng ký sau cùng: thread theo dõi file có thể gọi _on_asset_changed ngay khi đăng ký
+        self.asset_manager.subscribe(self._on_asset_changed)
+    
+    def _on_asset_changed(self, asset_key: str):
+        """
+        Nhận thông báo asset thay đổi từ AssetManager
+        
+        Template mới được đọc trực tiếp từ AssetManager ở lần detect tiếp theo,
+        chỉ cần bỏ các proposal template đã dựng từ template cũ.
+        
+        Args:
+            asset_key: Key của asset vừa thay đổi
+        """
+        with self._detect_lock:
+            self._proposal_cache = {}
+            self.feature_detector.invalidate(asset_key)
+            self.color_proposals.invalidate(asset_key)
+            self.incremental_matcher.clear()
+        print(f"📦 ImageDetector nhận template mới cho asset '{asset_key}'")
+    
+    def close(self):
+        """Hủy đăng ký và trả lại AssetManager dùng chung"""
+        self.asset_manager.unsubscribe(self._on_asset_changed)
+        if self._owns_asset_manager:
+            release_asset_manager(self.asset_manager)
+            self._owns_asset_manager = False
     
     def _load_template(self, asset_key: str) -> Optional[np.ndarray]:
         """
@@ -33,21 +107,338 @@ class ImageDetector:
         """
         Chụp màn hình và chuyển đổi format cho OpenCV
         
+        Frame được ghi vào buffer dùng lại của FramePool, sẽ bị ghi đè ở lần chụp tiếp theo.
+        
         Returns:
             Screenshot dưới dạng OpenCV format
         """
-        screenshot = pyautogui.screenshot()
-        screenshot_np = np.array(screenshot)
-        screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-        return screenshot_cv
+        return self.frame_pool.capture()
+    
+    def capture_screenshot(self, buffer_name: Hashable = "frame") -> np.ndarray:
+        """
+        Chụp màn hình vào buffer dùng lại của detector, trong lock detect để không ghi đè frame đang được detect
+        
+        Args:
+            buffer_name: Tên buffer trong FramePool (buffer riêng không bị các lần detect tự chụp ghi đè)
+        
+        Returns:
+            Frame BGR, bị ghi đè ở lần chụp tiếp theo vào cùng buffer
+        """
+        with self._detect_lock:
+            return self.frame_pool.capture(buffer_name)
+    
+    def _begin_frame(self, frame_id: Optional[Hashable]):
+        """
+        Báo cho các bộ cache biết có frame mới (kể cả khi buffer frame được dùng lại)
+        
+        Frame không có định danh (caller tự chụp, có thể ghi đè buffer cũ) luôn được coi là frame mới.
+        
+        Args:
+            frame_id: Định danh nội dung frame, giống lần trước = cùng frame (None = không biết)
+        """
+        if frame_id is not None and frame_id == self._frame_id:
+            return
+        
+        self._frame_id = frame_id
+        self.incremental_matcher.new_frame()
+        self.feature_detector.new_frame()
+        self.color_proposals.new_frame()
+    
+    def _get_roi_bounds(self, frame_shape: Tuple[int, ...],
+                        roi: Optional[Tuple[float, float, float, float]]) -> Tuple[int, int, int, int]:
+        """
+        Chuyển ROI theo tỉ lệ màn hình thành tọa độ pixel
+        
+        Args:
+            frame_shape: Kích thước frame (height, width, ...)
+            roi: (x, y, width, height) theo tỉ lệ 0.0 - 1.0, None = toàn màn hình
+        
+        Returns:
+            Tuple (x0, y0, x1, y1) theo pixel
+        """
+        height, width = frame_shape[:2]
+        if not roi:
+            return 0, 0, width, height
+        
+        roi_x, roi_y, roi_w, roi_h = roi
+        x0 = max(0, int(width * roi_x))
+        y0 = max(0, int(height * roi_y))
+        x1 = min(width, int(width * (roi_x + roi_w)))
+        y1 = min(height, int(height * (roi_y + roi_h)))
+        return x0, y0, x1, y1
+    
+    def _find_peaks(self, result: np.ndarray, threshold: float,
+                    dedup_radius: int, pooled: bool = True) -> List[Tuple[int, int, float]]:
+        """
+        Trích các đỉnh cục bộ có độ khớp >= threshold trong score map
+        
+        Chỉ giữ điểm lớn nhất trong lân cận dedup_radius nên một element
+        chỉ cho ra một vài ứng viên thay vì hàng trăm điểm sát nhau.
+        
+        Args:
+            result: Score map từ cv2.matchTemplate
+            threshold: Ngưỡng độ khớp
+            dedup_radius: Bán kính lân cận (pixel)
+            pooled: Dùng buffers của frame_pool theo kích thước score map
+                (False cho score map của cửa sổ nhỏ, mỗi lần một kích thước khác nhau)
+        
+        Returns:
+            List (x, y, score) trong tọa độ của score map
+        """
+        # Trường hợp thường gặp (không có điểm nào đạt ngưỡng) không cần cấp phát gì thêm
+        if cv2.minMaxLoc(result)[1] < threshold:
+            return []
+        
+        kernel_size = 2 * max(dedup_radius, 1) + 1
+        kernel = self._peak_kernels.get(kernel_size)
+        if kernel is None:
+            kernel = self._peak_kernels[kernel_size] = np.ones((kernel_size, kernel_size), np.uint8)
+        
+        # Dùng lại buffers theo kích thước score map
+        if pooled:
+            local_max = cv2.dilate(result, kernel,
+                                   dst=self.frame_pool.get(("peaks_max", result.shape), result.shape, np.float32))
+            mask = np.greater_equal(result, threshold,
+                                    out=self.frame_pool.get(("peaks_mask", result.shape), result.shape, np.bool_))
+            local_mask = np.greater_equal(result, local_max,
+                                          out=self.frame_pool.get(("peaks_local", result.shape), result.shape, np.bool_))
+        else:
+            local_max = cv2.dilate(result, kernel)
+            mask = result >= threshold
+            local_mask = result >= local_max
+        np.logical_and(mask, local_mask, out=mask)
+        
+        ys, xs = np.nonzero(mask)
+        scores = result[ys, xs]
+        return [(int(x), int(y), float(score)) for x, y, score in zip(xs, ys, scores)]
+    
+    def _match_asset(self, frame: np.ndarray, asset_info,
+                     bounds: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int, float]]:
+        """
+        Template matching một asset trong vùng bounds của frame
+        
+        Args:
+            frame: Screenshot dạng OpenCV
+            asset_info: AssetInfo chứa template và cấu hình detect
+            bounds: Vùng tìm kiếm (x0, y0, x1, y1) theo pixel
+        
+        Returns:
+            List (x, y, width, height, score) theo tọa độ màn hình
+        """
+        if not asset_info.is_loaded and not asset_info.required:
+            return []
+        
+        if asset_info.engine not in TEMPLATE_ENGINES:
+            return self.feature_detector.match_asset(frame, asset_info, bounds)
+        
+        template = self._load_template(asset_info.name)
+        if template is None:
+            return []
+        
+        x0, y0, x1, y1 = bounds
+        region = frame[y0:y1, x0:x1]
+        template_height, template_width = template.shape[:2]
+        if region.shape[0] < template_height or region.shape[1] < template_width:
+            return []
+        
+        # Thực hiện template matching (chỉ tính lại các vùng đã thay đổi so với frame trước)
+        result = self.incremental_matcher.match(asset_info.name, (bounds, "bgr"), region, template)
+        
+        if asset_info.match_mode == "best":
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            peaks = [(max_loc[0], max_loc[1], max_val)] if max_val >= asset_info.threshold else []
+        else:
+            peaks = self._find_peaks(result, asset_info.threshold, asset_info.dedup_radius)
+        
+        return [(x + x0, y + y0, template_width, template_height, score) for x, y, score in peaks]
+    
+    def _match_color_assets(self, frame: np.ndarray,
+                            assets: List) -> Optional[List[Tuple[int, int, int, int, float]]]:
+        """
+        Đề xuất cửa sổ ứng viên theo màu cho từng variant rồi chỉ template matching trong các cửa sổ đó
+        
+        Chỉ dùng khi vùng tìm kiếm thay đổi nhiều (scroll, chuyển trang); màn hình gần như đứng yên
+        thì score maps tăng dần gần như được dùng lại nguyên vẹn nên rẻ hơn.
+        
+        Args:
+            frame: Screenshot dạng OpenCV
+            assets: List AssetInfo của các variants (engine "color")
+        
+        Returns:
+            List (x, y, width, height, score) theo tọa độ màn hình,
+            None nếu màn hình ít thay đổi hoặc có variant không dùng được đề xuất theo màu (nên quét cả vùng)
+        """
+        candidates = []
+        for asset_info in assets:
+            if not asset_info.is_loaded:
+                continue
+            template = self._load_template(asset_info.name)
+            if template is None:
+                continue
+            bounds = self._get_roi_bounds(frame.shape, asset_info.roi)
+            x0, y0, x1, y1 = bounds
+            region = frame[y0:y1, x0:x1]
+            if region.shape[0] < template.shape[0] or region.shape[1] < template.shape[1]:
+                continue
+            if self.incremental_matcher.changed_fraction((bounds, "bgr"), region) < self.COLOR_MIN_CHANGED:
+                return None
+            
+            windows = self.color_proposals.propose(asset_info.name, template, region, bounds)
+            if windows is None:
+                return None
+            candidates.extend(self._match_windows(region, asset_info, template, windows, bounds))
+        return candidates
+    
+    def _match_windows(self, region: np.ndarray, asset_info, template: np.ndarray,
+                       windows: List[Tuple[int, int, int, int]],
+                       bounds: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int, float]]:
+        """
+        Template matching chỉ trong các cửa sổ ứng viên
+        
+        Args:
+            region: Vùng tìm kiếm của frame
+            asset_info: AssetInfo chứa cấu hình detect
+            template: Template BGR
+            windows: Cửa sổ (x0, y0, x1, y1) theo tọa độ của region
+            bounds: Vùng tìm kiếm (x0, y0, x1, y1) theo pixel
+        
+        Returns:
+            List (x, y, width, height, score) theo tọa độ màn hình
+        """
+        x0, y0 = bounds[0], bounds[1]
+        template_height, template_width = template.shape[:2]
+        candidates = []
+        for wx0, wy0, wx1, wy1 in windows:
+            result = cv2.matchTemplate(region[wy0:wy1, wx0:wx1], template, cv2.TM_CCOEFF_NORMED)
+            if asset_info.match_mode == "best":
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+                peaks = [(max_loc[0], max_loc[1], max_val)] if max_val >= asset_info.threshold else []
+            else:
+                peaks = self._find_peaks(result, asset_info.threshold, asset_info.dedup_radius, pooled=False)
+            candidates.extend((x + wx0 + x0, y + wy0 + y0, template_width, template_height, score)
+                              for x, y, score in peaks)
+        
+        if asset_info.match_mode == "best" and candidates:
+            return [max(candidates, key=lambda c: c[4])]
+        return candidates
     
-    def _filter_duplicate_matches(self, matches: List[Tuple[int, int, int, int]], 
-                                 distance_threshold: int = 10) -> List[Tuple[int, int, int, int]]:
+    def _get_proposal(self, target: str, assets: List) -> Optional[Dict[str, Any]]:
         """
-        Loại bỏ các matches trùng lặp (gần nhau)
+        Lấy (hoặc dựng) proposal template dùng chung cho các variants của target
+        
+        Proposal là trung bình grayscale của phần góc trên trái chung của các variants.
+        Mỗi variant được so với proposal để biết độ lệch vị trí và mức khớp thấp nhất,
+        từ đó suy ra threshold nới lỏng cho lượt quét chung.
         
         Args:
-            matches: Danh sách các matches
+            target: Tên target
+            assets: List AssetInfo của các variants
+        
+        Returns:
+            Dict gồm template, threshold, offsets hoặc None nếu không gộp được
+        """
+        if target in self._proposal_cache:
+            return self._proposal_cache[target]
+        
+        proposal = None
+        templates = [self._load_template(asset_info.name) for asset_info in assets]
+        same_roi = all(asset_info.roi == assets[0].roi for asset_info in assets)
+        template_engine = all(asset_info.engine in TEMPLATE_ENGINES for asset_info in assets)
+        
+        if len(assets) > 1 and same_roi and template_engine and all(t is not None for t in templates):
+            grays = [cv2.cvtColor(t, cv2.COLOR_BGR2GRAY) for t in templates]
+            height = min(g.shape[0] for g in grays)
+            width = min(g.shape[1] for g in grays)
+            proposal_template = np.mean([g[:height, :width].astype(np.float32) for g in grays],
+                                        axis=0).astype(np.uint8)
+            
+            similarities = []
+            offsets = []
+            for gray in grays:
+                result = cv2.matchTemplate(gray, proposal_template, cv2.TM_CCOEFF_NORMED)
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+                similarities.append(max_val)
+                offsets.append(max_loc)
+            
+            if min(similarities) >= self.PROPOSAL_MIN_SIMILARITY:
+                threshold = min(asset_info.threshold for asset_info in assets) * min(similarities)
+                proposal = {
+                    'template': proposal_template,
+                    'threshold': max(threshold - self.PROPOSAL_SLACK, self.PROPOSAL_MIN_THRESHOLD),
+                    'offsets': offsets,
+                    'dedup_radius': min(asset_info.dedup_radius for asset_info in assets)
+                }
+                print(f"🧩 Gộp {len(assets)} variants của target '{target}' thành một lượt quét "
+                      f"(threshold proposal {proposal['threshold']:.2f})")
+            else:
+                print(f"ℹ️ Variants của target '{target}' khác nhau quá nhiều, quét riêng từng variant")
+        
+        self._proposal_cache[target] = proposal
+        return proposal
+    
+    def _match_variants(self, frame: np.ndarray, target: str, assets: List, proposal: Dict[str, Any],
+                        bounds: Tuple[int, int, int, int]) -> Optional[List[Tuple[int, int, int, int, float]]]:
+        """
+        Quét proposal template một lần trên frame rồi xác nhận từng variant trong cửa sổ nhỏ
+        
+        Args:
+            frame: Screenshot dạng OpenCV
+            target: Tên target
+            assets: List AssetInfo của các variants
+            proposal: Proposal từ _get_proposal
+            bounds: Vùng tìm kiếm (x0, y0, x1, y1) theo pixel
+        
+        Returns:
+            List (x, y, width, height, score) theo tọa độ màn hình,
+            None nếu có quá nhiều ứng viên (nên quét riêng từng variant)
+        """
+        x0, y0, x1, y1 = bounds
+        region = frame[y0:y1, x0:x1]
+        proposal_template = proposal['template']
+        if region.shape[0] < proposal_template.shape[0] or region.shape[1] < proposal_template.shape[1]:
+            return []
+        
+        # Lượt quét chung trên grayscale (chuyển đổi một lần cho mọi variants)
+        gray_region = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY,
+                                   dst=self.frame_pool.get(("gray", bounds), region.shape[:2]))
+        result = self.incremental_matcher.match(("proposal", target), (bounds, "gray"),
+                                                gray_region, proposal_template)
+        peaks = self._find_peaks(result, proposal['threshold'], proposal['dedup_radius'])
+        if len(peaks) > self.PROPOSAL_MAX_PEAKS:
+            return None
+        
+        pad = self.PROPOSAL_WINDOW_PAD
+        candidates = []
+        for px, py, _ in peaks:
+            for asset_info, (offset_x, offset_y) in zip(assets, proposal['offsets']):
+                template = self._load_template(asset_info.name)
+                if template is None:
+                    continue
+                template_height, template_width = template.shape[:2]
+                
+                # Cửa sổ xác nhận quanh vị trí dự kiến của variant
+                wx0 = max(px - offset_x - pad, 0)
+                wy0 = max(py - offset_y - pad, 0)
+                wx1 = min(px - offset_x + pad + template_width, region.shape[1])
+                wy1 = min(py - offset_y + pad + template_height, region.shape[0])
+                if wy1 - wy0 < template_height or wx1 - wx0 < template_width:
+                    continue
+                
+                window_result = cv2.matchTemplate(region[wy0:wy1, wx0:wx1], template, cv2.TM_CCOEFF_NORMED)
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(window_result)
+                if max_val >= asset_info.threshold:
+                    candidates.append((x0 + wx0 + max_loc[0], y0 + wy0 + max_loc[1],
+                                       template_width, template_height, float(max_val)))
+        
+        return candidates
+    
+    def _filter_duplicate_matches(self, candidates: List[Tuple[int, int, int, int, float]],
+                                  distance_threshold: int = 10) -> List[Tuple[int, int, int, int, float]]:
+        """
+        Loại bỏ các matches trùng lặp (gần nhau), ưu tiên match có độ khớp cao hơn
+        
+        Args:
+            candidates: Danh sách (x, y, width, height, score)
             distance_threshold: Ngưỡng khoảng cách để coi là trùng lặp
             
         Returns:
@@ -55,226 +446,273 @@ class ImageDetector:
         """
         filtered_matches = []
         
-        for match in matches:
-            x, y, w, h = match
-            is_duplicate = False
-            
-            for existing_match in filtered_matches:
-                ex_x, ex_y, ex_w, ex_h = existing_match
-                # Kiểm tra nếu matches gần nhau
-                if abs(x - ex_x) < distance_threshold and abs(y - ex_y) < distance_threshold:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                filtered_matches.append(match)
+        for candidate in sorted(candidates, key=lambda c: c[4], reverse=True):
+            x, y = candidate[0], candidate[1]
+            if all(abs(x - ex[0]) >= distance_threshold or abs(y - ex[1]) >= distance_threshold
+                   for ex in filtered_matches):
+                filtered_matches.append(candidate)
         
         return filtered_matches
     
-    def detect_all_lesson_images(self) -> List[Tuple[int, int, int, int]]:
+    def detect_scored(self, target: str, screenshot: Optional[np.ndarray] = None,
+                      frame_id: Optional[Hashable] = None) -> List[Tuple[int, int, int, int, float]]:
         """
-        Detect tất cả các vị trí khớp với hình ảnh Lesson_image.png và Lesson_unfinish_bold_image.png trên màn hình
+        Detect một target theo cấu hình trong manifest, kèm độ khớp
+        
+        Args:
+            target: Tên target (nhóm các asset variants)
+            screenshot: Frame dùng chung, None = chụp màn hình mới
+            frame_id: Định danh nội dung của screenshot (đổi mỗi khi buffer được ghi frame mới),
+                      cho phép dùng lại cache giữa các lần detect trên cùng frame. None = luôn coi là frame mới
         
         Returns:
-            List[Tuple[int, int, int, int]]: Danh sách các vị trí (x, y, width, height) 
-            được sắp xếp từ trên xuống dưới theo tọa độ y
+            List (x, y, width, height, score) theo match_mode của target
         """
-        try:
-            all_matches = []
-            
-            # Detect với template lesson_unfinish
-            template1 = self._load_template("lesson_unfinish")
-            if template1 is not None:
-                matches1 = self._detect_with_template(template1, "lesson_unfinish")
-                all_matches.extend(matches1)
-            
-            # Detect với template lesson_unfinish_bold
-            template2 = self._load_template("lesson_unfinish_bold")
-            if template2 is not None:
-                matches2 = self._detect_with_template(template2, "lesson_unfinish_bold")
-                all_matches.extend(matches2)
-            
-            if not all_matches:
-                print("Tìm thấy 0 vị trí khớp với hình ảnh lesson")
-                return []
-            
-            # Loại bỏ các matches trùng lặp giữa 2 template
-            filtered_matches = self._filter_duplicate_matches(all_matches, distance_threshold=20)
-            
-            # Sắp xếp theo tọa độ y (từ trên xuống dưới)
-            filtered_matches.sort(key=lambda match: match[1])
-            
-            print(f"Tìm thấy {len(filtered_matches)} vị trí khớp với hình ảnh lesson")
-            for i, (x, y, w, h) in enumerate(filtered_matches):
-                print(f"Vị trí {i+1}: x={x}, y={y}, width={w}, height={h}")
-            
-            return filtered_matches
-            
-        except Exception as e:
-            print(f"Lỗi khi detect lesson images: {str(e)}")
+        with self._detect_lock:
+            return self._detect_scored(target, screenshot, frame_id)
+    
+    def _detect_scored(self, target: str, screenshot: Optional[np.ndarray] = None,
+                       frame_id: Optional[Hashable] = None) -> List[Tuple[int, int, int, int, float]]:
+        """Phần thực thi của detect_scored (gọi khi đang giữ _detect_lock)"""
+        assets = self.asset_manager.get_target_assets(target)
+        if not assets:
+            print(f"❌ Target '{target}' không có trong manifest")
+            return []
+        
+        if screenshot is None:
+            frame = self._get_screenshot()
+            frame_id = ("frame_pool", self.frame_pool.sequence)
+            self.last_frame = frame
+        else:
+            frame = screenshot
+        self._begin_frame(frame_id)
+        
+        candidates = None
+        if all(asset_info.engine == "color" for asset_info in assets):
+            candidates = self._match_color_assets(frame, assets)
+        
+        proposal = self._get_proposal(target, assets) if candidates is None and len(assets) > 1 else None
+        if proposal is not None:
+            bounds = self._get_roi_bounds(frame.shape, assets[0].roi)
+            candidates = self._match_variants(frame, target, assets, proposal, bounds)
+        
+        if candidates is None:
+            candidates = []
+            for asset_info in assets:
+                bounds = self._get_roi_bounds(frame.shape, asset_info.roi)
+                candidates.extend(self._match_asset(frame, asset_info, bounds))
+        
+        if not candidates:
             return []
+        
+        match_mode = assets[0].match_mode
+        if match_mode == "best":
+            return [max(candidates, key=lambda c: c[4])]
+        
+        # Gộp kết quả giữa các variants và sắp xếp từ trên xuống dưới
+        radius = max(asset_info.dedup_radius for asset_info in assets)
+        matches = self._filter_duplicate_matches(candidates, radius)
+        matches.sort(key=lambda match: match[1])
+        
+        if match_mode == "first":
+            return matches[:1]
+        return matches
     
-    def _detect_with_template(self, template: np.ndarray, template_name: str) -> List[Tuple[int, int, int, int]]:
+    def validate_match(self, target: str, bbox: Tuple[int, int, int, int],
+                       screenshot: Optional[np.ndarray] = None,
+                       pad: Optional[int] = None) -> Optional[Tuple[int, int, int, int]]:
         """
-        Detect với một template cụ thể
+        Xác nhận target vẫn còn ở vị trí đã biết bằng cách chỉ match trong cửa sổ nhỏ quanh vị trí đó
+        
+        Rẻ hơn nhiều so với quét cả ROI, dùng để kiểm tra lại kết quả đã tìm trước (ví dụ lesson tiếp theo).
+        Chỉ áp dụng cho các variants dùng engine template.
         
         Args:
-            template: Template image
-            template_name: Tên template để debug
-            
+            target: Tên target
+            bbox: Vị trí đã biết (x, y, width, height)
+            screenshot: Frame dùng chung, None = chụp màn hình mới
+            pad: Bán kính cửa sổ (None = VALIDATE_WINDOW_PAD)
+        
+        Returns:
+            Vị trí hiện tại (x, y, width, height) nếu vẫn khớp threshold, None nếu không
+        """
+        pad = self.VALIDATE_WINDOW_PAD if pad is None else pad
+        assets = self.asset_manager.get_target_assets(target)
+        
+        with self._detect_lock:
+            frame = screenshot if screenshot is not None else self._get_screenshot()
+            x, y, width, height = bbox
+            wx0, wy0 = max(x - pad, 0), max(y - pad, 0)
+            
+            best = None
+            for asset_info in assets:
+                if asset_info.engine not in TEMPLATE_ENGINES or not asset_info.is_loaded:
+                    continue
+                template = self._load_template(asset_info.name)
+                if template is None:
+                    continue
+                template_height, template_width = template.shape[:2]
+                wx1 = min(x + max(width, template_width) + pad, frame.shape[1])
+                wy1 = min(y + max(height, template_height) + pad, frame.shape[0])
+                if wy1 - wy0 < template_height or wx1 - wx0 < template_width:
+                    continue
+                
+                window_result = cv2.matchTemplate(frame[wy0:wy1, wx0:wx1], template, cv2.TM_CCOEFF_NORMED)
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(window_result)
+                if max_val >= asset_info.threshold and (best is None or max_val > best[4]):
+                    best = (wx0 + max_loc[0], wy0 + max_loc[1], template_width, template_height, max_val)
+        
+        return best[:4] if best else None
+    
+    def detect(self, target: str, screenshot: Optional[np.ndarray] = None,
+               frame_id: Optional[Hashable] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect một target theo cấu hình trong manifest
+        
+        Args:
+            target: Tên target (nhóm các asset variants)
+            screenshot: Frame dùng chung, None = chụp màn hình mới
+            frame_id: Định danh nội dung của screenshot (xem detect_scored)
+        
         Returns:
-            List các matches tìm được
+            List các vị trí (x, y, width, height)
+        """
+        return [match[:4] for match in self.detect_scored(target, screenshot, frame_id)]
+    
+    def detect_all_lesson_images(self, screenshot: Optional[np.ndarray] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect tất cả các vị trí khớp với các variants của target "lesson" trên màn hình
+        
+        Returns:
+            List[Tuple[int, int, int, int]]: Danh sách các vị trí (x, y, width, height)
+            được sắp xếp từ trên xuống dưới theo tọa độ y
         """
         try:
-            screenshot_cv = self._get_screenshot()
-            
-            # Lấy kích thước template
-            template_height, template_width = template.shape[:2]
-            
-            # Thực hiện template matching
-            result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
+            matches = self.detect("lesson", screenshot)
             
-            # Đặt ngưỡng để xác định match
-            threshold = 0.99
-            locations = np.where(result >= threshold)
-            
-            # Chuyển đổi locations thành danh sách các hộp giới hạn
-            matches = []
-            for pt in zip(*locations[::-1]):  # locations trả về (y, x), ta cần (x, y)
-                x, y = pt
-                matches.append((x, y, template_width, template_height))
+            print(f"Tìm thấy {len(matches)} vị trí khớp với hình ảnh lesson")
+            for i, (x, y, w, h) in enumerate(matches):
+                print(f"Vị trí {i+1}: x={x}, y={y}, width={w}, height={h}")
             
-            print(f"Template '{template_name}' tìm thấy {len(matches)} matches")
             return matches
             
         except Exception as e:
-            print(f"Lỗi khi detect với template '{template_name}': {str(e)}")
+            print(f"Lỗi khi detect lesson images: {str(e)}")
             return []
     
-    def detect_play_button(self) -> Optional[Tuple[int, int, int, int]]:
+    def _detect_single(self, target: str, label: str,
+                       screenshot: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, int, int]]:
         """
-        Detect vị trí của Play_button.png trên màn hình (chỉ có 1 nút duy nhất)
+        Detect một target chỉ lấy một vị trí và in kết quả
+        
+        Args:
+            target: Tên target
+            label: Tên hiển thị trong log
+            screenshot: Frame dùng chung, None = chụp màn hình mới
         
         Returns:
             Optional[Tuple[int, int, int, int]]: Vị trí (x, y, width, height) hoặc None nếu không tìm thấy
         """
         try:
-            template = self._load_template("play_button")
-            if template is None:
-                return None
-            
-            screenshot_cv = self._get_screenshot()
-            
-            # Lấy kích thước template
-            template_height, template_width = template.shape[:2]
-            
-            # Thực hiện template matching
-            result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-            
-            # Tìm vị trí có độ khớp cao nhất
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            matches = self.detect(target, screenshot)
+            if matches:
+                x, y, w, h = matches[0]
+                print(f"Tìm thấy {label} tại: x={x}, y={y}, width={w}, height={h}")
+                return matches[0]
             
-            # Kiểm tra ngưỡng để xác định match
-            threshold = 0.8
-            if max_val >= threshold:
-                x, y = max_loc
-                print(f"Tìm thấy Play button tại: x={x}, y={y}, width={template_width}, height={template_height}")
-                return (x, y, template_width, template_height)
-            else:
-                print("Không tìm thấy Play button trên màn hình")
-                return None
+            print(f"Không tìm thấy {label} trên màn hình")
+            return None
             
         except Exception as e:
-            print(f"Lỗi khi detect Play button: {str(e)}")
+            print(f"Lỗi khi detect {label}: {str(e)}")
             return None
     
-    def detect_refresh_button(self) -> Optional[Tuple[int, int, int, int]]:
+    def detect_play_button(self, screenshot: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, int, int]]:
         """
-        Detect vị trí của Refresh_page.png trên màn hình
+        Detect vị trí của Play button trên màn hình (chỉ có 1 nút duy nhất)
         
         Returns:
             Optional[Tuple[int, int, int, int]]: Vị trí (x, y, width, height) hoặc None nếu không tìm thấy
         """
-        try:
-            template = self._load_template("refresh_button")
-            if template is None:
-                return None
-            
-            screenshot_cv = self._get_screenshot()
-            
-            # Lấy kích thước template
-            template_height, template_width = template.shape[:2]
+        return self._detect_single("play_button", "Play button", screenshot)
             
-            # Thực hiện template matching
-            result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-            
-            # Tìm vị trí có độ khớp cao nhất
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-            
-            # Kiểm tra ngưỡng để xác định match
-            threshold = 0.8
-            if max_val >= threshold:
-                x, y = max_loc
-                print(f"Tìm thấy Refresh button tại: x={x}, y={y}, width={template_width}, height={template_height}")
-                return (x, y, template_width, template_height)
-            else:
-                print("Không tìm thấy Refresh button trên màn hình")
-                return None
-            
-        except Exception as e:
-            print(f"Lỗi khi detect Refresh button: {str(e)}")
-            return None
-    
-    def detect_expand_button(self) -> Optional[Tuple[int, int, int, int]]:
+    def detect_refresh_button(self, screenshot: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, int, int]]:
         """
-        Detect vị trí của Expand.png trên màn hình và trả về expand button đầu tiên từ trên xuống dưới
+        Detect vị trí của Refresh button trên màn hình
         
         Returns:
             Optional[Tuple[int, int, int, int]]: Vị trí (x, y, width, height) hoặc None nếu không tìm thấy
         """
-        try:
-            template = self._load_template("expand_button")
-            if template is None:
-                return None
-            
-            screenshot_cv = self._get_screenshot()
-            
-            # Lấy kích thước template
-            template_height, template_width = template.shape[:2]
-            
-            # Thực hiện template matching
-            result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-            
-            # Đặt ngưỡng để xác định match
-            threshold = 0.8
-            locations = np.where(result >= threshold)
-            
-            # Chuyển đổi locations thành danh sách các hộp giới hạn
-            matches = []
-            for pt in zip(*locations[::-1]):  # locations trả về (y, x), ta cần (x, y)
-                x, y = pt
-                matches.append((x, y, template_width, template_height))
+        return self._detect_single("refresh_button", "Refresh button", screenshot)
             
+    def has_target(self, target: str) -> bool:
+        """Kiểm tra target có ít nhất một asset đã load (dùng cho các asset tùy chọn)"""
+        return any(asset_info.is_loaded for asset_info in self.asset_manager.get_target_assets(target))
+    
+    def has_video_progress(self) -> bool:
+        """Kiểm tra asset 'video_progress' đã có file và ROI để đọc tiến độ video"""
+        asset_info = self.asset_manager.get_asset_info("video_progress")
+        return asset_info is not None and asset_info.is_loaded and bool(asset_info.roi)
+    
+    def detect_video_progress(self, screenshot: Optional[np.ndarray] = None) -> Optional[float]:
+        """
+        Đọc tiến độ video từ vị trí núm kéo trên thanh tiến độ
+        
+        ROI của asset 'video_progress' phải phủ vừa thanh tiến độ (núm ở đầu trái = 0%, đầu phải = 100%).
+        
+        Args:
+            screenshot: Frame dùng chung, None = chụp màn hình mới
+        
+        Returns:
+            Tỉ lệ đã xem (0.0 - 1.0) hoặc None nếu chưa cấu hình asset / không thấy núm kéo
+        """
+        if not self.has_video_progress():
+            return None
+        
+        asset_info = self.asset_manager.get_asset_info("video_progress")
+        with self._detect_lock:
+            frame = screenshot if screenshot is not None else self._get_screenshot()
+            matches = self._detect_scored(asset_info.target, frame)
             if not matches:
-                print("Không tìm thấy Expand button trên màn hình")
                 return None
             
-            # Loại bỏ các matches trùng lặp
-            filtered_matches = self._filter_duplicate_matches(matches)
-            
-            # Sắp xếp theo tọa độ y (từ trên xuống dưới)
-            filtered_matches.sort(key=lambda match: match[1])
-            
-            # Trả về expand button đầu tiên
-            first_expand = filtered_matches[0]
-            x, y, w, h = first_expand
-            print(f"Tìm thấy {len(filtered_matches)} Expand button(s), chọn đầu tiên tại: x={x}, y={y}, width={w}, height={h}")
-            
-            return first_expand
-            
-        except Exception as e:
-            print(f"Lỗi khi detect Expand button: {str(e)}")
+            x0, _, x1, _ = self._get_roi_bounds(frame.shape, asset_info.roi)
+            x, _, width, _, _ = matches[0]
+            travel = x1 - x0 - width
+            if travel <= 0:
+                return None
+            return min(max((x - x0) / travel, 0.0), 1.0)
+    
+    def get_video_progress_point(self, frame_shape: Tuple[int, ...],
+                                 progress: float) -> Optional[Tuple[int, int]]:
+        """
+        Tọa độ trên thanh tiến độ ứng với một tỉ lệ đã xem (dùng để click tua video)
+        
+        Args:
+            frame_shape: Kích thước frame (height, width, ...)
+            progress: Tỉ lệ (0.0 - 1.0)
+        
+        Returns:
+            Tuple (x, y) theo pixel trong frame hoặc None nếu chưa cấu hình asset 'video_progress'
+        """
+        if not self.has_video_progress():
             return None
+        
+        asset_info = self.asset_manager.get_asset_info("video_progress")
+        template = self._load_template(asset_info.name)
+        x0, y0, x1, y1 = self._get_roi_bounds(frame_shape, asset_info.roi)
+        knob_width = template.shape[1] if template is not None else 0
+        travel = max(x1 - x0 - knob_width, 0)
+        return int(x0 + knob_width / 2 + travel * min(max(progress, 0.0), 1.0)), (y0 + y1) // 2
+    
+    def detect_expand_button(self, screenshot: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Detect expand button đầu tiên từ trên xuống dưới trên màn hình
+            
+        Returns:
+            Optional[Tuple[int, int, int, int]]: Vị trí (x, y, width, height) hoặc None nếu không tìm thấy
+        """
+        return self._detect_single("expand_button", "Expand button", screenshot)
     
     def test_detect_all_assets(self) -> dict:
         """
@@ -307,6 +745,18 @@ class ImageDetector:
         """
         return self.asset_manager.get_assets_summary()
     
+    def reload_asset(self, asset_key: str) -> bool:
+        """
+        Reload một asset cụ thể
+        
+        Args:
+            asset_key: Key của asset cần reload
+        
+        Returns:
+            bool: True nếu reload thành công
+        """
+        return self.asset_manager.reload_asset(asset_key)
+    
     def reload_all_assets(self) -> bool:
         """
         Reload tất cả assets
@@ -316,6 +766,55 @@ class ImageDetector:
         """
         return self.asset_manager.reload_all_assets()
     
+    def start_recording(self, path: str, delta: bool = True, every: int = 1) -> FrameCorpus:
+        """
+        Ghi các frame được chụp để detect vào frame corpus (dùng cho benchmark / hiệu chỉnh offline)
+        
+        Args:
+            path: Đường dẫn file corpus (đã có thì ghi tiếp)
+            delta: Ghi frame dưới dạng delta so với frame trước khi có thể
+            every: Chỉ ghi 1 trong mỗi every lần chụp
+        
+        Returns:
+            FrameCorpus đang ghi
+        """
+        self.stop_recording()
+        self.frame_corpus = FrameCorpus(path, delta=delta)
+        self._record_every = every
+        for frame_pool in [self.frame_pool] + self._capture_pools:
+            self.frame_corpus.attach(frame_pool, every)
+        print(f"🎞️ Bắt đầu ghi frame corpus: {path} ({len(self.frame_corpus)} frames có sẵn)")
+        return self.frame_corpus
+    
+    def add_capture_pool(self, frame_pool: FramePool):
+        """
+        Đăng ký FramePool của nguồn chụp khác (ví dụ capture pipeline) để frame của nó cũng được ghi vào frame corpus
+        
+        Args:
+            frame_pool: FramePool cần ghi theo
+        """
+        if frame_pool not in self._capture_pools:
+            self._capture_pools.append(frame_pool)
+        if self.frame_corpus is not None:
+            self.frame_corpus.attach(frame_pool, self._record_every)
+    
+    def remove_capture_pool(self, frame_pool: FramePool):
+        """Bỏ đăng ký FramePool đã thêm bằng add_capture_pool"""
+        if frame_pool in self._capture_pools:
+            self._capture_pools.remove(frame_pool)
+        if self.frame_corpus is not None:
+            self.frame_corpus.detach(frame_pool)
+    
+    def stop_recording(self):
+        """Ngừng ghi frame corpus và đóng file"""
+        if self.frame_corpus is None:
+            return
+        stats = self.frame_corpus.get_stats()
+        self.frame_corpus.close()
+        self.frame_corpus = None
+        print(f"🎞️ Đã ghi frame corpus: {stats['frames']} frames "
+              f"({stats['keyframes']} keyframes), nén {stats['compression']:.1f}x")
+    
     def get_detection_stats(self) -> dict:
         """
         Lấy thống kê detection cho tất cả assets
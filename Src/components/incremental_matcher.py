@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Module template matching tăng dần: chỉ tính lại score map ở những vùng màn hình đã thay đổi
+"""
+import cv2
+import numpy as np
+from typing import Dict, Any, Hashable, Optional
+from components.frame_pool import FramePool
+
+
+class IncrementalMatcher:
+    """Class giữ frame trước và score maps, chỉ chạy lại matchTemplate trên các tile bị thay đổi"""
+    
+    TILE_SIZE = 32             # Kích thước tile khi so sánh frame (pixel)
+    DIFF_THRESHOLD = 0         # Chênh lệch màu lớn hơn mức này thì pixel được coi là đã thay đổi
+    MAX_DIRTY_FRACTION = 0.5   # Quá tỉ lệ tile thay đổi này thì tính lại toàn bộ sẽ nhanh hơn
+    
+    def __init__(self, frame_pool: Optional[FramePool] = None):
+        self.frame_pool = frame_pool or FramePool()
+        self.generation = 0
+        # Frame trước của từng vùng (theo region_key) và score maps theo key của người gọi
+        self._regions: Dict[Hashable, Dict[str, Any]] = {}
+        self._score_maps: Dict[Hashable, Dict[str, Any]] = {}
+        self.stats = {'full': 0, 'partial': 0, 'reused': 0}
+    
+    def new_frame(self):
+        """Báo có frame mới, các vùng sẽ được so sánh lại với frame trước ở lần match tiếp theo"""
+        self.generation += 1
+    
+    def clear(self):
+        """Xóa toàn bộ frame trước và score maps đã cache"""
+        self._regions = {}
+        self._score_maps = {}
+    
+    def _dirty_tiles(self, previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """
+        Tìm các tile đã thay đổi giữa hai frame
+        
+        Args:
+            previous: Frame trước
+            current: Frame hiện tại (cùng kích thước)
+        
+        Returns:
+            Mask bool theo tile (True = tile đã thay đổi)
+        """
+        tile = self.TILE_SIZE
+        height, width = current.shape[:2]
+        channels = current.shape[2] if current.ndim == 3 else 1
+        tiles_y = (height + tile - 1) // tile
+        tiles_x = (width + tile - 1) // tile
+        
+        # Buffer diff làm tròn lên bội số của tile, phần thừa luôn bằng 0
+        diff = self.frame_pool.get(("diff", current.shape), (tiles_y * tile, tiles_x * tile) + current.shape[2:])
+        diff[height:] = 0
+        diff[:height, width:] = 0
+        cv2.absdiff(previous, current, dst=diff[:height, :width])
+        
+        # Lấy max theo từng hàng của tile trước (dữ liệu liên tục trong bộ nhớ) rồi mới theo cột
+        row_max = self.frame_pool.get(("diff_rows", current.shape), (tiles_y * tile, tiles_x))
+        np.max(diff.reshape(tiles_y * tile, tiles_x, tile * channels), axis=2, out=row_max)
+        return row_max.reshape(tiles_y, tile, tiles_x).max(axis=1) > self.DIFF_THRESHOLD
+    
+    def _update_region(self, region_key: Hashable, region: np.ndarray):
+        """
+        So sánh vùng với frame trước (mỗi generation một lần) và dồn tile thay đổi vào các score maps
+        
+        Args:
+            region_key: Key của vùng (ROI + loại ảnh)
+            region: Ảnh của vùng trong frame hiện tại
+        """
+        state = self._regions.get(region_key)
+        if state is None or state['previous'].shape != region.shape:
+            self._regions[region_key] = {'previous': region.copy(), 'generation': self.generation, 'changed': 1.0}
+            for key in [k for k, entry in self._score_maps.items() if entry['region_key'] == region_key]:
+                del self._score_maps[key]
+            return
+        
+        if state['generation'] == self.generation:
+            return
+        
+        dirty = self._dirty_tiles(state['previous'], region)
+        np.copyto(state['previous'], region)
+        state['generation'] = self.generation
+        state['changed'] = float(dirty.mean())
+        
+        if dirty.any():
+            for entry in self._score_maps.values():
+                if entry['region_key'] == region_key:
+                    entry['dirty'] |= dirty
+    
+    def changed_fraction(self, region_key: Hashable, region: np.ndarray) -> float:
+        """
+        Tỉ lệ tile của vùng đã thay đổi so với frame trước
+        
+        Args:
+            region_key: Key của vùng
+            region: Ảnh của vùng trong frame hiện tại
+        
+        Returns:
+            Tỉ lệ 0.0 - 1.0 (1.0 nếu chưa có frame trước của vùng)
+        """
+        self._update_region(region_key, region)
+        return self._regions[region_key]['changed']
+    
+    def match(self, key: Hashable, region_key: Hashable, region: np.ndarray,
+              template: np.ndarray, method: int = cv2.TM_CCOEFF_NORMED) -> np.ndarray:
+        """
+        Tính score map của template trên vùng, dùng lại kết quả cũ ở các tile không đổi
+        
+        Args:
+            key: Key của score map (ví dụ tên asset)
+            region_key: Key của vùng (các score maps cùng vùng dùng chung một lần so sánh frame)
+            region: Ảnh của vùng trong frame hiện tại
+            template: Template image
+            method: Phương pháp matchTemplate
+        
+        Returns:
+            Score map giống cv2.matchTemplate(region, template, method)
+        """
+        self._update_region(region_key, region)
+        
+        entry = self._score_maps.get(key)
+        if (entry is None or entry['template'] is not template or entry['region_key'] != region_key
+                or entry['result'].shape != (region.shape[0] - template.shape[0] + 1,
+                                             region.shape[1] - template.shape[1] + 1)):
+            result = cv2.matchTemplate(region, template, method)
+            tiles_shape = self._regions[region_key]['previous'].shape[:2]
+            self._score_maps[key] = {
+                'region_key': region_key,
+                'template': template,
+                'result': result,
+                'dirty': np.zeros(((tiles_shape[0] + self.TILE_SIZE - 1) // self.TILE_SIZE,
+                                   (tiles_shape[1] + self.TILE_SIZE - 1) // self.TILE_SIZE), dtype=bool)
+            }
+            self.stats['full'] += 1
+            return result
+        
+        dirty = entry['dirty']
+        result = entry['result']
+        if not dirty.any():
+            self.stats['reused'] += 1
+            return result
+        
+        if dirty.mean() > self.MAX_DIRTY_FRACTION:
+            cv2.matchTemplate(region, template, method, result=result)
+            self.stats['full'] += 1
+        else:
+            self._match_dirty(region, template, method, dirty, result)
+            self.stats['partial'] += 1
+        
+        dirty[:] = False
+        return result
+    
+    def _match_dirty(self, region: np.ndarray, template: np.ndarray, method: int,
+                     dirty: np.ndarray, result: np.ndarray):
+        """
+        Tính lại score map chỉ ở các vùng bị ảnh hưởng bởi tile thay đổi
+        
+        Pixel (px, py) thay đổi ảnh hưởng tới score tại các vị trí
+        [px - template_width + 1, px] x [py - template_height + 1, py].
+        
+        Args:
+            region: Ảnh của vùng trong frame hiện tại
+            template: Template image
+            method: Phương pháp matchTemplate
+            dirty: Mask tile thay đổi
+            result: Score map cần cập nhật (ghi đè tại chỗ)
+        """
+        tile = self.TILE_SIZE
+        template_height, template_width = template.shape[:2]
+        result_height, result_width = result.shape
+        
+        count, labels, boxes, centroids = cv2.connectedComponentsWithStats(dirty.astype(np.uint8), connectivity=8)
+        for left, top, width, height, _ in boxes[1:count]:
+            ry0 = max(top * tile - template_height + 1, 0)
+            rx0 = max(left * tile - template_width + 1, 0)
+            ry1 = min((top + height) * tile, result_height)
+            rx1 = min((left + width) * tile, result_width)
+            if ry1 <= ry0 or rx1 <= rx0:
+                continue
+            
+            # Ghi thẳng vào vùng tương ứng của score map, không cấp phát kết quả tạm
+            window = region[ry0:ry1 + template_height - 1, rx0:rx1 + template_width - 1]
+            cv2.matchTemplate(window, template, method, result=result[ry0:ry1, rx0:rx1])
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Lấy số lần tính toàn bộ / tính một phần / dùng lại score map
+        
+        Returns:
+            Dict thống kê
+        """
+        return self.stats.copy()
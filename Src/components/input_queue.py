@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Module hàng đợi thao tác chuột: tuần tự hóa click/scroll của nhiều phiên automation qua một thread
+"""
+import time
+import math
+import threading
+import pyautogui
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, Tuple, Union
+
+
+# Các kiểu di chuyển chuột:
+#   speed: tốc độ di chuyển (pixel/giây), thời gian di chuyển được kẹp trong [min_duration, max_duration]
+#   tween: hàm easing của pyautogui (None = di chuyển thẳng đều)
+#   click_settle / scroll_settle: thời gian đợi trang phản hồi sau click / scroll trước khi detect (giây)
+MOTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "instant": {'speed': 0.0, 'min_duration': 0.0, 'max_duration': 0.0, 'tween': None,
+                'click_settle': 0.05, 'scroll_settle': 0.5},
+    "fast": {'speed': 6000.0, 'min_duration': 0.02, 'max_duration': 0.12, 'tween': "easeOutQuad",
+             'click_settle': 0.05, 'scroll_settle': 1.0},
+    "human": {'speed': 1500.0, 'min_duration': 0.1, 'max_duration': 0.5, 'tween': "easeInOutQuad",
+              'click_settle': 0.15, 'scroll_settle': 1.0},
+}
+
+
+class InputQueue:
+    """Class thực hiện các thao tác chuột lần lượt trên một thread, mỗi thao tác trả về Future"""
+    
+    ACTIONS = ("moveTo", "click", "scroll", "press")
+    ACTION_GAP = 0.02  # Khoảng nghỉ tối thiểu giữa hai thao tác để ứng dụng kịp nhận sự kiện (giây)
+    
+    def __init__(self, motion_profile: Union[str, Dict[str, Any]] = "fast"):
+        self.motion_profile: Dict[str, Any] = {}
+        self.motion_profile_name = ""
+        self.set_motion_profile(motion_profile)
+        
+        self._pending: deque = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        
+        self.stats = {'submitted': 0, 'executed': 0, 'skipped_moves': 0,
+                      'errors': 0, 'max_queue_delay': 0.0, 'last_completed': 0.0}
+    
+    def set_motion_profile(self, profile: Union[str, Dict[str, Any]]):
+        """
+        Chọn kiểu di chuyển chuột
+        
+        Args:
+            profile: Tên profile trong MOTION_PROFILES hoặc dict cấu hình riêng (thiếu key thì lấy theo "fast")
+        """
+        if isinstance(profile, str):
+            if profile not in MOTION_PROFILES:
+                raise ValueError(f"Motion profile không hợp lệ: {profile}")
+            self.motion_profile = dict(MOTION_PROFILES[profile])
+            self.motion_profile_name = profile
+        else:
+            self.motion_profile = {**MOTION_PROFILES["fast"], **profile}
+            self.motion_profile_name = "custom"
+    
+    def start(self):
+        """Bắt đầu thread thực hiện thao tác"""
+        with self._condition:
+            if self.is_running():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._worker_loop, daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Dừng thread sau khi thực hiện hết các thao tác đã nhận"""
+        with self._condition:
+            thread = self._thread
+            self._thread = None
+            self._stopping = True
+            self._condition.notify_all()
+        if thread and thread.is_alive():
+            thread.join(timeout=3.0)
+    
+    def is_running(self) -> bool:
+        """Kiểm tra thread thực hiện thao tác có đang chạy không"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def submit(self, action: str, *args, session: Optional[str] = None, **kwargs) -> Future:
+        """
+        Đưa một thao tác chuột vào hàng đợi
+        
+        Args:
+            action: Tên function của pyautogui ("moveTo", "click", "scroll", "press")
+            *args: Tham số của thao tác
+            session: Tên phiên gửi thao tác (dùng cho log)
+            **kwargs: Tham số có tên của thao tác (moveTo nhận duration để bỏ qua motion profile)
+        
+        Returns:
+            Future nhận record của thao tác (xem _new_record)
+        """
+        if action not in self.ACTIONS:
+            raise ValueError(f"Thao tác chuột không hợp lệ: {action}")
+        
+        if not self.is_running():
+            self.start()
+        
+        item = {
+            'action': action,
+            'args': args,
+            'kwargs': kwargs,
+            'session': session,
+            'target': self._get_target(action, args, kwargs),
+            'submitted': time.time(),
+            'future': Future()
+        }
+        with self._condition:
+            self._pending.append(item)
+            self.stats['submitted'] += 1
+            self._condition.notify_all()
+        return item['future']
+    
+    def execute(self, action: str, *args, session: Optional[str] = None,
+                timeout: Optional[float] = 30.0, **kwargs) -> Dict[str, Any]:
+        """
+        Đưa thao tác vào hàng đợi và đợi đến khi thực hiện xong
+        
+        Args:
+            action: Tên function của pyautogui
+            *args: Tham số của thao tác
+            session: Tên phiên gửi thao tác
+            timeout: Thời gian chờ tối đa (giây)
+            **kwargs: Tham số có tên của thao tác
+        
+        Returns:
+            Record của thao tác, có completed và settled_at để biết khi nào có thể detect
+        """
+        return self.submit(action, *args, session=session, **kwargs).result(timeout)
+    
+    @staticmethod
+    def _get_target(action: str, args: tuple, kwargs: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        """Lấy tọa độ đích của thao tác (None nếu thao tác tại vị trí chuột hiện tại hoặc là phím)"""
+        if action == "press":
+            return None
+        if action == "scroll":
+            x, y = kwargs.get('x'), kwargs.get('y')
+        else:
+            x = args[0] if len(args) > 0 else kwargs.get('x')
+            y = args[1] if len(args) > 1 else kwargs.get('y')
+        if x is None or y is None:
+            return None
+        return int(x), int(y)
+    
+    def _take_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Lấy thao tác tiếp theo theo thứ tự nhận (gọi khi đang giữ _condition)
+        
+        Returns:
+            Thao tác cần thực hiện hoặc None khi hàng đợi trống
+        """
+        return self._pending.popleft() if self._pending else None
+            
+    def _new_record(self, item: Dict[str, Any], moved: bool = False,
+                    started: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Tạo record kết quả của thao tác
+        
+        Returns:
+            Dict gồm action, session, submitted, started, completed, settled_at (ước lượng thời điểm trang
+            phản hồi xong theo click_settle / scroll_settle của motion profile) và moved (có di chuyển chuột)
+        """
+        completed = time.time()
+        settle_key = {'click': 'click_settle', 'scroll': 'scroll_settle'}.get(item['action'])
+        settle = self.motion_profile[settle_key] if settle_key else 0.0
+        return {
+            'action': item['action'],
+            'session': item['session'],
+            'submitted': item['submitted'],
+            'started': started if started is not None else completed,
+            'completed': completed,
+            'settled_at': completed + settle,
+            'moved': moved
+        }
+    
+    def _move(self, target: Tuple[int, int], duration: Optional[float] = None) -> bool:
+        """
+        Di chuyển chuột tới đích theo motion profile, bỏ qua nếu chuột đã ở đó
+        
+        Vị trí chuột được đọc lại mỗi lần vì người dùng có thể đã di chuyển chuột giữa hai thao tác.
+        
+        Args:
+            target: Tọa độ đích
+            duration: Thời gian di chuyển cố định (None = tính theo khoảng cách và profile)
+        
+        Returns:
+            bool: True nếu chuột đã được di chuyển
+        """
+        position = tuple(pyautogui.position())
+        if position == target and duration is None:
+            self.stats['skipped_moves'] += 1
+            return False
+        
+        profile = self.motion_profile
+        if duration is None:
+            duration = 0.0
+            if profile['speed'] > 0:
+                distance = math.hypot(target[0] - position[0], target[1] - position[1])
+                duration = min(max(distance / profile['speed'], profile['min_duration']), profile['max_duration'])
+            elif profile['max_duration'] > 0:
+                duration = profile['min_duration']
+        
+        kwargs = {'duration': duration}
+        tween = getattr(pyautogui, profile['tween'], None) if profile['tween'] else None
+        if tween is not None and duration > 0:
+            kwargs['tween'] = tween
+        pyautogui.moveTo(target[0], target[1], **kwargs)
+        return True
+    
+    def _perform(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Thực hiện một thao tác và trả về record"""
+        started = time.time()
+        target = item['target']
+        moved = False
+        
+        if item['action'] == "moveTo":
+            moved = self._move(target, item['kwargs'].get('duration'))
+        else:
+            if target is not None:
+                moved = self._move(target)
+            getattr(pyautogui, item['action'])(*item['args'], **item['kwargs'])
+        
+        return self._new_record(item, moved=moved, started=started)
+    
+    def _worker_loop(self):
+        """Thread lấy thao tác từ hàng đợi và thực hiện lần lượt"""
+        while True:
+            with self._condition:
+                item = self._take_next()
+                while item is None:
+                    if self._stopping:
+                        return
+                    self._condition.wait()
+                    item = self._take_next()
+            
+            future = item['future']
+            if not future.set_running_or_notify_cancel():
+                continue
+            
+            self.stats['max_queue_delay'] = max(self.stats['max_queue_delay'], time.time() - item['submitted'])
+            
+            try:
+                record = self._perform(item)
+                self.stats['executed'] += 1
+                self.stats['last_completed'] = record['completed']
+                future.set_result(record)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Lỗi thao tác chuột '{item['action']}' (phiên {item['session']}): {str(e)}")
+                future.set_exception(e)
+            
+            time.sleep(self.ACTION_GAP)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê hàng đợi
+        
+        Returns:
+            Dict gồm số thao tác đã nhận, đã thực hiện, lần di chuyển được bỏ qua, lỗi,
+            độ trễ lớn nhất, thời điểm thao tác cuối hoàn thành và số thao tác đang chờ
+        """
+        with self._condition:
+            stats = self.stats.copy()
+            stats['pending'] = len(self._pending)
+        stats['motion_profile'] = self.motion_profile_name
+        return stats
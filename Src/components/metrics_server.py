@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Module HTTP endpoint xuất metrics theo định dạng text exposition (Prometheus/OpenMetrics)
+"""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class MetricsWriter:
+    """Class gom các metric và xuất ra text exposition format"""
+    
+    def __init__(self):
+        self.lines: List[str] = []
+    
+    @staticmethod
+    def _format_labels(labels: Optional[Dict[str, str]]) -> str:
+        """Định dạng labels thành {key="value",...}"""
+        if not labels:
+            return ""
+        parts = []
+        for key, value in labels.items():
+            escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            parts.append(f'{key}="{escaped}"')
+        return "{" + ",".join(parts) + "}"
+    
+    def _header(self, name: str, help_text: str, metric_type: str):
+        """Ghi dòng HELP và TYPE cho một metric"""
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+    
+    def gauge(self, name: str, help_text: str, samples: List[Tuple[Optional[Dict[str, str]], float]]):
+        """
+        Thêm metric dạng gauge
+        
+        Args:
+            name: Tên metric
+            help_text: Mô tả metric
+            samples: List các cặp (labels, giá trị)
+        """
+        self._header(name, help_text, "gauge")
+        for labels, value in samples:
+            self.lines.append(f"{name}{self._format_labels(labels)} {float(value)}")
+    
+    def counter(self, name: str, help_text: str, value: float,
+                labels: Optional[Dict[str, str]] = None):
+        """
+        Thêm metric dạng counter (tên sẽ có hậu tố _total)
+        
+        Args:
+            name: Tên metric (không gồm _total)
+            help_text: Mô tả metric
+            value: Giá trị tích lũy
+            labels: Labels đi kèm
+        """
+        self._header(name, help_text, "counter")
+        self.lines.append(f"{name}_total{self._format_labels(labels)} {float(value)}")
+    
+    def histogram(self, name: str, help_text: str, buckets: List[Tuple[float, int]],
+                  total_sum: float, count: int):
+        """
+        Thêm metric dạng histogram
+        
+        Args:
+            name: Tên metric
+            help_text: Mô tả metric
+            buckets: List (mốc trên, số lần quan sát <= mốc) theo thứ tự tăng dần
+            total_sum: Tổng giá trị quan sát
+            count: Tổng số lần quan sát
+        """
+        self._header(name, help_text, "histogram")
+        for bound, cumulative in buckets:
+            self.lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        self.lines.append(f'{name}_bucket{{le="+Inf"}} {count}')
+        self.lines.append(f"{name}_sum {total_sum}")
+        self.lines.append(f"{name}_count {count}")
+    
+    def render(self) -> str:
+        """Xuất toàn bộ metrics thành text"""
+        return "\n".join(self.lines) + "\n"
+
+
+def collect_app_metrics(writer: MetricsWriter, stats, loop_detector, asset_manager=None,
+                        capture_pipeline=None, stall_detector=None):
+    """
+    Gom metrics của StatsManager, LoopDetector, AssetManager, CapturePipeline và StallDetector vào writer
+    
+    Args:
+        writer: MetricsWriter để ghi metric
+        stats: StatsManager của phiên chạy (hoặc StatsManager gom mọi phiên)
+        loop_detector: LoopDetector của phiên chạy (None = nhiều phiên, xem collect_session_metrics)
+        asset_manager: AssetManager đang dùng (có thể None nếu chưa load)
+        capture_pipeline: CapturePipeline đang dùng (có thể None nếu không bật)
+        stall_detector: StallDetector của phiên chạy (có thể None)
+    """
+    writer.gauge("autosic_info", "Thông tin instance AutoSIC",
+                 [({"hostname": socket.gethostname()}, 1)])
+    
+    counters = stats.get_all_stats()
+    writer.counter("autosic_lessons_clicked", "Số lessons đã click", counters['lessons_clicked'])
+    writer.counter("autosic_play_buttons_detected", "Số video đã kết thúc (play button)",
+                   counters['play_buttons_detected'])
+    writer.counter("autosic_refresh_clicks", "Số lần click refresh", counters['refresh_clicks'])
+    writer.counter("autosic_expand_clicks", "Số lần click expand", counters['expand_clicks'])
+    writer.counter("autosic_lesson_click_retries", "Số lần click lại lesson vì trang không thay đổi",
+                   counters['lesson_click_retries'])
+    writer.counter("autosic_lesson_clicks_failed", "Số lesson không mở được sau khi click lại",
+                   counters['lesson_clicks_failed'])
+    if loop_detector is not None:
+        writer.counter("autosic_auto_restarts", "Số lần LoopDetector auto restart",
+                       loop_detector.get_auto_restart_count())
+    
+    rates = stats.get_derived_rates()
+    writer.gauge("autosic_lessons_per_hour", "Lessons/giờ trong 1 giờ gần nhất",
+                 [(None, rates['lessons_per_hour'])])
+    writer.gauge("autosic_restarts_per_hour", "Auto restart/giờ trong 1 giờ gần nhất",
+                 [(None, rates['restarts_per_hour'])])
+    writer.gauge("autosic_click_latency_seconds", "Độ trễ trung bình từ lúc video kết thúc đến lúc click",
+                 [(None, rates['mean_click_latency'])])
+    writer.gauge("autosic_click_success_ratio", "Tỉ lệ lần click lesson mở được video trong 1 giờ gần nhất",
+                 [(None, rates['click_success_rate'])])
+    
+    if loop_detector is not None:
+        loop_status = loop_detector.get_loop_status()
+        writer.gauge("autosic_loop_repeat_count", "Số lần lặp hiện tại của hành động cuối",
+                     [(None, loop_status['repeat_count'])])
+    
+    if stats.stats['start_time']:
+        writer.gauge("autosic_start_time_seconds", "Thời điểm bắt đầu phiên chạy (unix time)",
+                     [(None, stats.stats['start_time'])])
+    
+    histogram = stats.get_detection_histogram()
+    writer.histogram("autosic_detection_seconds", "Thời gian detect mỗi tick",
+                     histogram['buckets'], histogram['sum'], histogram['count'])
+    
+    if asset_manager is not None:
+        status = asset_manager.get_assets_status()
+        writer.gauge("autosic_assets_loaded", "Số assets đã load", [(None, status['loaded'])])
+        writer.gauge("autosic_assets_total", "Tổng số assets", [(None, status['total'])])
+        writer.gauge("autosic_asset_loaded", "Trạng thái load của từng asset (1 = đã load)",
+                     [({"asset": key}, 1 if loaded else 0) for key, loaded in status['assets'].items()])
+    
+    if capture_pipeline is not None:
+        pipeline_stats = capture_pipeline.get_stats()
+        writer.counter("autosic_capture_frames", "Số frame đã chụp bởi capture pipeline",
+                       pipeline_stats['captured'])
+        writer.counter("autosic_capture_dropped_frames", "Số frame bị bỏ vì detect chưa xử lý kịp",
+                       pipeline_stats['dropped'])
+        writer.counter("autosic_capture_unchanged_frames", "Số frame không đổi (dùng lại kết quả detect)",
+                       pipeline_stats['unchanged'])
+    
+    if stall_detector is not None:
+        stall_stats = stall_detector.get_stats()
+        writer.counter("autosic_video_stalls", "Số lần video đứng hình quá thời gian cho phép",
+                       stall_stats['stalls'])
+        writer.counter("autosic_video_stalls_recovered", "Số lần video chạy lại sau khi đứng hình",
+                       stall_stats['recovered'])
+        writer.counter("autosic_video_stalls_unrecovered", "Số lần đã thử hết hành động khôi phục",
+                       stall_stats['unrecovered'])
+        writer.counter("autosic_video_stalls_unconfirmed", "Số lần vùng video đứng yên nhưng không có dấu hiệu treo",
+                       stall_stats['unconfirmed'])
+        writer.counter("autosic_video_stalls_interrupted", "Số lần đứng hình kết thúc do video hết hoặc lượt chạy mới",
+                       stall_stats['interrupted'])
+        writer.gauge("autosic_video_stall_actions", "Số lần thực hiện mỗi hành động khôi phục (tích lũy)",
+                     [({"action": action}, count) for action, count in stall_stats['actions'].items()])
+        writer.gauge("autosic_video_stall_seconds", "Thời gian đứng hình trung bình của các lần gần nhất",
+                     [(None, stall_stats['mean_duration'])])
+
+
+
+def collect_session_metrics(writer: MetricsWriter, session_manager):
+    """
+    Gom metrics theo từng phiên của SessionManager (label session) vào writer
+    
+    Args:
+        writer: MetricsWriter để ghi metric
+        session_manager: SessionManager đang chạy
+    """
+    sessions = session_manager.get_session_stats()
+    writer.counter("autosic_auto_restarts", "Số lần LoopDetector auto restart (tổng các phiên)",
+                   session_manager.get_auto_restart_count())
+    writer.gauge("autosic_session_running", "Trạng thái chạy của từng phiên (1 = đang chạy)",
+                 [({"session": name}, 1 if session['running'] else 0) for name, session in sessions.items()])
+    writer.gauge("autosic_session_lessons_clicked", "Số lessons đã click của từng phiên",
+                 [({"session": name}, session['stats']['lessons_clicked']) for name, session in sessions.items()])
+    writer.gauge("autosic_session_auto_restarts", "Số lần auto restart của từng phiên",
+                 [({"session": name}, session['auto_restarts']) for name, session in sessions.items()])
+
+
+class MetricsServer:
+    """Class chạy HTTP endpoint /metrics trên một thread riêng"""
+    
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    
+    def __init__(self, collector: Callable[[MetricsWriter], None],
+                 host: str = "127.0.0.1", port: int = 9464):
+        self.collector = collector
+        self.host = host
+        self.port = port
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.server_thread: Optional[threading.Thread] = None
+    
+    def _make_handler(self):
+        """Tạo class handler gắn với collector của server"""
+        server = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                try:
+                    body = server.render().encode("utf-8")
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsServer.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # Không in access log cho mỗi lần scrape
+                pass
+        
+        return MetricsHandler
+    
+    def render(self) -> str:
+        """Gọi collector và xuất metrics thành text"""
+        writer = MetricsWriter()
+        self.collector(writer)
+        return writer.render()
+    
+    def start(self) -> bool:
+        """
+        Bắt đầu HTTP server
+        
+        Returns:
+            bool: True nếu server đã chạy
+        """
+        if self.httpd:
+            return True
+        
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self.httpd.daemon_threads = True
+        except OSError as e:
+            print(f"❌ Không thể mở metrics endpoint {self.host}:{self.port}: {str(e)}")
+            self.httpd = None
+            return False
+        
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.server_thread.start()
+        print(f"📈 Metrics endpoint: http://{self.host}:{self.port}/metrics")
+        return True
+    
+    def stop(self):
+        """Dừng HTTP server"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Module ghi nhớ cách đặt tốc độ phát video cao nhất cho từng khóa học
+"""
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+
+class PlaybackSpeedMemory:
+    """Class lưu vị trí nút tốc độ và lựa chọn tốc độ cao nhất theo khóa học để không phải detect lại mỗi lesson"""
+    
+    MAX_FAILURES = 3  # Thất bại liên tiếp quá số lần này (chưa thành công lần nào) thì bỏ qua khóa học
+    RETRY_AFTER = 6 * 3600.0  # Khóa học đang bị bỏ qua được thử lại sau khoảng này kể từ lần thất bại cuối (giây)
+    
+    def __init__(self, course: str = "default",
+                 memory_path: Optional[str] = os.path.join("Data", "playback_speed.json")):
+        """
+        Args:
+            course: Tên khóa học (vị trí được lưu theo khóa học)
+            memory_path: File lưu vị trí đã biết (None = chỉ giữ trong bộ nhớ)
+        """
+        self.course = course
+        self.memory_path = memory_path
+        self._lock = threading.Lock()
+        self.memory: Dict[str, Dict[str, Any]] = self._load_memory()
+        self.stats = {'attempts': 0, 'already_max': 0, 'set': 0, 'failures': 0, 'remembered_hits': 0}
+    
+    def _load_memory(self) -> Dict[str, Dict[str, Any]]:
+        """Đọc vị trí đã biết của các khóa học từ file"""
+        if not self.memory_path or not os.path.exists(self.memory_path):
+            return {}
+        try:
+            with open(self.memory_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Không đọc được bộ nhớ tốc độ phát: {str(e)}")
+            return {}
+    
+    def _save_memory(self):
+        """Ghi bộ nhớ ra file (giữ nguyên dữ liệu của các khóa học khác)"""
+        if not self.memory_path:
+            return
+        memory = self._load_memory()
+        memory[self.course] = self._course_entry()
+        self.memory = memory
+        try:
+            directory = os.path.dirname(self.memory_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.memory_path, "w", encoding="utf-8") as f:
+                json.dump(self.memory, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"❌ Lỗi khi lưu bộ nhớ tốc độ phát: {str(e)}")
+    
+    def _course_entry(self) -> Dict[str, Any]:
+        """Lấy (hoặc tạo) bản ghi của khóa học hiện tại"""
+        return self.memory.setdefault(self.course, {
+            'button': None, 'option_offset': None, 'successes': 0, 'failures': 0, 'updated_at': None
+        })
+    
+    def set_course(self, course: str):
+        """
+        Đổi khóa học (vị trí đã nhớ và số lần thất bại được tính theo khóa học này)
+        
+        Args:
+            course: Tên khóa học
+        """
+        with self._lock:
+            self.course = course
+    
+    def should_try(self) -> bool:
+        """
+        Kiểm tra có nên thử đặt tốc độ cho khóa học không
+        
+        Returns:
+            bool: False nếu khóa học đã thất bại MAX_FAILURES lần liên tiếp mà chưa thành công lần nào
+                  và lần thất bại cuối chưa quá RETRY_AFTER
+        """
+        with self._lock:
+            entry = self._course_entry()
+            if entry['successes'] > 0 or entry['failures'] < self.MAX_FAILURES:
+                return True
+            return entry['updated_at'] is None or time.time() - entry['updated_at'] >= self.RETRY_AFTER
+    
+    def reset(self):
+        """Xóa vị trí đã nhớ và số lần thất bại của khóa học hiện tại (ví dụ sau khi player đổi giao diện)"""
+        with self._lock:
+            self.memory.pop(self.course, None)
+        self._save_memory()
+    
+    def get_button(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Vị trí nút tốc độ đã biết của khóa học
+        
+        Returns:
+            Bounding box (x, y, width, height) trong region hoặc None
+        """
+        with self._lock:
+            button = self._course_entry()['button']
+        return tuple(button) if button else None
+    
+    def get_option(self, button: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Vị trí dự kiến của lựa chọn tốc độ cao nhất, tính từ vị trí nút tốc độ
+        
+        Args:
+            button: Vị trí hiện tại của nút tốc độ
+        
+        Returns:
+            Bounding box (x, y, width, height) trong region hoặc None nếu chưa biết
+        """
+        with self._lock:
+            offset = self._course_entry()['option_offset']
+        if not offset:
+            return None
+        dx, dy, width, height = offset
+        return button[0] + dx, button[1] + dy, width, height
+    
+    def record_success(self, button: Tuple[int, int, int, int],
+                       option: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Ghi nhận đã đặt (hoặc đã có sẵn) tốc độ cao nhất
+        
+        Args:
+            button: Vị trí nút tốc độ
+            option: Vị trí lựa chọn tốc độ cao nhất đã click (None = tốc độ đã cao nhất, không cần click)
+        """
+        with self._lock:
+            entry = self._course_entry()
+            entry['button'] = [int(v) for v in button]
+            if option is not None:
+                entry['option_offset'] = [int(option[0] - button[0]), int(option[1] - button[1]),
+                                          int(option[2]), int(option[3])]
+                self.stats['set'] += 1
+            else:
+                self.stats['already_max'] += 1
+            entry['successes'] += 1
+            entry['failures'] = 0
+            entry['updated_at'] = time.time()
+        self._save_memory()
+    
+    def record_failure(self, forget: bool = False):
+        """
+        Ghi nhận không đặt được tốc độ
+        
+        Args:
+            forget: Bỏ các vị trí đã nhớ (giao diện player đã thay đổi)
+        """
+        with self._lock:
+            entry = self._course_entry()
+            entry['failures'] += 1
+            if forget:
+                entry['button'] = None
+                entry['option_offset'] = None
+            entry['updated_at'] = time.time()
+            self.stats['failures'] += 1
+        self._save_memory()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê đặt tốc độ phát
+        
+        Returns:
+            Dict gồm số lần thử, số lần tốc độ đã cao nhất sẵn, số lần đặt, thất bại,
+            số lần dùng được vị trí đã nhớ và bản ghi của khóa học
+        """
+        with self._lock:
+            stats = self.stats.copy()
+            stats['course'] = dict(self._course_entry())
+        return stats
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Module nhận biết màn hình lạ (modal, trang hết phiên đăng nhập, quiz, ...) bằng chỉ mục fingerprint các trạng thái đã biết
+"""
+import os
+import time
+import threading
+import cv2
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+
+
+class ScreenStateIndex:
+    """Class giữ fingerprint (frame grayscale thu nhỏ) của các màn hình đã gặp trong lúc chạy bình thường và tìm láng giềng gần nhất"""
+    
+    GRID_SIZE = (32, 18)      # Kích thước fingerprint (width, height)
+    UNKNOWN_DISTANCE = 20.0   # Khoảng cách (chênh lệch trung bình 0 - 255) tới trạng thái gần nhất lớn hơn mức này = màn hình lạ
+    MERGE_DISTANCE = 6.0      # Fingerprint mới gần trạng thái đã có hơn mức này thì chỉ tăng số lần gặp
+    MIN_OBSERVATIONS = 3      # Chưa ghi nhận đủ số lần gặp màn hình bình thường này thì chưa đánh dấu màn hình lạ
+    MAX_STATES = 500          # Đầy thì thay trạng thái ít gặp nhất
+    SAVE_INTERVAL = 60.0      # Khoảng tối thiểu giữa hai lần ghi chỉ mục ra đĩa (giây)
+    
+    def __init__(self, path: Optional[str] = os.path.join("Data", "screen_states.npz"),
+                 ignore_roi: Optional[Tuple[float, float, float, float]] = None):
+        """
+        Args:
+            path: File lưu chỉ mục (None = chỉ giữ trong bộ nhớ)
+            ignore_roi: Vùng bỏ qua khi so sánh (x, y, width, height theo tỉ lệ), ví dụ vùng video luôn thay đổi
+        """
+        self.path = path
+        self.enabled = True
+        self._lock = threading.Lock()
+        
+        grid_width, grid_height = self.GRID_SIZE
+        mask = np.ones((grid_height, grid_width), dtype=bool)
+        if ignore_roi:
+            roi_x, roi_y, roi_w, roi_h = ignore_roi
+            mask[int(grid_height * roi_y):int(np.ceil(grid_height * (roi_y + roi_h))),
+                 int(grid_width * roi_x):int(np.ceil(grid_width * (roi_x + roi_w)))] = False
+        self._mask = mask.ravel()
+        dims = int(self._mask.sum())
+        
+        # Các trạng thái đã biết: fingerprint (chỉ phần không bị bỏ qua), nhãn, số lần gặp
+        self._fingerprints = np.empty((0, dims), dtype=np.float32)
+        self._labels: list = []
+        self._counts = np.empty(0, dtype=np.int64)
+        self._dirty = False
+        self._last_save = time.time()
+        
+        # Buffers dùng lại khi tính fingerprint
+        self._small = np.empty((grid_height, grid_width, 3), dtype=np.uint8)
+        self._gray = np.empty((grid_height, grid_width), dtype=np.uint8)
+        
+        self.stats = {'lookups': 0, 'unknown': 0, 'learned': 0, 'merged': 0}
+        self._load()
+    
+    def _load(self):
+        """Đọc chỉ mục đã lưu (bỏ qua nếu khác kích thước fingerprint)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                fingerprints = data['fingerprints'].astype(np.float32)
+                labels = [str(label) for label in data['labels']]
+                counts = data['counts'].astype(np.int64)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Không đọc được chỉ mục màn hình {self.path}: {str(e)}")
+            return
+        if fingerprints.ndim != 2 or fingerprints.shape[1] != self._fingerprints.shape[1]:
+            print(f"⚠️ Chỉ mục màn hình {self.path} khác cấu hình hiện tại, tạo chỉ mục mới")
+            return
+        self._fingerprints, self._labels, self._counts = fingerprints, labels, counts
+        print(f"🗂️ Đã load {len(labels)} trạng thái màn hình đã biết")
+    
+    def save(self, force: bool = False):
+        """
+        Ghi chỉ mục ra đĩa nếu có thay đổi
+        
+        Args:
+            force: Ghi ngay, không đợi SAVE_INTERVAL
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._last_save < self.SAVE_INTERVAL):
+                return
+            fingerprints = self._fingerprints.copy()
+            labels = np.array(self._labels)
+            counts = self._counts.copy()
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            np.savez(self.path, fingerprints=fingerprints, labels=labels, counts=counts)
+        except OSError as e:
+            print(f"❌ Lỗi khi lưu chỉ mục màn hình: {str(e)}")
+    
+    def fingerprint(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Tính fingerprint của frame: grayscale thu nhỏ GRID_SIZE, bỏ vùng ignore_roi
+        
+        Args:
+            frame: Frame BGR
+        
+        Returns:
+            Vector float32
+        """
+        with self._lock:
+            cv2.resize(frame, self.GRID_SIZE, dst=self._small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            return self._gray.ravel()[self._mask].astype(np.float32)
+    
+    def _nearest(self, vector: np.ndarray) -> Tuple[int, float]:
+        """Index và khoảng cách của trạng thái gần nhất (gọi khi đang giữ _lock, chỉ mục không rỗng)"""
+        distances = np.abs(self._fingerprints - vector).mean(axis=1)
+        index = int(np.argmin(distances))
+        return index, float(distances[index])
+    
+    def lookup(self, frame: np.ndarray, label: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Tìm trạng thái đã biết gần nhất với frame
+        
+        Args:
+            frame: Frame BGR
+            label: Nhãn khi trên frame vừa detect được target (màn hình chắc chắn bình thường),
+                trạng thái chưa biết sẽ được học luôn
+        
+        Returns:
+            Dict gồm label của trạng thái gần nhất (None nếu chỉ mục rỗng), distance
+            và unknown (True = màn hình lạ và không detect được gì)
+        """
+        vector = self.fingerprint(frame)
+        with self._lock:
+            self.stats['lookups'] += 1
+            nearest, distance = (None, float('inf'))
+            if self._labels:
+                index, distance = self._nearest(vector)
+                nearest = self._labels[index]
+            unknown = (label is None and int(self._counts.sum()) >= self.MIN_OBSERVATIONS
+                       and distance > self.UNKNOWN_DISTANCE)
+            if unknown:
+                self.stats['unknown'] += 1
+            match = {'label': nearest, 'distance': distance, 'unknown': unknown}
+            if label is None:
+                return match
+            learned = self._add(vector, label, index if self._labels else None, distance)
+        if learned:
+            self.save()
+        return match
+    
+    def learn(self, frame: np.ndarray, label: str):
+        """
+        Ghi nhận frame là một màn hình bình thường
+        
+        Args:
+            frame: Frame BGR
+            label: Nhãn trạng thái
+        """
+        vector = self.fingerprint(frame)
+        with self._lock:
+            index, distance = self._nearest(vector) if self._labels else (None, float('inf'))
+            learned = self._add(vector, label, index, distance)
+        if learned:
+            self.save()
+    
+    def _add(self, vector: np.ndarray, label: str, nearest: Optional[int], distance: float) -> bool:
+        """
+        Thêm fingerprint vào chỉ mục hoặc gộp vào trạng thái gần nhất (gọi khi đang giữ _lock)
+        
+        Returns:
+            bool: True nếu đã thêm trạng thái mới
+        """
+        if nearest is not None and distance <= self.MERGE_DISTANCE:
+            self._counts[nearest] += 1
+            self.stats['merged'] += 1
+            return False
+        
+        if len(self._labels) >= self.MAX_STATES:
+            # Thay trạng thái ít gặp nhất
+            index = int(np.argmin(self._counts))
+            self._fingerprints[index] = vector
+            self._labels[index] = label
+            self._counts[index] = 1
+        else:
+            self._fingerprints = np.vstack([self._fingerprints, vector[np.newaxis]])
+            self._labels.append(label)
+            self._counts = np.append(self._counts, 1)
+        self.stats['learned'] += 1
+        self._dirty = True
+        return True
+    
+    def clear(self):
+        """Xóa toàn bộ trạng thái đã biết (ví dụ khi giao diện trang thay đổi)"""
+        with self._lock:
+            self._fingerprints = self._fingerprints[:0]
+            self._labels = []
+            self._counts = self._counts[:0]
+            self._dirty = True
+        self.save(force=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê chỉ mục
+        
+        Returns:
+            Dict gồm số lần tra cứu, số lần gặp màn hình lạ, số trạng thái đã học / đã gộp và số trạng thái theo nhãn
+        """
+        with self._lock:
+            stats = self.stats.copy()
+            stats['states'] = len(self._labels)
+            labels: Dict[str, int] = {}
+            for label in self._labels:
+                labels[label] = labels.get(label, 0) + 1
+            stats['labels'] = labels
+        return stats
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Module hiệu chỉnh scroll: đo số pixel nội dung dịch chuyển cho mỗi đơn vị scroll để scroll đúng một trang
+"""
+import os
+import json
+import statistics
+import cv2
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+
+class ScrollCalibrator:
+    """Class ước lượng độ dịch chuyển của outline giữa hai frame (phase correlation) và quy đổi pixel sang đơn vị scroll"""
+    
+    PROBE_UNITS = 50              # Số đơn vị mỗi lần scroll khi chưa hiệu chỉnh (nhỏ để độ dịch đo được nằm gọn trong dải)
+    STRIP_HALF_WIDTH = 0.08       # Nửa chiều rộng dải frame quanh vị trí scroll dùng để đo (tỉ lệ chiều rộng)
+    MIN_RESPONSE = 0.1            # Độ tin cậy phase correlation thấp hơn mức này thì bỏ lần đo
+    MAX_MEASURE_FRACTION = 0.45   # Chỉ đo khi độ dịch dự kiến nhỏ hơn phần này của chiều cao dải (tránh nhầm chu kỳ)
+    STILL_THRESHOLD = 1.0         # Chênh lệch trung bình (0 - 255) nhỏ hơn mức này = nội dung không dịch chuyển (hết trang)
+    VIEWPORT_FRACTION = 0.85      # Phần chiều cao frame là vùng outline cuộn được (trừ header)
+    OVERLAP_PX = 80               # Phần chồng lấn giữa hai trang liên tiếp để không cắt mất lesson ở mép (pixel)
+    REFINE_INTERVAL = 5           # Sau chừng này lần scroll cả trang (quá dài để đo) thì scroll một đoạn ngắn để đo lại
+    REFINE_FRACTION = 0.25        # Độ dài đoạn scroll đo lại (tỉ lệ chiều cao frame, dưới MAX_MEASURE_FRACTION kể cả khi hiệu chỉnh lệch)
+    HISTORY_SIZE = 20
+    
+    def __init__(self, name: str = "main",
+                 calibration_path: Optional[str] = os.path.join("Data", "scroll_calibration.json")):
+        """
+        Args:
+            name: Tên phiên (mỗi phiên/cửa sổ có thể có mức zoom khác nhau)
+            calibration_path: File lưu kết quả hiệu chỉnh (None = không lưu)
+        """
+        self.name = name
+        self.calibration_path = calibration_path
+        self.samples: List[float] = self._load()
+        self._window: Optional[np.ndarray] = None
+        self._unmeasured = 0  # Số lần scroll liên tiếp không đo được vì độ dịch quá lớn
+        self.stats = {'measurements': 0, 'rejected': 0, 'page_end': 0, 'unmeasured': 0, 'refines': 0}
+    
+    def _load(self) -> List[float]:
+        """Đọc các lần đo đã lưu của phiên"""
+        if not self.calibration_path or not os.path.exists(self.calibration_path):
+            return []
+        try:
+            with open(self.calibration_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return [float(sample) for sample in data.get(self.name, [])]
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Không đọc được kết quả hiệu chỉnh scroll: {str(e)}")
+            return []
+    
+    def _save(self):
+        """Ghi các lần đo ra file (giữ nguyên kết quả của các phiên khác)"""
+        if not self.calibration_path:
+            return
+        data: Dict[str, Any] = {}
+        try:
+            if os.path.exists(self.calibration_path):
+                with open(self.calibration_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.name] = [round(sample, 4) for sample in self.samples]
+        try:
+            directory = os.path.dirname(self.calibration_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.calibration_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"❌ Lỗi khi lưu kết quả hiệu chỉnh scroll: {str(e)}")
+    
+    @property
+    def pixels_per_unit(self) -> Optional[float]:
+        """Số pixel nội dung dịch chuyển cho mỗi đơn vị scroll (trung vị các lần đo), None nếu chưa hiệu chỉnh"""
+        return statistics.median(self.samples) if self.samples else None
+    
+    def strip(self, frame: np.ndarray, x: int) -> np.ndarray:
+        """
+        Cắt dải dọc quanh vị trí scroll và chuyển sang grayscale float32 (bản copy)
+        
+        Args:
+            frame: Frame BGR của phiên
+            x: Tọa độ x của vị trí scroll trong frame
+        
+        Returns:
+            Dải grayscale float32
+        """
+        half = max(int(frame.shape[1] * self.STRIP_HALF_WIDTH), 16)
+        x0, x1 = max(x - half, 0), min(x + half, frame.shape[1])
+        return cv2.cvtColor(frame[:, x0:x1], cv2.COLOR_BGR2GRAY).astype(np.float32)
+    
+    def observe(self, before: np.ndarray, after: np.ndarray, units: int) -> Optional[float]:
+        """
+        Đo độ dịch chuyển giữa hai dải trước/sau một lần scroll và cập nhật hiệu chỉnh
+        
+        Args:
+            before: Dải từ strip() trước khi scroll
+            after: Dải từ strip() sau khi scroll
+            units: Số đơn vị đã scroll (âm = xuống)
+        
+        Returns:
+            Độ dịch chuyển (pixel, 0.0 = nội dung không dịch chuyển / hết trang),
+            None nếu không đo được (độ dịch quá lớn hoặc kém tin cậy)
+        """
+        if before.shape != after.shape or units == 0:
+            return None
+        
+        if float(np.mean(cv2.absdiff(before, after))) < self.STILL_THRESHOLD:
+            self.stats['page_end'] += 1
+            return 0.0
+        
+        height = before.shape[0]
+        expected = abs(units) * self.pixels_per_unit if self.pixels_per_unit else None
+        if expected is not None and expected > height * self.MAX_MEASURE_FRACTION:
+            self._unmeasured += 1
+            self.stats['unmeasured'] += 1
+            return None
+        
+        if self._window is None or self._window.shape != before.shape:
+            self._window = cv2.createHanningWindow((before.shape[1], before.shape[0]), cv2.CV_32F)
+        (_, shift_y), response = cv2.phaseCorrelate(before, after, self._window)
+        if response < self.MIN_RESPONSE or abs(shift_y) < 1.0:
+            self.stats['rejected'] += 1
+            return None
+        
+        self._unmeasured = 0
+        self.stats['measurements'] += 1
+        self.samples = (self.samples + [abs(shift_y) / abs(units)])[-self.HISTORY_SIZE:]
+        self._save()
+        return abs(shift_y)
+    
+    def is_calibrated(self) -> bool:
+        """Kiểm tra đã có kết quả hiệu chỉnh chưa"""
+        return bool(self.samples)
+    
+    def units_for_pixels(self, pixels: float) -> int:
+        """
+        Quy đổi khoảng cách pixel sang số đơn vị scroll
+        
+        Args:
+            pixels: Khoảng cách cần scroll (pixel)
+        
+        Returns:
+            Số đơn vị scroll (PROBE_UNITS nếu chưa hiệu chỉnh)
+        """
+        if not self.pixels_per_unit:
+            return self.PROBE_UNITS
+        return max(int(round(pixels / self.pixels_per_unit)), 1)
+    
+    def page_units(self, frame_height: int) -> int:
+        """
+        Số đơn vị scroll cho một trang outline (chiều cao vùng outline trừ phần chồng lấn)
+        
+        Args:
+            frame_height: Chiều cao frame của phiên (pixel)
+        
+        Returns:
+            Số đơn vị scroll (dương)
+        """
+        page = frame_height * self.VIEWPORT_FRACTION - self.OVERLAP_PX
+        return self.units_for_pixels(max(page, self.OVERLAP_PX))
+    
+    def scroll_units(self, frame_height: int) -> int:
+        """
+        Số đơn vị cho lần scroll tiếp theo: thường là một trang, nhưng cứ sau REFINE_INTERVAL lần scroll
+        không đo được thì scroll một đoạn ngắn (REFINE_FRACTION chiều cao frame) để hiệu chỉnh tiếp
+        (ví dụ khi người dùng đổi mức zoom)
+        
+        Args:
+            frame_height: Chiều cao frame của phiên (pixel)
+        
+        Returns:
+            Số đơn vị scroll (dương)
+        """
+        if self.is_calibrated() and self._unmeasured >= self.REFINE_INTERVAL:
+            self._unmeasured = 0
+            self.stats['refines'] += 1
+            return self.units_for_pixels(frame_height * self.REFINE_FRACTION)
+        return self.page_units(frame_height)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê hiệu chỉnh scroll
+        
+        Returns:
+            Dict gồm số lần đo hợp lệ, bị loại, số lần gặp cuối trang, số lần scroll quá dài để đo,
+            số lần scroll ngắn để đo lại và số pixel mỗi đơn vị scroll
+        """
+        stats = self.stats.copy()
+        stats['pixels_per_unit'] = self.pixels_per_unit
+        return stats
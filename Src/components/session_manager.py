@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Module quản lý nhiều phiên automation chạy song song, mỗi phiên điều khiển một cửa sổ khóa học
+"""
+import time
+import threading
+import numpy as np
+from typing import Dict, Any, Optional, Callable, Tuple
+from components.automation_core import AutomationCore
+from components.image_detector import ImageDetector
+from components.input_queue import InputQueue
+from components.async_runner import AsyncAutomationRunner
+from components.stats_manager import StatsManager
+from components.loop_detector import LoopDetector
+
+
+class SessionManager:
+    """Class chạy nhiều AutomationCore dùng chung một engine chụp/detect và một hàng đợi thao tác chuột"""
+    
+    FRAME_MAX_AGE = 0.25  # Các phiên detect trong khoảng này dùng chung một lần chụp màn hình (giây)
+    
+    def __init__(self, assets_path: str = "Assets", image_detector: Optional[ImageDetector] = None,
+                 max_repeats: int = 3, restart_delay: float = 3.0, motion_profile: str = "fast",
+                 aggregate_stats: Optional[StatsManager] = None):
+        """
+        Args:
+            assets_path: Thư mục chứa assets
+            image_detector: ImageDetector dùng chung (None = tạo mới)
+            max_repeats: Số lần lặp tối đa trước khi auto restart một phiên
+            restart_delay: Thời gian đợi trước khi chạy lại phiên bị auto restart (giây)
+            motion_profile: Kiểu di chuyển chuột của hàng đợi thao tác (xem MOTION_PROFILES)
+            aggregate_stats: StatsManager gom thống kê của mọi phiên (ví dụ cho metrics endpoint), None = không gom
+        """
+        self._owns_image_detector = image_detector is None
+        self.image_detector = image_detector or ImageDetector(assets_path)
+        self.input_queue = InputQueue(motion_profile)
+        self.runner = AsyncAutomationRunner()
+        self.runner.set_session_finished_callback(self._on_session_finished)
+        self.max_repeats = max_repeats
+        self.restart_delay = restart_delay
+        self.aggregate_stats = aggregate_stats
+        
+        # Mỗi phiên: automation, stats, loop detector, region, restart timer
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        
+        # Frame toàn màn hình dùng chung giữa các phiên
+        self._frame: Optional[np.ndarray] = None
+        self._frame_time = 0.0
+        self._frame_lock = threading.Lock()
+        self.capture_stats = {'captures': 0, 'shared': 0}
+        
+        # Callback log (tên phiên, message)
+        self.on_log_message: Optional[Callable[[str, str], None]] = None
+    
+    def set_log_callback(self, callback: Callable[[str, str], None]):
+        """Thiết lập callback cho logging (nhận tên phiên và message)"""
+        self.on_log_message = callback
+    
+    def _log(self, name: str, message: str):
+        """Helper method để log message của một phiên"""
+        if self.on_log_message:
+            self.on_log_message(name, message)
+        else:
+            print(f"[{name}] {message}")
+    
+    def capture_frame(self) -> np.ndarray:
+        """
+        Lấy frame toàn màn hình dùng chung, chỉ chụp lại khi frame hiện có đã cũ hơn FRAME_MAX_AGE
+        
+        Chụp vào buffer riêng trong lock detect của ImageDetector để không ghi đè buffer khi phiên khác đang detect.
+        
+        Returns:
+            Frame BGR toàn màn hình
+        """
+        with self._frame_lock:
+            now = time.time()
+            if self._frame is not None and now - self._frame_time < self.FRAME_MAX_AGE:
+                self.capture_stats['shared'] += 1
+                return self._frame
+            
+            self._frame = self.image_detector.capture_screenshot("session_frame")
+            self._frame_time = now
+            self.capture_stats['captures'] += 1
+            return self._frame
+    
+    def add_session(self, name: str, region: Optional[Tuple[int, int, int, int]] = None,
+                    scroll_position: Optional[Tuple[float, float]] = None,
+                    course: Optional[str] = None,
+                    video_roi: Optional[Tuple[float, float, float, float]] = None) -> AutomationCore:
+        """
+        Thêm một phiên automation điều khiển một vùng màn hình
+        
+        Args:
+            name: Tên phiên
+            region: Vùng màn hình (x, y, width, height) của cửa sổ, None = toàn màn hình
+            scroll_position: Vị trí scroll (% X, % Y) trong vùng, None = mặc định
+            course: Tên khóa học của cửa sổ (lịch sử lesson lưu theo khóa học), None = dùng chung
+            video_roi: Vùng video theo tỉ lệ vùng của phiên (phát hiện đứng hình), None = mặc định
+        
+        Returns:
+            AutomationCore của phiên
+        """
+        if name in self.sessions:
+            raise ValueError(f"Phiên '{name}' đã tồn tại")
+        
+        automation = AutomationCore(image_detector=self.image_detector, region=region,
+                                    input_queue=self.input_queue, frame_source=self.capture_frame,
+                                    name=name, course=course, video_roi=video_roi)
+        stats = StatsManager(rollup_path=None)
+        loop_detector = LoopDetector(max_repeats=self.max_repeats)
+        
+        automation.set_log_callback(lambda message: self._log(name, message))
+        automation.set_stats_callback(lambda stat_type: self._record_stat(name, stat_type))
+        automation.set_metric_callback(lambda event_type, value=0.0: self._record_event(name, event_type, value))
+        automation.set_loop_check_callback(loop_detector.check_loop_detection)
+        loop_detector.set_auto_restart_callback(lambda: self.restart_session(name))
+        if scroll_position:
+            automation.configure_scroll_position(*scroll_position)
+        
+        self.sessions[name] = {
+            'automation': automation,
+            'stats': stats,
+            'loop_detector': loop_detector,
+            'region': region,
+            'restart_timer': None
+        }
+        self.runner.add_session(name, automation)
+        return automation
+    
+    def _record_stat(self, name: str, stat_type: str):
+        """Tăng bộ đếm của phiên và của StatsManager tổng (nếu có)"""
+        self.sessions[name]['stats'].record_stat(stat_type)
+        if self.aggregate_stats:
+            self.aggregate_stats.record_stat(stat_type)
+    
+    def _record_event(self, name: str, event_type: str, value: float = 0.0):
+        """Ghi event của phiên vào StatsManager của phiên và StatsManager tổng (nếu có)"""
+        self.sessions[name]['stats'].record_event(event_type, value)
+        if self.aggregate_stats:
+            self.aggregate_stats.record_event(event_type, value)
+    
+    def start_session(self, name: str):
+        """
+        Bắt đầu một phiên
+        
+        Args:
+            name: Tên phiên
+        """
+        session = self.sessions[name]
+        session['stats'].start_timer()
+        self.runner.submit_session(name)
+    
+    def stop_session(self, name: str):
+        """
+        Dừng một phiên
+        
+        Args:
+            name: Tên phiên
+        """
+        session = self.sessions[name]
+        if session['restart_timer']:
+            session['restart_timer'].cancel()
+            session['restart_timer'] = None
+        self.runner.stop_session(name)
+    
+    def restart_session(self, name: str):
+        """
+        Auto restart một phiên bị lặp, các phiên khác vẫn chạy bình thường
+        
+        Args:
+            name: Tên phiên
+        """
+        session = self.sessions[name]
+        self._log(name, "🔄 Phát hiện lặp vô hạn! Tự động restart phiên...")
+        self._record_event(name, 'auto_restart')
+        self.runner.stop_session(name)
+        
+        timer = threading.Timer(self.restart_delay, self.start_session, args=(name,))
+        timer.daemon = True
+        session['restart_timer'] = timer
+        timer.start()
+    
+    def start_all(self):
+        """Bắt đầu tất cả các phiên"""
+        self.input_queue.start()
+        for name in self.sessions:
+            self.start_session(name)
+    
+    def stop_all(self):
+        """Dừng tất cả các phiên"""
+        for name in self.sessions:
+            self.stop_session(name)
+    
+    def shutdown(self):
+        """Dừng tất cả các phiên, event loop, hàng đợi thao tác chuột và trả lại ImageDetector tự tạo"""
+        self.stop_all()
+        self.runner.shutdown()
+        self.input_queue.stop()
+        for session in self.sessions.values():
+            session['automation'].close()
+        if self._owns_image_detector:
+            self.image_detector.close()
+            self._owns_image_detector = False
+    
+    def _on_session_finished(self, name: str):
+        """Ghi log khi một phiên kết thúc"""
+        self._log(name, "Phiên automation đã kết thúc")
+    
+    def get_session_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Lấy thống kê của từng phiên
+        
+        Returns:
+            Dict tên phiên → thống kê, số lần auto restart, trạng thái chạy và region
+        """
+        return {
+            name: {
+                'stats': session['stats'].get_all_stats(),
+                'auto_restarts': session['loop_detector'].get_auto_restart_count(),
+                'running': session['automation'].is_running,
+                'region': session['region']
+            }
+            for name, session in self.sessions.items()
+        }
+    
+    def get_auto_restart_count(self) -> int:
+        """Tổng số lần auto restart của tất cả các phiên"""
+        return sum(session['loop_detector'].get_auto_restart_count() for session in self.sessions.values())
+    
+    def get_summary(self) -> str:
+        """
+        Lấy tóm tắt thống kê của tất cả các phiên
+        
+        Returns:
+            str: Mỗi phiên một dòng
+        """
+        return "\n".join(f"[{name}] {session['stats'].get_stats_summary()}"
+                         for name, session in self.sessions.items())
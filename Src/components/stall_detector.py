@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Module phát hiện video bị đứng hình (treo hoặc buffering mãi) và chọn hành động khôi phục
+"""
+import time
+import statistics
+import cv2
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class StallDetector:
+    """Class so sánh frame thu nhỏ của vùng video giữa các lần kiểm tra để biết video còn chạy không"""
+    
+    VIDEO_ROI = (0.25, 0.1, 0.7, 0.65)  # Vùng video trong frame của phiên (x, y, width, height theo tỉ lệ)
+    THUMB_SIZE = (64, 36)               # Kích thước frame thu nhỏ dùng để so sánh
+    MOTION_THRESHOLD = 1.0              # Chênh lệch trung bình (0 - 255) thấp hơn mức này coi như đứng hình (kể cả icon buffering nhỏ)
+    PROGRESS_EPSILON = 0.001            # Tiến độ tăng hơn mức này coi như video vẫn chạy (video chỉ có slide tĩnh)
+    STALL_TIMEOUT = 90.0                # Đứng hình lâu hơn mức này mà chưa có play button thì coi là bị treo (giây)
+    CHECK_INTERVAL = 15.0               # Khoảng kiểm tra lại khi đang đứng hình (giây)
+    ACTION_GRACE = 20.0                 # Đợi sau mỗi hành động khôi phục trước khi leo thang tiếp (giây)
+    RECOVERY_ACTIONS = ("click_video", "seek", "refresh")  # Thứ tự leo thang, hết danh sách thì "give_up"
+    REQUIRE_EVIDENCE = True             # Chỉ khôi phục khi có dấu hiệu treo (tiến độ không tăng hoặc thấy icon buffering)
+    HISTORY_SIZE = 50                   # Số lần đứng hình gần nhất giữ lại
+    
+    def __init__(self, video_roi: Optional[Tuple[float, float, float, float]] = None,
+                 stall_timeout: float = STALL_TIMEOUT, require_evidence: bool = REQUIRE_EVIDENCE):
+        """
+        Args:
+            video_roi: Vùng video theo tỉ lệ frame của phiên (None = VIDEO_ROI)
+            stall_timeout: Thời gian đứng hình để coi là bị treo (giây)
+            require_evidence: True = vùng video đứng yên thôi chưa đủ (video slide tĩnh), cần thêm dấu hiệu treo
+                              mới leo thang khôi phục
+        """
+        self.video_roi = tuple(video_roi) if video_roi else self.VIDEO_ROI
+        self.stall_timeout = stall_timeout
+        self.require_evidence = require_evidence
+        
+        # Frame thu nhỏ (grayscale) của lần kiểm tra trước, buffers dùng lại giữa các lần
+        self._thumb: Optional[np.ndarray] = None
+        self._previous: Optional[np.ndarray] = None
+        self._small: Optional[np.ndarray] = None
+        self._last_time: Optional[float] = None
+        self._last_progress: Optional[float] = None
+        self._still_since: Optional[float] = None
+        self.last_motion = 0.0
+        
+        # Dấu hiệu treo gặp trong lúc vùng video đứng yên: "progress" (tiến độ đọc được nhưng không tăng),
+        # "buffering" (thấy icon buffering)
+        self.evidence: set = set()
+        self._unconfirmed = False
+        
+        # Lần đứng hình đang xử lý: started, detected_at, actions [(action, time, ok)]
+        self.current_stall: Optional[Dict[str, Any]] = None
+        self.history: List[Dict[str, Any]] = []
+        self.stats = {'stalls': 0, 'recovered': 0, 'unrecovered': 0, 'unconfirmed': 0, 'interrupted': 0,
+                      'actions': {}, 'recovered_by': {}}
+    
+    def get_video_rect(self, frame_shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+        """
+        Vùng video theo pixel trong frame
+        
+        Args:
+            frame_shape: Kích thước frame (height, width, ...)
+        
+        Returns:
+            Tuple (x, y, width, height)
+        """
+        height, width = frame_shape[:2]
+        roi_x, roi_y, roi_w, roi_h = self.video_roi
+        return int(width * roi_x), int(height * roi_y), max(int(width * roi_w), 1), max(int(height * roi_h), 1)
+    
+    def _motion(self, frame: np.ndarray) -> Optional[float]:
+        """Chênh lệch trung bình giữa frame thu nhỏ hiện tại và lần trước (None nếu chưa có lần trước)"""
+        x, y, width, height = self.get_video_rect(frame.shape)
+        if self._small is None:
+            self._small = np.empty((self.THUMB_SIZE[1], self.THUMB_SIZE[0], 3), dtype=np.uint8)
+            self._thumb = np.empty(self._small.shape[:2], dtype=np.uint8)
+            self._previous = np.empty_like(self._thumb)
+        
+        self._thumb, self._previous = self._previous, self._thumb
+        cv2.resize(frame[y:y + height, x:x + width], self.THUMB_SIZE, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._thumb)
+        if self._last_time is None:
+            return None
+        return cv2.norm(self._thumb, self._previous, cv2.NORM_L1) / self._thumb.size
+    
+    def observe(self, frame: np.ndarray, progress: Optional[float] = None, buffering: bool = False,
+                now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ghi nhận một lần kiểm tra video (chưa có play button)
+        
+        Args:
+            frame: Frame BGR của phiên
+            progress: Tiến độ video đọc được (None = không có)
+            buffering: True nếu thấy icon buffering của player
+            now: Thời điểm kiểm tra (None = hiện tại)
+        
+        Returns:
+            Bản ghi lần đứng hình vừa khôi phục được (video chạy lại), None nếu không có
+        """
+        now = now if now is not None else time.time()
+        motion = self._motion(frame)
+        compared = progress is not None and self._last_progress is not None
+        advanced = compared and progress > self._last_progress + self.PROGRESS_EPSILON
+        previous_time = self._last_time
+        self._last_time = now
+        if progress is not None:
+            self._last_progress = progress
+        
+        if motion is None:
+            return None
+        self.last_motion = motion
+        
+        if motion >= self.MOTION_THRESHOLD or advanced:
+            self._clear_still()
+            if self.current_stall is not None:
+                return self.finish(recovered=True, now=now)
+            return None
+        
+        if self._still_since is None:
+            # Frame giống lần kiểm tra trước: video đứng yên từ khoảng lần đó
+            self._still_since = previous_time
+        if compared:
+            self.evidence.add("progress")
+        if buffering:
+            self.evidence.add("buffering")
+        return None
+    
+    def _clear_still(self):
+        """Vùng video chạy lại: xóa mốc đứng yên và các dấu hiệu treo đã gặp"""
+        self._still_since = None
+        self.evidence = set()
+        self._unconfirmed = False
+    
+    def is_still(self) -> bool:
+        """Kiểm tra vùng video có đang đứng yên không (chưa chắc đã bị treo)"""
+        return self._still_since is not None
+    
+    def is_stalled(self, now: Optional[float] = None) -> bool:
+        """Kiểm tra video đã đứng hình quá stall_timeout chưa"""
+        now = now if now is not None else time.time()
+        return self._still_since is not None and now - self._still_since >= self.stall_timeout
+    
+    def next_action(self, now: Optional[float] = None) -> Optional[str]:
+        """
+        Chọn hành động khôi phục tiếp theo cho lần đứng hình hiện tại
+        
+        Args:
+            now: Thời điểm hiện tại (None = hiện tại)
+        
+        Returns:
+            Tên hành động trong RECOVERY_ACTIONS, "give_up" khi đã thử hết,
+            None nếu video không bị treo, chưa có dấu hiệu treo (require_evidence)
+            hoặc đang đợi kết quả của hành động trước
+        """
+        now = now if now is not None else time.time()
+        if not self.is_stalled(now):
+            return None
+        
+        if self.current_stall is None and self.require_evidence and not self.evidence:
+            # Chỉ có hình đứng yên (ví dụ video slide tĩnh không có thanh tiến độ): đếm một lần, không khôi phục
+            if not self._unconfirmed:
+                self._unconfirmed = True
+                self.stats['unconfirmed'] += 1
+            return None
+        
+        if self.current_stall is None:
+            self.current_stall = {'started': self._still_since, 'detected_at': now, 'actions': []}
+            self.stats['stalls'] += 1
+        
+        actions = self.current_stall['actions']
+        if actions and now - actions[-1][1] < self.ACTION_GRACE:
+            return None
+        if len(actions) >= len(self.RECOVERY_ACTIONS):
+            return "give_up"
+        return self.RECOVERY_ACTIONS[len(actions)]
+    
+    def record_action(self, action: str, ok: bool, now: Optional[float] = None):
+        """
+        Ghi nhận đã thực hiện một hành động khôi phục
+        
+        Args:
+            action: Tên hành động
+            ok: Hành động có thực hiện được không (ví dụ không tìm thấy refresh button = False)
+            now: Thời điểm thực hiện (None = hiện tại)
+        """
+        now = now if now is not None else time.time()
+        if self.current_stall is None:
+            return
+        # Hành động không thực hiện được thì leo thang ngay ở lần kiểm tra sau
+        self.current_stall['actions'].append((action, now if ok else now - self.ACTION_GRACE, ok))
+        self.stats['actions'][action] = self.stats['actions'].get(action, 0) + 1
+    
+    def finish(self, recovered: bool, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Kết thúc lần đứng hình hiện tại
+        
+        Args:
+            recovered: True nếu video đã chạy lại
+            now: Thời điểm kết thúc (None = hiện tại)
+        
+        Returns:
+            Bản ghi lần đứng hình (started, duration, actions, recovered, recovered_by) hoặc None
+        """
+        now = now if now is not None else time.time()
+        stall = self.current_stall
+        self.current_stall = None
+        self._clear_still()
+        if stall is None:
+            return None
+        
+        done = [action for action, _, ok in stall['actions'] if ok]
+        record = {
+            'started': stall['started'],
+            'duration': now - stall['started'],
+            'actions': [action for action, _, _ in stall['actions']],
+            'recovered': recovered,
+            'recovered_by': (done[-1] if done else "self") if recovered else None
+        }
+        if recovered:
+            self.stats['recovered'] += 1
+            self.stats['recovered_by'][record['recovered_by']] = \
+                self.stats['recovered_by'].get(record['recovered_by'], 0) + 1
+        else:
+            self.stats['unrecovered'] += 1
+        self.history = (self.history + [record])[-self.HISTORY_SIZE:]
+        return record
+    
+    def reset(self):
+        """Bắt đầu theo dõi lại từ đầu (video kết thúc hoặc lesson mới)"""
+        if self.current_stall is not None:
+            # Chưa thấy video chạy lại nên không tính là đã khôi phục, chỉ đếm là bị ngắt
+            self.stats['interrupted'] += 1
+            self.current_stall = None
+        self._last_time = None
+        self._last_progress = None
+        self._clear_still()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê đứng hình
+        
+        Returns:
+            Dict gồm số lần đứng hình, đã khôi phục, không khôi phục được, đứng yên nhưng không có dấu hiệu treo,
+            bị ngắt khi đang đứng hình (video kết thúc hoặc lượt chạy mới),
+            số lần mỗi hành động, hành động đã khôi phục được, thời gian đứng hình trung bình và lần đứng hình hiện tại
+        """
+        durations = [record['duration'] for record in self.history]
+        return {
+            'stalls': self.stats['stalls'],
+            'recovered': self.stats['recovered'],
+            'unrecovered': self.stats['unrecovered'],
+            'unconfirmed': self.stats['unconfirmed'],
+            'interrupted': self.stats['interrupted'],
+            'actions': dict(self.stats['actions']),
+            'recovered_by': dict(self.stats['recovered_by']),
+            'mean_duration': statistics.mean(durations) if durations else 0.0,
+            'stalled': self.current_stall is not None,
+            'last_motion': self.last_motion,
+            'evidence': sorted(self.evidence)
+        }
@@ -2,21 +2,72 @@
 """
 Module quản lý thống kê của ứng dụng
 """
+import os
+import json
 import time
-from typing import Dict, Any
+import threading
+from array import array
+import numpy as np
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
 
 class StatsManager:
     """Class quản lý thống kê hoạt động"""
     
-    def __init__(self):
+    # Mã các loại event lưu trong ring buffer (index trong tuple = mã event)
+    EVENT_TYPES = (
+        'lessons_clicked',
+        'play_buttons_detected',
+        'refresh_clicks',
+        'expand_clicks',
+        'auto_restart',
+        'detection_time',
+        'video_stall',
+        'unknown_screen',
+        'lesson_click_retries',
+        'lesson_clicks_failed',
+    )
+    
+    # Độ dài cửa sổ tối thiểu (giây) khi tính rate: trong phút đầu rate được chia cho 60 giây thay vì thời gian
+    # đã chạy, tránh rate ảo (1 lesson sau 2 giây = 1800/giờ)
+    MIN_RATE_WINDOW = 60.0
+    
+    # Các mốc (giây) của histogram thời gian detect
+    DETECTION_TIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    
+    def __init__(self, capacity: int = 8192,
+                 rollup_path: Optional[str] = os.path.join("Data", "stats_rollup.jsonl"),
+                 rollup_interval: float = 300.0):
         self.stats = {
             'lessons_clicked': 0,
             'play_buttons_detected': 0,
             'refresh_clicks': 0,
             'expand_clicks': 0,
+            'lesson_click_retries': 0,
+            'lesson_clicks_failed': 0,
             'start_time': None
         }
+        
+        # Ring buffer các event có timestamp, lưu bằng array để gọn bộ nhớ
+        self.capacity = capacity
+        self._event_codes = {name: code for code, name in enumerate(self.EVENT_TYPES)}
+        self._times = array('d', bytes(8 * capacity))
+        self._codes = array('B', bytes(capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._event_count = 0  # Tổng số event đã ghi (vị trí ghi = count % capacity)
+        self._lock = threading.Lock()
+        # View numpy trên cùng bộ nhớ của ring buffer (không copy) để đọc bằng phép toán vector
+        self._times_view = np.frombuffer(self._times, dtype=np.float64)
+        self._codes_view = np.frombuffer(self._codes, dtype=np.uint8)
+        self._values_view = np.frombuffer(self._values, dtype=np.float64)
+        
+        # Histogram tích lũy cho thời gian detect (không bị ring buffer ghi đè)
+        self._detection_histogram = self._new_histogram()
+        
+        # Cấu hình roll-up định kỳ ra đĩa
+        self.rollup_path = rollup_path
+        self.rollup_interval = rollup_interval
+        self._last_rollup = time.time()
     
     def reset_stats(self):
         """Reset tất cả thống kê"""
@@ -25,8 +76,13 @@ class StatsManager:
             'play_buttons_detected': 0,
             'refresh_clicks': 0,
             'expand_clicks': 0,
+            'lesson_click_retries': 0,
+            'lesson_clicks_failed': 0,
             'start_time': None
         }
+        with self._lock:
+            self._event_count = 0
+            self._detection_histogram = self._new_histogram()
     
     def start_timer(self):
         """Bắt đầu đếm thời gian"""
@@ -47,21 +103,270 @@ class StatsManager:
             return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
         return "00:00:00"
     
+    def record_event(self, event_type: str, value: float = 0.0, timestamp: Optional[float] = None):
+        """
+        Ghi một event có timestamp vào ring buffer
+        
+        Args:
+            event_type: Loại event (một trong EVENT_TYPES)
+            value: Giá trị đi kèm (ví dụ thời gian detect tính bằng giây)
+            timestamp: Thời điểm xảy ra, mặc định là hiện tại
+        """
+        code = self._event_codes.get(event_type)
+        if code is None:
+            return
+        
+        with self._lock:
+            index = self._event_count % self.capacity
+            self._times[index] = timestamp if timestamp is not None else time.time()
+            self._codes[index] = code
+            self._values[index] = value
+            self._event_count += 1
+            
+            if event_type == 'detection_time':
+                histogram = self._detection_histogram
+                for i, bound in enumerate(self.DETECTION_TIME_BUCKETS):
+                    if value <= bound:
+                        histogram['counts'][i] += 1
+                histogram['sum'] += value
+                histogram['count'] += 1
+    
+    def _new_histogram(self) -> Dict[str, Any]:
+        """Tạo histogram rỗng theo DETECTION_TIME_BUCKETS"""
+        return {'counts': [0] * len(self.DETECTION_TIME_BUCKETS), 'sum': 0.0, 'count': 0}
+    
+    def get_detection_histogram(self) -> Dict[str, Any]:
+        """
+        Lấy histogram tích lũy của thời gian detect
+        
+        Returns:
+            Dict gồm buckets (list (mốc, số lần <= mốc)), sum và count
+        """
+        with self._lock:
+            histogram = self._detection_histogram
+            return {
+                'buckets': list(zip(self.DETECTION_TIME_BUCKETS, histogram['counts'])),
+                'sum': histogram['sum'],
+                'count': histogram['count']
+            }
+    
+    def record_stat(self, stat_type: str):
+        """
+        Tăng bộ đếm tương ứng với stat_type và ghi event vào ring buffer
+        
+        Args:
+            stat_type: Tên bộ đếm (lessons_clicked, play_buttons_detected, ...)
+        """
+        if stat_type in self.stats and stat_type != 'start_time':
+            self.stats[stat_type] += 1
+        self.record_event(stat_type)
+    
     def increment_lessons_clicked(self):
         """Tăng số lượng lessons đã click"""
-        self.stats['lessons_clicked'] += 1
+        self.record_stat('lessons_clicked')
     
     def increment_play_buttons_detected(self):
         """Tăng số lượng play buttons đã phát hiện"""
-        self.stats['play_buttons_detected'] += 1
+        self.record_stat('play_buttons_detected')
     
     def increment_refresh_clicks(self):
         """Tăng số lượng refresh clicks"""
-        self.stats['refresh_clicks'] += 1
+        self.record_stat('refresh_clicks')
     
     def increment_expand_clicks(self):
         """Tăng số lượng expand clicks"""
-        self.stats['expand_clicks'] += 1
+        self.record_stat('expand_clicks')
+    
+    def _snapshot(self, since: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Copy các event còn trong ring buffer theo thứ tự thời gian (một lần duyệt, giữ lock ngắn nhất có thể)
+        
+        Args:
+            since: Chỉ lấy event từ thời điểm này trở đi
+        
+        Returns:
+            Tuple (timestamps, mã event, values) dạng numpy
+        """
+        with self._lock:
+            count = min(self._event_count, self.capacity)
+            head = self._event_count % self.capacity
+            if self._event_count > self.capacity:
+                # Ring buffer đã đầy: event cũ nhất nằm ở vị trí ghi tiếp theo
+                times = np.concatenate((self._times_view[head:], self._times_view[:head]))
+                codes = np.concatenate((self._codes_view[head:], self._codes_view[:head]))
+                values = np.concatenate((self._values_view[head:], self._values_view[:head]))
+            else:
+                times = self._times_view[:count].copy()
+                codes = self._codes_view[:count].copy()
+                values = self._values_view[:count].copy()
+        
+        if since is not None:
+            keep = times >= since
+            times, codes, values = times[keep], codes[keep], values[keep]
+        return times, codes, values
+    
+    def get_events(self, event_type: Optional[str] = None,
+                   since: Optional[float] = None) -> List[Tuple[float, str, float]]:
+        """
+        Lấy các event còn trong ring buffer theo thứ tự thời gian
+        
+        Args:
+            event_type: Chỉ lấy loại event này (None = tất cả)
+            since: Chỉ lấy event từ thời điểm này trở đi
+        
+        Returns:
+            List các tuple (timestamp, event_type, value)
+        """
+        times, codes, values = self._snapshot(since)
+        if event_type:
+            keep = codes == self._event_codes.get(event_type, -1)
+            times, codes, values = times[keep], codes[keep], values[keep]
+        return [(timestamp, self.EVENT_TYPES[code], value)
+                for timestamp, code, value in zip(times.tolist(), codes.tolist(), values.tolist())]
+    
+    def _get_window_start(self, window: float, now: float) -> Tuple[float, float]:
+        """Tính thời điểm bắt đầu cửa sổ tính rate và độ dài thực tế (giờ, tối thiểu MIN_RATE_WINDOW)"""
+        window_start = now - window
+        if self.stats['start_time']:
+            window_start = max(window_start, self.stats['start_time'])
+        hours = max(now - window_start, self.MIN_RATE_WINDOW) / 3600.0
+        return window_start, hours
+    
+    def _count(self, codes: np.ndarray, *event_types: str) -> int:
+        """Đếm số event thuộc các loại event_types"""
+        return int(np.isin(codes, [self._event_codes[event_type] for event_type in event_types]).sum())
+    
+    def _derive_rates(self, times: np.ndarray, codes: np.ndarray, values: np.ndarray,
+                      window_start: float, hours: float) -> Dict[str, float]:
+        """Tính các chỉ số dẫn xuất từ các event đã copy (xem get_derived_rates)"""
+        keep = times >= window_start
+        times, codes, values = times[keep], codes[keep], values[keep]
+        
+        lessons = self._count(codes, 'lessons_clicked')
+        failed_clicks = self._count(codes, 'lesson_click_retries', 'lesson_clicks_failed')
+        restarts = self._count(codes, 'auto_restart')
+        detection = values[codes == self._event_codes['detection_time']]
+        
+        # Độ trễ từ lúc video kết thúc đến lúc click lesson tiếp theo (chỉ duyệt hai loại event này)
+        lesson_code = self._event_codes['lessons_clicked']
+        latencies = []
+        pending_video_end = None
+        pairs = np.isin(codes, [lesson_code, self._event_codes['play_buttons_detected']])
+        for timestamp, code in zip(times[pairs].tolist(), codes[pairs].tolist()):
+            if code != lesson_code:
+                pending_video_end = timestamp
+            elif pending_video_end is not None:
+                latencies.append(timestamp - pending_video_end)
+                pending_video_end = None
+        
+        return {
+            'lessons_per_hour': lessons / hours,
+            'restarts_per_hour': restarts / hours,
+            'mean_click_latency': sum(latencies) / len(latencies) if latencies else 0.0,
+            'mean_detection_time': float(detection.mean()) if len(detection) else 0.0,
+            'click_success_rate': lessons / (lessons + failed_clicks) if lessons + failed_clicks else 1.0,
+        }
+    
+    def get_derived_rates(self, window: float = 3600.0) -> Dict[str, float]:
+        """
+        Tính các chỉ số dẫn xuất từ ring buffer
+        
+        Các rate theo giờ được chia cho độ dài cửa sổ thực tế (từ lúc bắt đầu chạy nếu chưa đủ window),
+        tối thiểu MIN_RATE_WINDOW giây.
+        
+        Args:
+            window: Độ dài cửa sổ tính toán (giây), mặc định 1 giờ gần nhất
+        
+        Returns:
+            Dict gồm lessons_per_hour, restarts_per_hour, mean_click_latency (giây),
+            mean_detection_time (giây/tick) và click_success_rate (tỉ lệ click lesson mở được video)
+        """
+        window_start, hours = self._get_window_start(window, time.time())
+        return self._derive_rates(*self._snapshot(window_start), window_start, hours)
+        
+    def _sparkline(self, times: np.ndarray, codes: np.ndarray, values: np.ndarray, event_type: str,
+                   since: float, buckets: int, bucket_seconds: float, mode: str) -> List[float]:
+        """Gom các event đã copy theo khoảng thời gian (xem get_sparkline)"""
+        keep = (codes == self._event_codes.get(event_type, -1)) & (times >= since)
+        index = np.minimum(((times[keep] - since) // bucket_seconds).astype(np.int64), buckets - 1)
+        counts = np.bincount(index, minlength=buckets)
+        if mode == 'mean':
+            totals = np.bincount(index, weights=values[keep], minlength=buckets)
+            return [total / count if count else 0.0 for total, count in zip(totals.tolist(), counts.tolist())]
+        return [float(count) for count in counts.tolist()]
+    
+    def get_sparkline(self, event_type: str, buckets: int = 24,
+                      bucket_seconds: float = 300.0, mode: str = 'count') -> List[float]:
+        """
+        Gom event theo các khoảng thời gian bằng nhau để vẽ sparkline
+        
+        Args:
+            event_type: Loại event cần gom
+            buckets: Số khoảng thời gian
+            bucket_seconds: Độ dài mỗi khoảng (giây)
+            mode: 'count' = đếm số event, 'mean' = trung bình value
+        
+        Returns:
+            List giá trị theo thứ tự từ cũ đến mới
+        """
+        since = time.time() - buckets * bucket_seconds
+        return self._sparkline(*self._snapshot(since), event_type, since, buckets, bucket_seconds, mode)
+    
+    def get_dashboard(self, sparklines: Iterable[Tuple[str, str]], window: float = 3600.0,
+                      buckets: int = 24,
+                      bucket_seconds: float = 300.0) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
+        """
+        Tính các chỉ số dẫn xuất và các sparkline cho một lần cập nhật giao diện chỉ với một lần đọc ring buffer
+        
+        Args:
+            sparklines: Các cặp (event_type, mode) cần vẽ sparkline
+            window: Cửa sổ tính các chỉ số dẫn xuất (giây)
+            buckets: Số khoảng thời gian của sparkline
+            bucket_seconds: Độ dài mỗi khoảng (giây)
+        
+        Returns:
+            Tuple (kết quả get_derived_rates, dict event_type -> giá trị sparkline)
+        """
+        now = time.time()
+        window_start, hours = self._get_window_start(window, now)
+        since = now - buckets * bucket_seconds
+        events = self._snapshot(min(window_start, since))
+        rates = self._derive_rates(*events, window_start, hours)
+        return rates, {event_type: self._sparkline(*events, event_type, since, buckets, bucket_seconds, mode)
+                       for event_type, mode in sparklines}
+    
+    def maybe_rollup(self, force: bool = False) -> bool:
+        """
+        Ghi tổng hợp thống kê ra đĩa nếu đã đến kỳ roll-up
+        
+        Args:
+            force: Ghi ngay không cần đợi đủ rollup_interval
+        
+        Returns:
+            bool: True nếu đã ghi roll-up
+        """
+        now = time.time()
+        if not self.rollup_path or (not force and now - self._last_rollup < self.rollup_interval):
+            return False
+        
+        self._last_rollup = now
+        record = {
+            'timestamp': now,
+            'runtime': self.get_runtime(),
+            'counters': {k: v for k, v in self.stats.items() if k != 'start_time'},
+            'rates': self.get_derived_rates(window=self.rollup_interval),
+        }
+        
+        try:
+            directory = os.path.dirname(self.rollup_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.rollup_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return True
+        except OSError as e:
+            print(f"❌ Lỗi khi ghi roll-up thống kê: {str(e)}")
+            return False
     
     def get_all_stats(self) -> Dict[str, Any]:
         """
@@ -80,7 +385,10 @@ class StatsManager:
             str: Tóm tắt thống kê
         """
         runtime = self.get_runtime()
+        rates = self.get_derived_rates()
         return (f"Lessons: {self.stats['lessons_clicked']}, "
                 f"Videos: {self.stats['play_buttons_detected']}, "
                 f"Expands: {self.stats['expand_clicks']}, "
-                f"Runtime: {runtime}")
+                f"Runtime: {runtime}, "
+                f"Lessons/h: {rates['lessons_per_hour']:.1f}, "
+                f"Click OK: {rates['click_success_rate'] * 100:.0f}%")
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Module hiệu chỉnh threshold của assets từ các frame đã gán nhãn positive/negative
+"""
+import os
+import time
+import cv2
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+from components.asset_manager import AssetManager
+
+
+class ThresholdCalibrator:
+    """Class chọn threshold cho từng asset dựa trên các frame mẫu đã lưu"""
+    
+    LABELS = ("positive", "negative")
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+    
+    def __init__(self, asset_manager: AssetManager, calibration_path: str = os.path.join("Data", "calibration")):
+        self.asset_manager = asset_manager
+        self.calibration_path = calibration_path
+    
+    def get_frames_dir(self, asset_key: str, label: str) -> str:
+        """
+        Lấy thư mục chứa frames của một asset theo nhãn
+        
+        Args:
+            asset_key: Key của asset
+            label: "positive" (asset có trên màn hình) hoặc "negative" (không có)
+        
+        Returns:
+            Đường dẫn thư mục
+        """
+        return os.path.join(self.calibration_path, asset_key, label)
+    
+    def save_frame(self, asset_key: str, label: str, frame: Optional[np.ndarray] = None) -> str:
+        """
+        Lưu một frame mẫu (mặc định chụp màn hình hiện tại) với nhãn
+        
+        Args:
+            asset_key: Key của asset
+            label: "positive" hoặc "negative"
+            frame: Frame cần lưu, None = chụp màn hình
+        
+        Returns:
+            Đường dẫn file đã lưu
+        """
+        if label not in self.LABELS:
+            raise ValueError(f"Nhãn không hợp lệ: {label}")
+        
+        if frame is None:
+            frame = self.asset_manager._get_screenshot()
+        
+        frames_dir = self.get_frames_dir(asset_key, label)
+        os.makedirs(frames_dir, exist_ok=True)
+        file_path = os.path.join(frames_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{int(time.time() * 1000) % 1000:03d}.png")
+        cv2.imwrite(file_path, frame)
+        return file_path
+    
+    def count_frames(self, asset_key: str) -> Dict[str, int]:
+        """Đếm số frame mẫu của asset theo từng nhãn"""
+        counts = {}
+        for label in self.LABELS:
+            frames_dir = self.get_frames_dir(asset_key, label)
+            if os.path.isdir(frames_dir):
+                counts[label] = sum(1 for name in os.listdir(frames_dir)
+                                    if name.lower().endswith(self.IMAGE_EXTENSIONS))
+            else:
+                counts[label] = 0
+        return counts
+    
+    def load_frames(self, asset_key: str, label: str) -> List[np.ndarray]:
+        """
+        Load các frame mẫu của asset theo nhãn
+        
+        Args:
+            asset_key: Key của asset
+            label: "positive" hoặc "negative"
+        
+        Returns:
+            List các frame dạng OpenCV
+        """
+        frames_dir = self.get_frames_dir(asset_key, label)
+        if not os.path.isdir(frames_dir):
+            return []
+        
+        frames = []
+        for name in sorted(os.listdir(frames_dir)):
+            if not name.lower().endswith(self.IMAGE_EXTENSIONS):
+                continue
+            frame = cv2.imread(os.path.join(frames_dir, name))
+            if frame is not None:
+                frames.append(frame)
+        return frames
+    
+    def score_frame(self, template: np.ndarray, frame: np.ndarray,
+                    roi: Optional[Tuple[float, float, float, float]] = None) -> float:
+        """
+        Tính độ khớp cao nhất của template trên frame (trong ROI nếu có)
+        
+        Args:
+            template: Template image
+            frame: Frame cần chấm điểm
+            roi: ROI theo tỉ lệ màn hình
+        
+        Returns:
+            float: Độ khớp cao nhất (TM_CCOEFF_NORMED)
+        """
+        height, width = frame.shape[:2]
+        if roi:
+            roi_x, roi_y, roi_w, roi_h = roi
+            frame = frame[int(height * roi_y):int(height * (roi_y + roi_h)),
+                          int(width * roi_x):int(width * (roi_x + roi_w))]
+        
+        if frame.shape[0] < template.shape[0] or frame.shape[1] < template.shape[1]:
+            return -1.0
+        
+        result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+        return float(result.max())
+    
+    @staticmethod
+    def choose_threshold(positive_scores: List[float],
+                         negative_scores: List[float]) -> Tuple[float, float, int]:
+        """
+        Chọn threshold ít lỗi nhất, ưu tiên khoảng cách (margin) lớn nhất tới các điểm gần nhất
+        
+        Args:
+            positive_scores: Độ khớp trên các frame positive
+            negative_scores: Độ khớp trên các frame negative
+        
+        Returns:
+            Tuple (threshold, margin, số frame bị phân loại sai)
+        """
+        all_scores = sorted(set(positive_scores) | set(negative_scores))
+        # Ứng viên là trung điểm giữa các điểm liên tiếp và hai đầu mút
+        candidates = [all_scores[0] - 0.01]
+        candidates += [(a + b) / 2 for a, b in zip(all_scores, all_scores[1:])]
+        candidates.append(min(all_scores[-1] + 0.01, 1.0))
+        
+        best = None
+        for threshold in candidates:
+            errors = (sum(1 for s in positive_scores if s < threshold) +
+                      sum(1 for s in negative_scores if s >= threshold))
+            margin = min(abs(s - threshold) for s in all_scores)
+            key = (errors, -margin)
+            if best is None or key < best[0]:
+                best = (key, threshold, margin, errors)
+        
+        return best[1], best[2], best[3]
+    
+    def calibrate_asset(self, asset_key: str) -> Dict[str, Any]:
+        """
+        Hiệu chỉnh threshold cho một asset
+        
+        Args:
+            asset_key: Key của asset
+        
+        Returns:
+            Dictionary kết quả (threshold đề xuất, margin, số lỗi, ...)
+        """
+        result = {
+            "asset_key": asset_key,
+            "success": False,
+            "error": None,
+            "current_threshold": None,
+            "threshold": None,
+            "margin": 0.0,
+            "errors": 0,
+            "positives": 0,
+            "negatives": 0,
+            "min_positive": None,
+            "max_negative": None
+        }
+        
+        asset_info = self.asset_manager.get_asset_info(asset_key)
+        template = self.asset_manager.get_asset_template(asset_key)
+        if asset_info is None or template is None:
+            result["error"] = f"Không thể load template cho asset '{asset_key}'"
+            return result
+        result["current_threshold"] = asset_info.threshold
+        
+        positive_scores = [self.score_frame(template, frame, asset_info.roi)
+                           for frame in self.load_frames(asset_key, "positive")]
+        negative_scores = [self.score_frame(template, frame, asset_info.roi)
+                           for frame in self.load_frames(asset_key, "negative")]
+        result["positives"] = len(positive_scores)
+        result["negatives"] = len(negative_scores)
+        
+        if not positive_scores or not negative_scores:
+            result["error"] = "Cần ít nhất 1 frame positive và 1 frame negative"
+            return result
+        
+        threshold, margin, errors = self.choose_threshold(positive_scores, negative_scores)
+        result.update({
+            "success": True,
+            "threshold": round(threshold, 4),
+            "margin": margin,
+            "errors": errors,
+            "min_positive": min(positive_scores),
+            "max_negative": max(negative_scores)
+        })
+        
+        print(f"🎯 Hiệu chỉnh '{asset_key}': threshold {asset_info.threshold} → {result['threshold']} "
+              f"(margin {margin:.3f}, lỗi {errors}/{len(positive_scores) + len(negative_scores)})")
+        return result
+    
+    def apply(self, result: Dict[str, Any]) -> bool:
+        """
+        Ghi threshold đã hiệu chỉnh vào manifest assets
+        
+        Args:
+            result: Kết quả từ calibrate_asset
+        
+        Returns:
+            bool: True nếu đã ghi thành công
+        """
+        if not result.get("success"):
+            return False
+        if not self.asset_manager.update_asset_config(result["asset_key"], threshold=result["threshold"]):
+            return False
+        return self.asset_manager.save_manifest()
+    
+    def calibrate_all(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Hiệu chỉnh tất cả assets có frame mẫu
+        
+        Returns:
+            Dictionary asset_key -> kết quả hiệu chỉnh
+        """
+        results = {}
+        for asset_key in self.asset_manager.assets:
+            counts = self.count_frames(asset_key)
+            if counts["positive"] or counts["negative"]:
+                results[asset_key] = self.calibrate_asset(asset_key)
+        return results
@@ -5,7 +5,7 @@ Module UI components cho ứng dụng AutoSIC
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 import time
-from typing import Callable, Optional, List
+from typing import Callable, Optional, List, Dict
 
 
 class AutoSICUI:
@@ -20,6 +20,7 @@ class AutoSICUI:
         self.on_open_asset_manager: Optional[Callable] = None
         self.on_reset_auto_restart: Optional[Callable] = None
         self.on_reset_stats: Optional[Callable] = None
+        self.on_reset_playback_speed: Optional[Callable] = None
     
     def setup_window(self):
         """Thiết lập cửa sổ chính"""
@@ -80,6 +81,19 @@ class AutoSICUI:
         self.status_label = ttk.Label(control_frame, text="Trạng thái: Đã dừng", 
                                      foreground="red")
         self.status_label.grid(row=1, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        
+        # Tên khóa học (lịch sử độ dài lesson được lưu theo khóa học)
+        course_frame = ttk.Frame(control_frame)
+        course_frame.grid(row=2, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(10, 0))
+        course_frame.columnconfigure(1, weight=1)
+        ttk.Label(course_frame, text="Khóa học:").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        self.course_var = tk.StringVar()
+        ttk.Entry(course_frame, textvariable=self.course_var).grid(row=0, column=1, sticky=(tk.W, tk.E))
+        
+        # Nút reset bộ nhớ tốc độ phát của khóa học (sau khi đặt tốc độ thất bại nhiều lần)
+        reset_speed_button = ttk.Button(course_frame, text="Reset tốc độ phát",
+                                        command=self._on_reset_playback_speed)
+        reset_speed_button.grid(row=0, column=2, padx=(10, 0), sticky=tk.W)
     
     def _setup_step_frame(self, parent):
         """Thiết lập frame trạng thái bước"""
@@ -144,10 +158,33 @@ class AutoSICUI:
         self.runtime_label = ttk.Label(stats_frame, text="00:00:00", foreground="purple")
         self.runtime_label.grid(row=4, column=1, sticky=tk.W)
         
+        # Các chỉ số dẫn xuất (tính trên 1 giờ gần nhất) kèm sparkline
+        ttk.Label(stats_frame, text="Lessons/giờ:").grid(row=5, column=0, sticky=tk.W, padx=(0, 10))
+        self.lessons_rate_label = ttk.Label(stats_frame, text="0.0", foreground="blue")
+        self.lessons_rate_label.grid(row=5, column=1, sticky=tk.W)
+        self.lessons_sparkline = tk.Canvas(stats_frame, width=160, height=22, bg="white",
+                                           highlightthickness=0)
+        self.lessons_sparkline.grid(row=5, column=2, sticky=tk.E)
+        
+        ttk.Label(stats_frame, text="Độ trễ video → click:").grid(row=6, column=0, sticky=tk.W, padx=(0, 10))
+        self.click_latency_label = ttk.Label(stats_frame, text="-", foreground="green")
+        self.click_latency_label.grid(row=6, column=1, sticky=tk.W)
+        
+        ttk.Label(stats_frame, text="Thời gian detect/tick:").grid(row=7, column=0, sticky=tk.W, padx=(0, 10))
+        self.detection_time_label = ttk.Label(stats_frame, text="-", foreground="orange")
+        self.detection_time_label.grid(row=7, column=1, sticky=tk.W)
+        self.detection_sparkline = tk.Canvas(stats_frame, width=160, height=22, bg="white",
+                                             highlightthickness=0)
+        self.detection_sparkline.grid(row=7, column=2, sticky=tk.E)
+        
+        ttk.Label(stats_frame, text="Restart/giờ:").grid(row=8, column=0, sticky=tk.W, padx=(0, 10))
+        self.restart_rate_label = ttk.Label(stats_frame, text="0.0", foreground="red")
+        self.restart_rate_label.grid(row=8, column=1, sticky=tk.W)
+        
         # Nút reset thống kê
         reset_stats_button = ttk.Button(stats_frame, text="Reset Thống kê", 
                                        command=self._on_reset_stats)
-        reset_stats_button.grid(row=5, column=0, columnspan=2, pady=(10, 0), sticky=tk.W)
+        reset_stats_button.grid(row=9, column=0, columnspan=2, pady=(10, 0), sticky=tk.W)
       # Callback methods
     def set_toggle_automation_callback(self, callback: Callable):
         """Thiết lập callback cho nút bắt đầu/dừng"""
@@ -168,6 +205,11 @@ class AutoSICUI:
     def set_reset_stats_callback(self, callback: Callable):
         """Thiết lập callback cho nút reset stats"""
         self.on_reset_stats = callback
+    
+    def set_reset_playback_speed_callback(self, callback: Callable):
+        """Thiết lập callback cho nút reset tốc độ phát"""
+        self.on_reset_playback_speed = callback
+    
     def _on_toggle_automation(self):
         if self.on_toggle_automation:
             self.on_toggle_automation()
@@ -188,6 +230,14 @@ class AutoSICUI:
         if self.on_reset_stats:
             self.on_reset_stats()
     
+    def _on_reset_playback_speed(self):
+        if self.on_reset_playback_speed:
+            self.on_reset_playback_speed()
+    
+    def get_course(self) -> str:
+        """Lấy tên khóa học đã nhập"""
+        return self.course_var.get().strip()
+    
     # UI update methods
     def update_start_button(self, is_running: bool):
         """Cập nhật text và trạng thái nút start"""
@@ -223,6 +273,38 @@ class AutoSICUI:
         self.auto_restart_label.config(text=str(auto_restart_count))
         self.runtime_label.config(text=runtime)
     
+    def update_rates_display(self, rates: Dict[str, float], sparklines: Dict[str, List[float]]):
+        """Cập nhật các chỉ số dẫn xuất và sparkline"""
+        self.lessons_rate_label.config(text=f"{rates['lessons_per_hour']:.1f}")
+        self.restart_rate_label.config(text=f"{rates['restarts_per_hour']:.1f}")
+        
+        latency = rates['mean_click_latency']
+        self.click_latency_label.config(text=f"{latency:.1f}s" if latency else "-")
+        
+        detection_time = rates['mean_detection_time']
+        self.detection_time_label.config(text=f"{detection_time * 1000:.0f}ms" if detection_time else "-")
+        
+        self._draw_sparkline(self.lessons_sparkline, sparklines.get('lessons_clicked', []), "blue")
+        self._draw_sparkline(self.detection_sparkline, sparklines.get('detection_time', []), "orange")
+    
+    def _draw_sparkline(self, canvas: tk.Canvas, values: List[float], color: str):
+        """Vẽ sparkline đơn giản lên canvas"""
+        canvas.delete("all")
+        if len(values) < 2:
+            return
+        
+        width = int(canvas.cget("width"))
+        height = int(canvas.cget("height"))
+        max_value = max(values) or 1.0
+        step = (width - 2) / (len(values) - 1)
+        
+        points = []
+        for i, value in enumerate(values):
+            points.append(1 + i * step)
+            points.append(height - 2 - (value / max_value) * (height - 4))
+        
+        canvas.create_line(*points, fill=color, width=1)
+    
     def log_message(self, message: str):
         """Thêm message vào log"""
         timestamp = time.strftime("%H:%M:%S")
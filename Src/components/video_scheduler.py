@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Module dự đoán thời điểm video kết thúc để lên lịch kiểm tra play button
+"""
+import os
+import json
+import time
+import statistics
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class VideoScheduler:
+    """Class ước lượng thời gian còn lại của video từ thanh tiến độ và lịch sử độ dài lesson của khóa học"""
+    
+    DEFAULT_INTERVAL = 60.0    # Khoảng kiểm tra khi chưa có dự đoán (giây)
+    LEAD_TIME = 5.0            # Thức dậy sớm hơn thời điểm kết thúc dự đoán (giây)
+    TIGHT_INTERVAL = 2.0       # Khoảng kiểm tra dày quanh thời điểm kết thúc (giây)
+    OVERDUE_WINDOW = 60.0      # Quá thời điểm dự đoán lâu hơn mức này thì quay về DEFAULT_INTERVAL (giây)
+    MAX_SLEEP = 300.0          # Ngủ tối đa giữa hai lần kiểm tra để đọc lại tiến độ (giây)
+    REFINE_FRACTION = 0.8      # Với dự đoán xa, thức dậy sau phần này của thời gian còn lại để đọc lại tiến độ
+    MIN_PROGRESS = 0.02        # Tiến độ nhỏ hơn mức này chưa đủ tin cậy để suy ra độ dài video
+    HISTORY_SIZE = 50          # Số lesson gần nhất giữ lại trong lịch sử của mỗi khóa học
+    
+    def __init__(self, course: str = "default",
+                 history_path: Optional[str] = os.path.join("Data", "lesson_history.json"),
+                 default_interval: float = DEFAULT_INTERVAL):
+        """
+        Args:
+            course: Tên khóa học (lịch sử độ dài lesson được lưu theo khóa học)
+            history_path: File lưu lịch sử độ dài lesson (None = không lưu)
+            default_interval: Khoảng kiểm tra khi chưa có dự đoán (giây)
+        """
+        self.course = course
+        self.default_interval = default_interval
+        self.history_path = history_path
+        self._lock = threading.Lock()
+        
+        # Lesson đang xem: thời điểm bắt đầu và các lần đọc tiến độ (thời điểm, tỉ lệ 0.0 - 1.0)
+        self.lesson_start: Optional[float] = None
+        self.samples: List[Tuple[float, float]] = []
+        self.predicted_end: Optional[float] = None
+        self.prediction_source = "none"
+        
+        self.history: Dict[str, List[float]] = self._load_history()
+        self.stats = {'lessons': 0, 'checks': 0, 'lags': []}
+    
+    def _load_history(self) -> Dict[str, List[float]]:
+        """Đọc lịch sử độ dài lesson từ file"""
+        if not self.history_path or not os.path.exists(self.history_path):
+            return {}
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {course: [float(d) for d in durations] for course, durations in data.items()}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Không đọc được lịch sử lesson: {str(e)}")
+            return {}
+    
+    def _save_history(self):
+        """Ghi lịch sử độ dài lesson ra file (giữ nguyên lịch sử của các khóa học khác)"""
+        if not self.history_path:
+            return
+        history = self._load_history()
+        history[self.course] = self.history.get(self.course, [])
+        self.history = history
+        try:
+            directory = os.path.dirname(self.history_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.history_path, "w", encoding="utf-8") as f:
+                json.dump(self.history, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"❌ Lỗi khi lưu lịch sử lesson: {str(e)}")
+    
+    def set_course(self, course: str):
+        """
+        Đổi khóa học (lesson tiếp theo được dự đoán và lưu theo lịch sử của khóa học này)
+        
+        Args:
+            course: Tên khóa học
+        """
+        with self._lock:
+            self.course = course
+    
+    def start_lesson(self, now: Optional[float] = None):
+        """
+        Đánh dấu bắt đầu một lesson mới (ngay sau khi click lesson)
+        
+        Args:
+            now: Thời điểm bắt đầu (None = hiện tại)
+        """
+        with self._lock:
+            self.lesson_start = now if now is not None else time.time()
+            self.samples = []
+            self.predicted_end = None
+            self.prediction_source = "none"
+    
+    def finish_lesson(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        Đánh dấu video đã kết thúc (phát hiện play button) và lưu độ dài lesson vào lịch sử
+        
+        Args:
+            now: Thời điểm phát hiện video kết thúc (None = hiện tại)
+        
+        Returns:
+            Độ dài lesson (giây) hoặc None nếu không biết thời điểm bắt đầu
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if self.lesson_start is None:
+                return None
+            
+            duration = now - self.lesson_start
+            if self.predicted_end is not None:
+                # Độ trễ giữa lúc video thực sự kết thúc (ước lượng) và lúc phát hiện
+                self.stats['lags'] = (self.stats['lags'] + [now - self.predicted_end])[-self.HISTORY_SIZE:]
+            durations = self.history.setdefault(self.course, [])
+            durations.append(round(duration, 1))
+            del durations[:-self.HISTORY_SIZE]
+            self.stats['lessons'] += 1
+            self.lesson_start = None
+            self.samples = []
+            self.predicted_end = None
+        
+        self._save_history()
+        return duration
+    
+    def observe_progress(self, progress: Optional[float], now: Optional[float] = None):
+        """
+        Ghi nhận một lần đọc thanh tiến độ
+        
+        Args:
+            progress: Tỉ lệ đã xem (0.0 - 1.0), None = không đọc được
+            now: Thời điểm đọc (None = hiện tại)
+        """
+        if progress is None:
+            return
+        now = now if now is not None else time.time()
+        with self._lock:
+            if self.samples and progress < self.samples[-1][1] - 0.01:
+                # Tiến độ giảm: người dùng tua lại hoặc video mới bắt đầu, bỏ các lần đọc cũ
+                self.samples = []
+            self.samples.append((now, progress))
+            del self.samples[:-10]
+    
+    def get_expected_duration(self) -> Optional[float]:
+        """
+        Độ dài lesson điển hình của khóa học (trung vị lịch sử)
+        
+        Returns:
+            Số giây hoặc None nếu chưa có lịch sử
+        """
+        durations = self.history.get(self.course)
+        if not durations:
+            return None
+        return statistics.median(durations)
+    
+    def predict_end(self) -> Optional[float]:
+        """
+        Dự đoán thời điểm video kết thúc
+        
+        Ưu tiên tốc độ tăng tiến độ giữa các lần đọc, sau đó là tiến độ so với thời gian đã xem,
+        cuối cùng là độ dài lesson điển hình của khóa học.
+        
+        Returns:
+            Timestamp dự đoán hoặc None nếu chưa đủ dữ liệu
+        """
+        with self._lock:
+            samples = list(self.samples)
+            lesson_start = self.lesson_start
+        end, source = None, "none"
+        
+        if len(samples) >= 2:
+            (t0, p0), (t1, p1) = samples[0], samples[-1]
+            if p1 > p0 and t1 > t0:
+                rate = (p1 - p0) / (t1 - t0)
+                end, source = t1 + (1.0 - p1) / rate, "progress_rate"
+        
+        if end is None and samples and lesson_start is not None:
+            t1, p1 = samples[-1]
+            if p1 >= self.MIN_PROGRESS and t1 > lesson_start:
+                end, source = lesson_start + (t1 - lesson_start) / p1, "progress"
+        
+        if end is None and lesson_start is not None:
+            expected = self.get_expected_duration()
+            if expected is not None:
+                end, source = lesson_start + expected, "history"
+        
+        with self._lock:
+            self.predicted_end = end
+            self.prediction_source = source
+        return end
+    
+    def next_delay(self, now: Optional[float] = None) -> float:
+        """
+        Thời gian đợi trước lần kiểm tra play button tiếp theo
+        
+        Ngủ đến ngay trước thời điểm kết thúc dự đoán (đọc lại tiến độ giữa chừng nếu còn xa),
+        rồi kiểm tra dày trong khoảng quanh thời điểm đó.
+        
+        Args:
+            now: Thời điểm hiện tại (None = hiện tại)
+        
+        Returns:
+            Số giây cần đợi
+        """
+        now = now if now is not None else time.time()
+        self.stats['checks'] += 1
+        end = self.predict_end()
+        if end is None:
+            return self.default_interval
+        
+        remaining = end - now
+        if remaining > self.LEAD_TIME:
+            sleep = remaining - self.LEAD_TIME
+            if self.prediction_source != "history" and sleep > self.TIGHT_INTERVAL * 10:
+                sleep *= self.REFINE_FRACTION
+            return min(sleep, self.MAX_SLEEP)
+        if remaining > -self.OVERDUE_WINDOW:
+            return self.TIGHT_INTERVAL
+        return self.default_interval
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Lấy thống kê của scheduler
+        
+        Returns:
+            Dict gồm số lesson, số lần lên lịch, độ trễ trung bình sau thời điểm dự đoán,
+            nguồn dự đoán hiện tại và độ dài lesson điển hình
+        """
+        lags = self.stats['lags']
+        return {
+            'lessons': self.stats['lessons'],
+            'checks': self.stats['checks'],
+            'mean_lag': statistics.mean(lags) if lags else 0.0,
+            'prediction_source': self.prediction_source,
+            'predicted_end': self.predicted_end,
+            'expected_duration': self.get_expected_duration()
+        }
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Entry point chạy AutoSIC không cần giao diện Tkinter (headless / daemon)
+
+Ví dụ:
+    python Src/headless.py --config autosic.json --metrics-port 9464
+
+Tín hiệu điều khiển:
+    SIGINT / SIGTERM: dừng automation và thoát
+    SIGHUP: reload tất cả assets (không có trên Windows)
+    SIGUSR1: ghi tóm tắt thống kê ra log (không có trên Windows)
+"""
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from typing import Dict, Any, Optional, List
+
+from components.automation_core import AutomationCore
+from components.async_runner import AsyncAutomationRunner
+from components.session_manager import SessionManager
+from components.input_queue import MOTION_PROFILES
+from components.stats_manager import StatsManager
+from components.loop_detector import LoopDetector
+from components.metrics_server import MetricsServer, collect_app_metrics, collect_session_metrics
+
+
+# Cấu hình mặc định, có thể ghi đè bằng file config (JSON) và command line flags
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "assets_path": "Assets",
+    "scroll_x_percent": AutomationCore.SCROLL_X_PERCENT,
+    "scroll_y_percent": AutomationCore.SCROLL_Y_PERCENT,
+    "max_repeats": 3,
+    "capture_interval": 0.0,
+    "capture_drop_policy": "latest",
+    "use_asyncio": False,
+    "motion_profile": "fast",
+    "record_corpus": None,  # File frame corpus để ghi các frame đã chụp (None = không ghi)
+    "maximize_speed": True,  # Đặt tốc độ phát cao nhất sau mỗi lần click lesson (cần các asset speed_*)
+    "reset_playback_speed": False,  # Xóa vị trí nút tốc độ đã nhớ và số lần thất bại của khóa học khi khởi động
+    "unknown_screen_action": "wait",  # Xử lý màn hình lạ: wait, refresh, learn, stop
+    "stall_recovery": "evidence",  # Khôi phục video đứng hình: evidence (cần dấu hiệu treo), always, off
+    "video_roi": None,  # Vùng video [x, y, width, height] theo tỉ lệ, None = ROI asset video_buffering / mặc định
+    "course": None,  # Tên khóa học (lịch sử độ dài lesson lưu theo khóa học), None = dùng chung
+    "sessions": [],  # Nhiều cửa sổ: [{"name": "khoa1", "region": [x, y, width, height], "course": "...",
+                     #               "video_roi": [x, y, width, height]}, ...]
+    "restart_delay": 3.0,
+    "metrics_port": 0,
+    "metrics_host": "127.0.0.1",
+    "stats_rollup_path": os.path.join("Data", "stats_rollup.jsonl"),
+    "summary_interval": 300.0,
+    "log_file": None,
+    "log_level": "INFO",
+}
+
+
+class HeadlessApp:
+    """Class điều phối AutomationCore, StatsManager và LoopDetector không qua Tkinter"""
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger("autosic")
+        
+        # Khởi tạo các components
+        self.stats = StatsManager(rollup_path=config["stats_rollup_path"])
+        self.loop_detector = LoopDetector(max_repeats=config["max_repeats"])
+        self.automation: Optional[AutomationCore] = None
+        self.runner: Optional[AsyncAutomationRunner] = None
+        self.session_manager: Optional[SessionManager] = None
+        
+        if not config["sessions"]:
+            self.automation = AutomationCore(assets_path=config["assets_path"], course=config["course"],
+                                             video_roi=config["video_roi"])
+            self.automation.configure_scroll_position(config["scroll_x_percent"], config["scroll_y_percent"])
+            self.automation.input_queue.set_motion_profile(config["motion_profile"])
+            self.automation.maximize_speed = config["maximize_speed"]
+            if config["reset_playback_speed"]:
+                self.automation.playback_speed.reset()
+            self.automation.unknown_screen_action = config["unknown_screen_action"]
+            self.automation.stall_recovery = config["stall_recovery"]
+            if config["capture_interval"] > 0:
+                self.automation.enable_capture_pipeline(config["capture_interval"], config["capture_drop_policy"])
+            self.image_detector = self.automation.image_detector
+        
+            # Chạy automation trên asyncio event loop thay cho thread riêng (tùy chọn)
+            if config["use_asyncio"]:
+                self.runner = AsyncAutomationRunner()
+                self.runner.add_session("main", self.automation)
+                self.runner.start_background()
+        else:
+            # Chế độ nhiều phiên: mỗi phiên điều khiển một cửa sổ, dùng chung detector (SessionManager tự tạo)
+            # và hàng đợi chuột
+            self.session_manager = SessionManager(assets_path=config["assets_path"],
+                                                  max_repeats=config["max_repeats"],
+                                                  restart_delay=config["restart_delay"],
+                                                  motion_profile=config["motion_profile"],
+                                                  aggregate_stats=self.stats)
+            self.session_manager.set_log_callback(
+                lambda name, message: self.logger.info("[%s] %s", name, message))
+            for session in config["sessions"]:
+                region = session.get("region")
+                automation = self.session_manager.add_session(
+                    session["name"], tuple(region) if region else None,
+                    (config["scroll_x_percent"], config["scroll_y_percent"]),
+                    session.get("course"), session.get("video_roi", config["video_roi"]))
+                automation.maximize_speed = config["maximize_speed"]
+                if config["reset_playback_speed"]:
+                    automation.playback_speed.reset()
+                automation.unknown_screen_action = config["unknown_screen_action"]
+                automation.stall_recovery = config["stall_recovery"]
+            self.image_detector = self.session_manager.image_detector
+        
+        if config["record_corpus"]:
+            self.image_detector.start_recording(config["record_corpus"])
+        
+        self.setup_callbacks()
+        
+        # Biến trạng thái
+        self.is_running = False
+        self.shutdown_event = threading.Event()
+        self.restart_timer: Optional[threading.Timer] = None
+        
+        # Metrics endpoint (tùy chọn)
+        self.metrics_server = None
+        if config["metrics_port"]:
+            self.metrics_server = MetricsServer(self.collect_metrics, config["metrics_host"], config["metrics_port"])
+    
+    def setup_callbacks(self):
+        """Thiết lập các callbacks giống AutoSICApp nhưng báo cáo qua logging"""
+        # Automation callbacks (chế độ nhiều phiên: SessionManager tự nối callbacks của từng phiên)
+        if self.automation:
+            self.automation.set_log_callback(self.logger.info)
+            self.automation.set_stats_callback(self.update_stats)
+            self.automation.set_step_callback(self.log_step)
+            self.automation.set_loop_check_callback(self.loop_detector.check_loop_detection)
+            self.automation.set_metric_callback(self.stats.record_event)
+        
+        # Loop detector callbacks
+        self.loop_detector.set_auto_restart_callback(self.auto_restart)
+        self.loop_detector.set_status_update_callback(self.log_loop_status)
+    
+    def log_step(self, current_step: str, next_steps: Optional[List[str]] = None):
+        """Ghi bước hiện tại ra log"""
+        self.logger.debug("Bước: %s → %s", current_step, " → ".join(next_steps or []))
+    
+    def log_loop_status(self, status: str, color: str = "green"):
+        """Ghi trạng thái chống lặp ra log"""
+        level = logging.DEBUG if color == "green" else logging.WARNING
+        self.logger.log(level, "Chống lặp: %s", status)
+    
+    def start_automation(self):
+        """Bắt đầu automation"""
+        if self.shutdown_event.is_set():
+            return
+        self.is_running = True
+        self.stats.start_timer()
+        if self.session_manager:
+            self.session_manager.start_all()
+        elif self.runner:
+            self.runner.submit_session("main")
+        else:
+            self.automation.start_automation()
+    
+    def stop_automation(self):
+        """Dừng automation"""
+        self.is_running = False
+        if self.session_manager:
+            self.session_manager.stop_all()
+        elif self.runner:
+            self.runner.stop_session("main")
+        else:
+            self.automation.stop_automation()
+    
+    def auto_restart(self):
+        """Tự động restart automation (thay cho root.after của bản GUI)"""
+        self.logger.warning("🔄 Phát hiện lặp vô hạn! Tự động restart...")
+        self.stats.record_event('auto_restart')
+        self.stop_automation()
+        
+        self.restart_timer = threading.Timer(self.config["restart_delay"], self.start_automation)
+        self.restart_timer.daemon = True
+        self.restart_timer.start()
+    
+    def update_stats(self, stat_type: str):
+        """Cập nhật thống kê"""
+        self.stats.record_stat(stat_type)
+    
+    def collect_metrics(self, writer):
+        """Gom metrics cho metrics endpoint"""
+        if self.session_manager:
+            # self.stats gom thống kê của mọi phiên
+            collect_app_metrics(writer, self.stats, None, self.image_detector.asset_manager)
+            collect_session_metrics(writer, self.session_manager)
+            return
+        collect_app_metrics(writer, self.stats, self.loop_detector, self.image_detector.asset_manager,
+                            self.automation.capture_pipeline, self.automation.stall_detector)
+    
+    def log_summary(self):
+        """Ghi tóm tắt thống kê ra log"""
+        if self.session_manager:
+            for line in self.session_manager.get_summary().splitlines():
+                self.logger.info("📊 %s", line)
+            return
+        self.logger.info("📊 %s, Auto restart: %d", self.stats.get_stats_summary(),
+                         self.loop_detector.get_auto_restart_count())
+    
+    def reload_assets(self):
+        """Reload tất cả assets"""
+        self.logger.info("🔄 Reload assets theo yêu cầu (SIGHUP)")
+        if not self.image_detector.reload_all_assets():
+            self.logger.warning("Một số assets không reload được")
+    
+    def install_signal_handlers(self):
+        """Đăng ký các tín hiệu điều khiển"""
+        signal.signal(signal.SIGINT, self._on_shutdown_signal)
+        signal.signal(signal.SIGTERM, self._on_shutdown_signal)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload_assets())
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.log_summary())
+    
+    def _on_shutdown_signal(self, signum, frame):
+        """Xử lý tín hiệu dừng"""
+        self.logger.info("Nhận tín hiệu %s - đang dừng...", signal.Signals(signum).name)
+        self.shutdown_event.set()
+    
+    def run(self) -> int:
+        """
+        Chạy automation cho đến khi nhận tín hiệu dừng
+        
+        Returns:
+            int: Exit code
+        """
+        self.install_signal_handlers()
+        if self.metrics_server:
+            self.metrics_server.start()
+        
+        self.start_automation()
+        last_summary = time.time()
+        
+        # Main thread chỉ làm việc định kỳ (roll-up, tóm tắt), còn lại ngủ chờ tín hiệu
+        while not self.shutdown_event.wait(5.0):
+            self.stats.maybe_rollup()
+            if time.time() - last_summary >= self.config["summary_interval"]:
+                self.log_summary()
+                last_summary = time.time()
+        
+        if self.restart_timer:
+            self.restart_timer.cancel()
+        self.stop_automation()
+        self.stats.maybe_rollup(force=True)
+        self.log_summary()
+        self.image_detector.stop_recording()
+        if self.runner:
+            self.runner.shutdown()
+        if self.session_manager:
+            self.session_manager.shutdown()
+        if self.automation:
+            self.automation.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        return 0
+
+
+def load_config(config_path: Optional[str]) -> Dict[str, Any]:
+    """
+    Đọc file config JSON và gộp với cấu hình mặc định
+    
+    Args:
+        config_path: Đường dẫn file config (None = chỉ dùng mặc định)
+    
+    Returns:
+        Dict cấu hình
+    """
+    config = dict(DEFAULT_CONFIG)
+    if config_path:
+        with open(config_path, "r", encoding="utf-8") as f:
+            user_config = json.load(f)
+        unknown_keys = set(user_config) - set(DEFAULT_CONFIG)
+        if unknown_keys:
+            raise ValueError(f"Key không hợp lệ trong config: {', '.join(sorted(unknown_keys))}")
+        config.update(user_config)
+    return config
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Đọc command line flags"""
+    parser = argparse.ArgumentParser(description="AutoSIC headless - chạy automation không cần giao diện")
+    parser.add_argument("--config", help="File config JSON")
+    parser.add_argument("--assets-path", help="Thư mục chứa assets")
+    parser.add_argument("--scroll-x-percent", type=float, help="Vị trí scroll theo %% chiều rộng (0.0 - 1.0)")
+    parser.add_argument("--scroll-y-percent", type=float, help="Vị trí scroll theo %% chiều cao (0.0 - 1.0)")
+    parser.add_argument("--max-repeats", type=int, help="Số lần lặp tối đa trước khi auto restart")
+    parser.add_argument("--capture-interval", type=float,
+                        help="Chu kỳ chụp màn hình của capture pipeline (giây, 0 = tắt pipeline)")
+    parser.add_argument("--capture-drop-policy", choices=["latest", "block"],
+                        help="Chính sách khi detect chưa xử lý kịp frame trước")
+    parser.add_argument("--asyncio", dest="use_asyncio", action="store_true", default=None,
+                        help="Chạy automation trên asyncio event loop thay cho thread riêng")
+    parser.add_argument("--motion-profile", choices=list(MOTION_PROFILES),
+                        help="Kiểu di chuyển chuột (instant, fast, human)")
+    parser.add_argument("--course", help="Tên khóa học (lịch sử độ dài lesson lưu theo khóa học)")
+    parser.add_argument("--record-corpus", help="Ghi các frame đã chụp vào file frame corpus")
+    parser.add_argument("--no-maximize-speed", dest="maximize_speed", action="store_false", default=None,
+                        help="Không tự đặt tốc độ phát video cao nhất")
+    parser.add_argument("--reset-playback-speed", dest="reset_playback_speed", action="store_true", default=None,
+                        help="Xóa vị trí nút tốc độ đã nhớ và số lần thất bại của khóa học")
+    parser.add_argument("--unknown-screen-action", choices=list(AutomationCore.UNKNOWN_SCREEN_ACTIONS),
+                        help="Cách xử lý khi gặp màn hình lạ (modal, hết phiên, quiz)")
+    parser.add_argument("--stall-recovery", choices=list(AutomationCore.STALL_RECOVERY_MODES),
+                        help="Khôi phục video đứng hình: evidence (chỉ khi tiến độ không tăng/thấy buffering), always, off")
+    parser.add_argument("--video-roi", type=float, nargs=4, metavar=("X", "Y", "WIDTH", "HEIGHT"),
+                        help="Vùng video theo tỉ lệ màn hình (0.0 - 1.0) dùng để phát hiện đứng hình")
+    parser.add_argument("--metrics-port", type=int, help="Port của metrics endpoint (0 = tắt)")
+    parser.add_argument("--metrics-host", help="Địa chỉ bind của metrics endpoint")
+    parser.add_argument("--log-file", help="Ghi log ra file thay vì stderr")
+    parser.add_argument("--log-level", help="Mức log (DEBUG, INFO, WARNING, ...)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Function chính để chạy bản headless"""
+    args = parse_args(argv)
+    config = load_config(args.config)
+    
+    # Flags ghi đè config
+    for key in DEFAULT_CONFIG:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    
+    logging.basicConfig(
+        filename=config["log_file"],
+        level=getattr(logging, str(config["log_level"]).upper(), logging.INFO),
+        format="[%(asctime)s] %(levelname)s %(message)s",
+        datefmt="%H:%M:%S"
+    )
+    
+    app = HeadlessApp(config)
+    return app.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,29 +2,52 @@
 """
 File chính để khởi chạy ứng dụng AutoSIC
 """
+import time
+_PROCESS_START = time.perf_counter()  # Mốc đo thời gian khởi động
+
+import os
+import sys
+import json
+import threading
 import tkinter as tk
 from components.ui_components import AutoSICUI
-from components.automation_core import AutomationCore
 from components.stats_manager import StatsManager
 from components.loop_detector import LoopDetector
+from components.metrics_server import MetricsServer, collect_app_metrics
 
 
 class AutoSICApp:
     """Class chính quản lý toàn bộ ứng dụng"""
     
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, metrics_port: int = None, metrics_host: str = "127.0.0.1"):
         self.root = root
         
-        # Khởi tạo các components
+        # Khởi tạo các components nhẹ trước để cửa sổ hiển thị ngay
         self.ui = AutoSICUI(root)
-        self.automation = AutomationCore()
         self.stats = StatsManager()
         self.loop_detector = LoopDetector()
         
+        # AutomationCore (pyautogui, cv2, numpy, assets) được load ở background
+        self.automation = None
+        self.backend_error = None
+        self.backend_ready = threading.Event()
+        self.backend_loaded = False
+        self.startup_times = {}
+        
         self.setup_callbacks()
         
         # Biến trạng thái
         self.is_running = False
+        
+        self.start_backend_loading()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # Metrics endpoint (tùy chọn)
+        self.metrics_server = None
+        if metrics_port:
+            self.metrics_server = MetricsServer(self.collect_metrics, metrics_host, metrics_port)
+            if self.metrics_server.start():
+                self.ui.log_message(f"📈 Metrics endpoint: http://{metrics_host}:{metrics_port}/metrics")
     
     def setup_callbacks(self):
         """Thiết lập các callbacks giữa các components"""        # UI callbacks
@@ -33,16 +56,83 @@ class AutoSICApp:
         self.ui.set_open_asset_manager_callback(self.open_asset_manager)
         self.ui.set_reset_auto_restart_callback(self.reset_auto_restart)
         self.ui.set_reset_stats_callback(self.reset_stats)
+        self.ui.set_reset_playback_speed_callback(self.reset_playback_speed)
         
-        # Automation callbacks
+        # Loop detector callbacks
+        self.loop_detector.set_auto_restart_callback(self.auto_restart)
+        self.loop_detector.set_status_update_callback(self.ui.update_loop_status)
+    
+    def setup_automation_callbacks(self):
+        """Thiết lập các callbacks của AutomationCore sau khi backend load xong"""
         self.automation.set_log_callback(self.ui.log_message)
         self.automation.set_stats_callback(self.update_stats)
         self.automation.set_step_callback(self.ui.update_step_status)
         self.automation.set_loop_check_callback(self.loop_detector.check_loop_detection)
+        self.automation.set_metric_callback(self.stats.record_event)
         
-        # Loop detector callbacks
-        self.loop_detector.set_auto_restart_callback(self.auto_restart)
-        self.loop_detector.set_status_update_callback(self.ui.update_loop_status)
+    def start_backend_loading(self):
+        """Import các module nặng và load assets ở background thread"""
+        def load_backend():
+            try:
+                from components.automation_core import AutomationCore
+                self.startup_times['imports_ms'] = (time.perf_counter() - _PROCESS_START) * 1000
+                self.automation = AutomationCore()
+            except Exception as e:
+                self.backend_error = e
+            finally:
+                self.backend_ready.set()
+        
+        # Đợi cửa sổ vẽ xong rồi mới bắt đầu load để không tranh CPU với lần paint đầu
+        def on_window_painted():
+            self.startup_times['window_ms'] = (time.perf_counter() - _PROCESS_START) * 1000
+            threading.Thread(target=load_backend, daemon=True).start()
+            self.root.after(50, self.check_backend_ready)
+        
+        self.root.after_idle(on_window_painted)
+    
+    def check_backend_ready(self):
+        """Kiểm tra backend đã load xong chưa (chạy trên Tk main thread)"""
+        if not self.backend_ready.is_set():
+            self.root.after(50, self.check_backend_ready)
+            return
+        
+        if self.backend_error:
+            self.ui.log_message(f"❌ Lỗi khi khởi tạo automation: {str(self.backend_error)}")
+            return
+        
+        self.setup_automation_callbacks()
+        self.backend_loaded = True
+        self.startup_times['backend_ms'] = (time.perf_counter() - _PROCESS_START) * 1000
+        self.report_startup_times()
+    
+    def report_startup_times(self):
+        """Log và ghi lại thời gian khởi động (để so sánh giữa các bản build)"""
+        times = self.startup_times
+        self.ui.log_message(
+            f"⏱️ Khởi động: cửa sổ {times['window_ms']:.0f}ms, "
+            f"import {times.get('imports_ms', 0):.0f}ms, "
+            f"sẵn sàng {times['backend_ms']:.0f}ms"
+        )
+        
+        record = dict(times)
+        record['timestamp'] = time.time()
+        record['frozen'] = bool(getattr(sys, 'frozen', False))  # True khi chạy từ bundle pyinstaller
+        try:
+            os.makedirs("Data", exist_ok=True)
+            with open(os.path.join("Data", "startup_times.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+    
+    def is_backend_ready(self) -> bool:
+        """Kiểm tra automation đã sẵn sàng, log thông báo nếu chưa"""
+        if self.backend_loaded:
+            return True
+        if self.backend_error:
+            self.ui.log_message(f"❌ Automation không khởi tạo được: {str(self.backend_error)}")
+        else:
+            self.ui.log_message("⏳ Đang tải automation và assets, vui lòng đợi...")
+        return False
     
     def toggle_automation(self):
         """Bật/tắt automation"""
@@ -53,13 +143,17 @@ class AutoSICApp:
     
     def start_automation(self):
         """Bắt đầu automation"""
+        if not self.is_backend_ready():
+            return
+        
         self.is_running = True
         self.ui.update_start_button(True)
         
         # Bắt đầu đếm thời gian
         self.stats.start_timer()
         
-        # Bắt đầu automation
+        # Bắt đầu automation (lịch sử lesson theo khóa học đã nhập)
+        self.automation.set_course(self.ui.get_course())
         self.automation.start_automation()
         
         self.ui.log_message("Bắt đầu automation")
@@ -73,13 +167,23 @@ class AutoSICApp:
         self.ui.update_start_button(False)
         
         # Dừng automation
-        self.automation.stop_automation()
+        if self.automation:
+            self.automation.stop_automation()
         
         self.ui.log_message("Dừng automation")
     
+    def on_closing(self):
+        """Dừng automation, trả lại tài nguyên dùng chung (AssetManager, hàng đợi chuột) rồi đóng cửa sổ"""
+        if self.automation:
+            self.automation.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.root.destroy()
+    
     def auto_restart(self):
         """Tự động restart automation"""
         self.ui.log_message("🔄 Phát hiện lặp vô hạn! Tự động restart...")
+        self.stats.record_event('auto_restart')
         
         # Dừng automation hiện tại
         self.stop_automation()
@@ -89,14 +193,7 @@ class AutoSICApp:
     
     def update_stats(self, stat_type: str):
         """Cập nhật thống kê"""
-        if stat_type == 'lessons_clicked':
-            self.stats.increment_lessons_clicked()
-        elif stat_type == 'play_buttons_detected':
-            self.stats.increment_play_buttons_detected()
-        elif stat_type == 'refresh_clicks':
-            self.stats.increment_refresh_clicks()
-        elif stat_type == 'expand_clicks':
-            self.stats.increment_expand_clicks()
+        self.stats.record_stat(stat_type)
         
         # Cập nhật hiển thị
         self.update_stats_display()
@@ -115,28 +212,48 @@ class AutoSICApp:
             runtime
         )
         
+        # Các chỉ số dẫn xuất và sparkline (24 khoảng x 5 phút)
+        rates, sparklines = self.stats.get_dashboard([('lessons_clicked', 'count'), ('detection_time', 'mean')])
+        self.ui.update_rates_display(rates, sparklines)
+        
+        # Roll-up định kỳ ra đĩa
+        self.stats.maybe_rollup()
+        
         # Lên lịch cập nhật tiếp theo nếu đang chạy
         if self.is_running:
             self.root.after(5000, self.update_stats_display)  # Cập nhật mỗi 5 giây
 
+    def collect_metrics(self, writer):
+        """Gom metrics cho metrics endpoint"""
+        if not self.automation:
+            # Backend chưa load xong: chỉ có thống kê và loop detector
+            collect_app_metrics(writer, self.stats, self.loop_detector)
+            return
+        collect_app_metrics(writer, self.stats, self.loop_detector,
+                            self.automation.image_detector.asset_manager,
+                            self.automation.capture_pipeline, self.automation.stall_detector)
+    
     def test_detect(self):
         """Test các function detect"""
-        self.automation.test_detect()
+        if self.is_backend_ready():
+            self.automation.test_detect()
     
     def open_asset_manager(self):
         """Mở cửa sổ Asset Manager"""
+        if not self.is_backend_ready():
+            return
+        
         try:
             from components.asset_manager_ui import AssetManagerWindow
             
-            # Tạo cửa sổ Asset Manager
-            asset_manager_window = AssetManagerWindow(self.root, "Assets")
+            # Tạo cửa sổ Asset Manager dùng chung AssetManager với detector
+            asset_manager_window = AssetManagerWindow(self.root, "Assets",
+                                                      self.automation.image_detector.asset_manager)
             
             # Thiết lập callback khi asset được cập nhật
+            # (ImageDetector dùng chung AssetManager nên template mới có hiệu lực ở tick tiếp theo)
             def on_asset_updated(asset_key):
                 self.ui.log_message(f"📦 Asset '{asset_key}' đã được cập nhật")
-                # Reload asset trong automation core
-                if hasattr(self.automation, 'image_detector'):
-                    self.automation.image_detector.reload_asset(asset_key)
             
             asset_manager_window.set_asset_updated_callback(on_asset_updated)
             
@@ -151,6 +268,14 @@ class AutoSICApp:
         self.ui.log_message("🔄 Đã reset bộ đếm auto restart")
         self.update_stats_display()
     
+    def reset_playback_speed(self):
+        """Xóa vị trí nút tốc độ đã nhớ và số lần thất bại của khóa học đang nhập"""
+        if not self.is_backend_ready():
+            return
+        self.automation.set_course(self.ui.get_course())
+        self.automation.playback_speed.reset()
+        self.ui.log_message(f"🔄 Đã reset bộ nhớ tốc độ phát của khóa học '{self.automation.course}'")
+    
     def reset_stats(self):
         """Reset thống kê"""
         self.stats.reset_stats()
@@ -161,7 +286,16 @@ class AutoSICApp:
 def main():
     """Function chính để chạy ứng dụng"""
     root = tk.Tk()
-    app = AutoSICApp(root)
+    
+    # Bật metrics endpoint bằng biến môi trường AUTOSIC_METRICS_PORT (ví dụ 9464)
+    metrics_port = 0
+    try:
+        metrics_port = int(os.environ.get("AUTOSIC_METRICS_PORT", "0") or 0)
+    except ValueError:
+        print(f"⚠️ AUTOSIC_METRICS_PORT không hợp lệ: {os.environ.get('AUTOSIC_METRICS_PORT')!r}, bỏ qua metrics endpoint")
+    metrics_host = os.environ.get("AUTOSIC_METRICS_HOST", "127.0.0.1")
+    
+    app = AutoSICApp(root, metrics_port=metrics_port, metrics_host=metrics_host)
     root.mainloop()
 
 
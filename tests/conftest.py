@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Cấu hình pytest: thêm Src vào sys.path để import components.* giống như khi chạy main.py / headless.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Src"))
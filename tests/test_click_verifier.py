@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Test ClickVerifier: phát hiện trang thay đổi và timeout tự điều chỉnh theo thời gian phản hồi
+"""
+import numpy as np
+
+from components.click_verifier import ClickVerifier
+
+
+def test_detects_page_change():
+    """Trang chuyển sang video thì changed() = True, frame giống hệt thì False"""
+    verifier = ClickVerifier()
+    page = np.full((360, 640, 3), 230, dtype=np.uint8)
+    before = verifier.snapshot(page)
+    assert not verifier.changed(before, page.copy())
+    
+    video = page.copy()
+    video[40:320, 160:600] = 20
+    assert verifier.changed(before, video)
+
+
+def test_timeout_adapts_to_latency():
+    """Timeout = phân vị 90 x TIMEOUT_FACTOR, kẹp trong [MIN_TIMEOUT, MAX_TIMEOUT]"""
+    verifier = ClickVerifier()
+    assert verifier.get_timeout() == ClickVerifier.DEFAULT_TIMEOUT
+    
+    for _ in range(10):
+        verifier.record_attempt(True, 0.3)
+    assert verifier.get_timeout() == ClickVerifier.MIN_TIMEOUT
+    
+    for _ in range(ClickVerifier.HISTORY_SIZE):
+        verifier.record_attempt(True, 2.0)
+    assert verifier.get_timeout() == 2.0 * ClickVerifier.TIMEOUT_FACTOR
+    
+    for _ in range(ClickVerifier.HISTORY_SIZE):
+        verifier.record_attempt(True, 9.0)
+    assert verifier.get_timeout() == ClickVerifier.MAX_TIMEOUT
+
+
+def test_failed_lesson_counted_after_last_retry():
+    """Chỉ tính lesson không mở được khi lần click lại cuối cùng cũng thất bại"""
+    verifier = ClickVerifier()
+    for attempt in range(ClickVerifier.MAX_RETRIES + 1):
+        verifier.record_attempt(False, attempt=attempt)
+    verifier.record_attempt(True, 1.0)
+    
+    stats = verifier.get_stats()
+    assert stats['failed'] == 1
+    assert stats['retries'] == ClickVerifier.MAX_RETRIES
+    assert stats['first_try'] == 1
+    assert stats['success_rate'] == 1 / (ClickVerifier.MAX_RETRIES + 2)
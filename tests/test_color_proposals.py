@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Test ColorProposals: cửa sổ đề xuất theo màu không bỏ sót vị trí nào mà quét cả vùng tìm thấy
+"""
+import cv2
+import numpy as np
+
+from components.color_proposals import ColorProposals
+
+THRESHOLD = 0.8
+POSITIONS = [(40, 30), (300, 120), (420, 250)]
+
+
+def _template() -> np.ndarray:
+    """Icon tròn màu xanh có ký hiệu xám ở giữa trên nền trắng"""
+    template = np.full((28, 28, 3), 255, dtype=np.uint8)
+    cv2.circle(template, (14, 14), 11, (200, 120, 30), -1)
+    cv2.rectangle(template, (10, 12), (18, 16), (90, 90, 90), -1)
+    return template
+
+
+def _page(template: np.ndarray) -> np.ndarray:
+    """Trang có icon ở POSITIONS, chữ, khối màu khác và một vùng cùng màu nhưng quá lớn"""
+    page = np.full((320, 520, 3), 245, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    for y in range(10, 310, 18):
+        x = int(rng.integers(80, 200))
+        cv2.rectangle(page, (x, y), (x + int(rng.integers(40, 200)), y + 6), (30, 30, 30), -1)
+    cv2.rectangle(page, (200, 200), (260, 240), (40, 40, 220), -1)
+    cv2.rectangle(page, (330, 10), (500, 90), (200, 120, 30), -1)
+    height, width = template.shape[:2]
+    for x, y in POSITIONS:
+        page[y:y + height, x:x + width] = template
+    return page
+
+
+def test_windows_cover_every_full_scan_match():
+    """Mọi vị trí có score >= THRESHOLD khi quét cả vùng nằm trong một cửa sổ và có cùng score"""
+    proposals = ColorProposals()
+    template = _template()
+    page = _page(template)
+    height, width = template.shape[:2]
+    
+    windows = proposals.propose("icon", template, page, (0, 0, page.shape[1], page.shape[0]))
+    assert windows, "phải đề xuất được cửa sổ"
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in windows)
+    assert area <= page.shape[0] * page.shape[1] * ColorProposals.MAX_WINDOW_FRACTION
+    
+    full = cv2.matchTemplate(page, template, cv2.TM_CCOEFF_NORMED)
+    ys, xs = np.nonzero(full >= THRESHOLD)
+    assert {(x, y) for x, y in POSITIONS} <= set(zip(xs.tolist(), ys.tolist()))
+    
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        window = next((w for w in windows if w[0] <= x and w[1] <= y and x + width <= w[2] and y + height <= w[3]),
+                      None)
+        assert window is not None, f"vị trí ({x}, {y}) không nằm trong cửa sổ nào"
+        wx0, wy0, wx1, wy1 = window
+        local = cv2.matchTemplate(page[wy0:wy1, wx0:wx1], template, cv2.TM_CCOEFF_NORMED)
+        assert abs(local[y - wy0, x - wx0] - full[y, x]) < 1e-3
+
+
+def test_no_matching_color_means_no_template():
+    """Vùng không có pixel nào cùng màu icon thì chắc chắn không có template"""
+    proposals = ColorProposals()
+    page = np.full((200, 300, 3), 245, dtype=np.uint8)
+    cv2.rectangle(page, (20, 20), (120, 30), (30, 30, 30), -1)
+    assert proposals.propose("icon", _template(), page, (0, 0, 300, 200)) == []
+    assert proposals.get_stats()['empty'] == 1
+
+
+def test_too_many_candidates_falls_back_to_full_scan():
+    """Quá nhiều blob cùng màu thì quét cả vùng và tạm bỏ qua đề xuất trong FALLBACK_SKIP lần"""
+    proposals = ColorProposals()
+    template = _template()
+    page = np.full((320, 520, 3), 245, dtype=np.uint8)
+    for y in range(5, 315, 20):
+        for x in range(5, 515, 20):
+            cv2.circle(page, (x + 8, y + 8), 8, (200, 120, 30), -1)
+    
+    assert proposals.propose("icon", template, page, (0, 0, 520, 320)) is None
+    assert proposals.get_stats()['fallbacks'] == 1
+    assert proposals.propose("icon", template, page, (0, 0, 520, 320)) is None
+    assert proposals.get_stats()['skipped'] == 1
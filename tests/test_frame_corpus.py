@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Test FrameCorpus: ghi rồi đọc lại (keyframe + delta), mở lại file và ghi tiếp sau khi bị ngắt giữa chừng
+"""
+import numpy as np
+import pytest
+
+from components.frame_corpus import FrameCorpus
+
+
+def _frames(count: int, seed: int = 0):
+    """Chuỗi frame thay đổi từng vùng nhỏ (ghi dạng delta), thỉnh thoảng thay đổi cả frame (keyframe)"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, (90, 160, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = frame.copy()
+        if i % 12 == 11:
+            frame[:] = rng.integers(0, 256, frame.shape, dtype=np.uint8)
+        else:
+            y, x = rng.integers(0, 80), rng.integers(0, 150)
+            frame[y:y + 10, x:x + 10] = rng.integers(0, 256, (10, 10, 3), dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def test_round_trip(tmp_path):
+    """Frame đọc lại (tuần tự và ngẫu nhiên) giống hệt frame đã ghi"""
+    path = str(tmp_path / "corpus.bin")
+    frames = _frames(30)
+    corpus = FrameCorpus(path)
+    for i, frame in enumerate(frames):
+        assert corpus.append(frame, timestamp=1000.0 + i) == i
+    
+    stats = corpus.get_stats()
+    assert stats['deltas'] > 0 and stats['keyframes'] > 1
+    for expected, frame in zip(frames, corpus):
+        np.testing.assert_array_equal(frame, expected)
+    np.testing.assert_array_equal(corpus[17], frames[17])
+    np.testing.assert_array_equal(corpus[3], frames[3])
+    assert corpus.get_timestamp(5) == 1005.0
+    corpus.close()
+
+
+def test_reopen_and_append(tmp_path):
+    """Mở lại corpus đã đóng thì đọc được các frame cũ và ghi tiếp vào cuối"""
+    path = str(tmp_path / "corpus.bin")
+    frames = _frames(40)
+    corpus = FrameCorpus(path)
+    for frame in frames[:25]:
+        corpus.append(frame)
+    corpus.close()
+    
+    corpus = FrameCorpus(path)
+    assert len(corpus) == 25
+    for frame in frames[25:]:
+        corpus.append(frame)
+    corpus.close()
+    
+    corpus = FrameCorpus(path)
+    assert len(corpus) == 40
+    for expected, frame in zip(frames, corpus):
+        np.testing.assert_array_equal(frame, expected)
+    corpus.close()
+
+
+def test_torn_tail_is_truncated_before_append(tmp_path):
+    """Bản ghi dở ở cuối file index và file dữ liệu bị cắt bỏ, frame ghi tiếp vẫn đọc lại đúng"""
+    path = str(tmp_path / "corpus.bin")
+    frames = _frames(20)
+    corpus = FrameCorpus(path)
+    for frame in frames[:15]:
+        corpus.append(frame)
+    corpus.close()
+    
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 777)
+    with open(path + ".idx", "ab") as f:
+        f.write(b"\x02" * 5)
+    
+    corpus = FrameCorpus(path)
+    assert len(corpus) == 15
+    for frame in frames[15:]:
+        corpus.append(frame)
+    corpus.close()
+    
+    corpus = FrameCorpus(path)
+    assert len(corpus) == 20
+    for expected, frame in zip(frames, corpus):
+        np.testing.assert_array_equal(frame, expected)
+    corpus.close()
+
+
+def test_rejects_foreign_file(tmp_path):
+    """File không có header của frame corpus thì báo lỗi thay vì đọc sai"""
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a corpus file")
+    with pytest.raises(ValueError):
+        FrameCorpus(str(path))
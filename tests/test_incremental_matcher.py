@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Test IncrementalMatcher: tile thay đổi và score map tính một phần giống hệt matchTemplate toàn bộ
+"""
+import cv2
+import numpy as np
+
+from components.incremental_matcher import IncrementalMatcher
+
+# matchTemplate dùng DFT float32, kết quả trên cửa sổ con lệch cỡ 1e-5 so với trên toàn vùng
+SCORE_TOLERANCE = 1e-4
+
+
+def _region(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return cv2.GaussianBlur(rng.integers(0, 256, (200, 300, 3), dtype=np.uint8), (5, 5), 0)
+
+
+def test_dirty_tiles_marks_only_changed_tile():
+    """Một pixel thay đổi chỉ đánh dấu đúng tile chứa nó, kể cả tile lẻ ở mép"""
+    matcher = IncrementalMatcher()
+    previous = np.zeros((70, 100, 3), dtype=np.uint8)
+    current = previous.copy()
+    
+    dirty = matcher._dirty_tiles(previous, current)
+    assert dirty.shape == (3, 4)
+    assert not dirty.any()
+    
+    current[65, 40] = (0, 0, 1)
+    dirty = matcher._dirty_tiles(previous, current)
+    assert dirty.sum() == 1 and dirty[2, 1]
+    
+    current[5, 99] = (9, 9, 9)
+    dirty = matcher._dirty_tiles(previous, current)
+    assert dirty.sum() == 2 and dirty[0, 3]
+
+
+def test_partial_match_equals_full_match():
+    """Score map cập nhật một phần sau khi vùng thay đổi phải giống matchTemplate trên toàn vùng"""
+    matcher = IncrementalMatcher()
+    region = _region()
+    template = region[50:74, 80:100].copy()
+    
+    result = matcher.match("asset", "roi", region, template)
+    assert matcher.get_stats()['full'] == 1
+    
+    matcher.new_frame()
+    region[120:150, 200:240] = _region(1)[:30, :40]
+    result = matcher.match("asset", "roi", region, template)
+    assert matcher.get_stats()['partial'] == 1
+    np.testing.assert_allclose(result, cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED), atol=SCORE_TOLERANCE)
+    
+    # Không thay đổi thì dùng lại score map cũ
+    matcher.new_frame()
+    assert matcher.match("asset", "roi", region, template) is result
+    assert matcher.get_stats()['reused'] == 1
+
+
+def test_match_dirty_covers_template_footprint():
+    """_match_dirty tính lại mọi vị trí template chồng lên tile thay đổi, kể cả tile ở góc"""
+    matcher = IncrementalMatcher()
+    region = _region()
+    template = region[10:30, 10:40].copy()
+    result = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+    
+    region[:32, :32] = 255 - region[:32, :32]
+    region[192:, 288:] = 0
+    dirty = np.zeros((7, 10), dtype=bool)
+    dirty[0, 0] = dirty[6, 9] = True
+    matcher._match_dirty(region, template, cv2.TM_CCOEFF_NORMED, dirty, result)
+    np.testing.assert_allclose(result, cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED), atol=SCORE_TOLERANCE)
+
+
+def test_large_change_falls_back_to_full_match():
+    """Quá MAX_DIRTY_FRACTION tile thay đổi thì tính lại toàn bộ"""
+    matcher = IncrementalMatcher()
+    region = _region()
+    template = region[50:74, 80:100].copy()
+    matcher.match("asset", "roi", region, template)
+    
+    matcher.new_frame()
+    region[:] = _region(2)
+    result = matcher.match("asset", "roi", region, template)
+    assert matcher.get_stats()['full'] == 2
+    np.testing.assert_allclose(result, cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED), atol=SCORE_TOLERANCE)
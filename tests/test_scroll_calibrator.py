@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Test ScrollCalibrator: đo độ dịch chuyển bằng phase correlation và quy đổi pixel sang đơn vị scroll
+"""
+import json
+
+import cv2
+import numpy as np
+
+from components.scroll_calibrator import ScrollCalibrator
+
+
+def _page(seed: int = 0) -> np.ndarray:
+    """Trang outline dài có texture (đủ chi tiết để phase correlation bắt được độ dịch)"""
+    rng = np.random.default_rng(seed)
+    return cv2.GaussianBlur(rng.integers(0, 256, (900, 320, 3), dtype=np.uint8), (7, 7), 0)
+
+
+def test_measures_phase_shift():
+    """Nội dung dịch lên 24 pixel sau 12 đơn vị scroll: đo được 24 pixel, 2 pixel mỗi đơn vị"""
+    calibrator = ScrollCalibrator(calibration_path=None)
+    page = _page()
+    before = calibrator.strip(page[0:400], 160)
+    after = calibrator.strip(page[24:424], 160)
+    
+    shift = calibrator.observe(before, after, -12)
+    assert shift is not None and abs(shift - 24) < 1.0
+    assert abs(calibrator.pixels_per_unit - 2.0) < 0.1
+    assert calibrator.units_for_pixels(300) == 150
+
+
+def test_page_end_and_uncalibrated_defaults():
+    """Nội dung không dịch chuyển = hết trang; chưa hiệu chỉnh thì dùng PROBE_UNITS"""
+    calibrator = ScrollCalibrator(calibration_path=None)
+    strip = calibrator.strip(_page()[0:400], 160)
+    assert not calibrator.is_calibrated()
+    assert calibrator.page_units(400) == ScrollCalibrator.PROBE_UNITS
+    assert calibrator.observe(strip, strip.copy(), -12) == 0.0
+    assert calibrator.get_stats()['page_end'] == 1
+
+
+def test_skips_shift_too_large_to_measure():
+    """Độ dịch dự kiến quá MAX_MEASURE_FRACTION chiều cao dải thì không đo (tránh nhầm chu kỳ)"""
+    calibrator = ScrollCalibrator(calibration_path=None)
+    calibrator.samples = [10.0]
+    page = _page()
+    assert calibrator.observe(calibrator.strip(page[0:400], 160), calibrator.strip(page[200:600], 160), -20) is None
+    assert calibrator.get_stats()['unmeasured'] == 1
+
+
+def test_refines_with_short_scroll_after_page_scrolls():
+    """Sau REFINE_INTERVAL lần scroll cả trang không đo được thì scroll ngắn một lần để hiệu chỉnh lại"""
+    calibrator = ScrollCalibrator(calibration_path=None)
+    calibrator.samples = [1.5]  # Hiệu chỉnh cũ lệch (thực tế 2 pixel mỗi đơn vị)
+    page = _page()
+    
+    for _ in range(ScrollCalibrator.REFINE_INTERVAL):
+        units = calibrator.scroll_units(400)
+        assert units == calibrator.page_units(400)
+        assert calibrator.observe(calibrator.strip(page[0:400], 160), calibrator.strip(page[300:700], 160), -units) is None
+    
+    units = calibrator.scroll_units(400)
+    assert units == 67  # REFINE_FRACTION * 400 pixel theo hiệu chỉnh cũ
+    assert calibrator.scroll_units(400) == calibrator.page_units(400)
+    shift = calibrator.observe(calibrator.strip(page[0:400], 160), calibrator.strip(page[134:534], 160), -units)
+    assert shift is not None and abs(shift - 134) < 1.0
+    assert calibrator.get_stats()['refines'] == 1
+    assert abs(calibrator.pixels_per_unit - 1.75) < 0.05  # Trung vị của lần đo cũ và lần đo mới (2.0)
+
+
+def test_calibration_is_saved_per_session(tmp_path):
+    """Kết quả hiệu chỉnh lưu theo tên phiên, giữ nguyên kết quả của phiên khác"""
+    path = tmp_path / "scroll_calibration.json"
+    path.write_text(json.dumps({"other": [3.0]}), encoding="utf-8")
+    calibrator = ScrollCalibrator(name="main", calibration_path=str(path))
+    page = _page()
+    calibrator.observe(calibrator.strip(page[0:400], 160), calibrator.strip(page[30:430], 160), -10)
+    
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["other"] == [3.0]
+    assert abs(data["main"][0] - 3.0) < 0.1
+    assert ScrollCalibrator(name="main", calibration_path=str(path)).is_calibrated()
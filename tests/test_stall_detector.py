@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Test StallDetector: leo thang hành động khôi phục, khôi phục khi video chạy lại và yêu cầu dấu hiệu treo
+"""
+import numpy as np
+
+from components.stall_detector import StallDetector
+
+
+STILL = np.full((360, 640, 3), 100, dtype=np.uint8)
+
+
+def _moving(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, STILL.shape, dtype=np.uint8)
+
+
+def _run(detector: StallDetector, checks, progress=None, buffering=False):
+    """Kiểm tra frame đứng yên tại các thời điểm checks, thực hiện mọi hành động được chọn (thành công)"""
+    actions = []
+    for now in checks:
+        detector.observe(STILL, progress, buffering, now=now)
+        action = detector.next_action(now=now)
+        if action == "give_up":
+            actions.append(action)
+            detector.finish(recovered=False, now=now)
+        elif action:
+            actions.append(action)
+            detector.record_action(action, True, now=now)
+    return actions
+
+
+def test_moving_video_is_not_stalled():
+    """Vùng video thay đổi giữa các lần kiểm tra thì không bao giờ coi là đứng hình"""
+    detector = StallDetector(stall_timeout=30)
+    for i, now in enumerate(range(0, 300, 15)):
+        detector.observe(_moving(i), now=now)
+        assert detector.next_action(now=now) is None
+    assert not detector.is_still()
+    assert detector.get_stats()['stalls'] == 0
+
+
+def test_escalation_order_and_give_up():
+    """Tiến độ không tăng: leo thang theo RECOVERY_ACTIONS, cách nhau ACTION_GRACE, hết thì give_up"""
+    detector = StallDetector(stall_timeout=30)
+    actions = _run(detector, range(0, 110, 10), progress=0.4)
+    assert actions == ["click_video", "seek", "refresh", "give_up"]
+    
+    stats = detector.get_stats()
+    assert stats['stalls'] == 1 and stats['unrecovered'] == 1
+    assert stats['actions'] == {"click_video": 1, "seek": 1, "refresh": 1}
+
+
+def test_failed_action_escalates_at_next_check():
+    """Hành động không thực hiện được thì không phải đợi ACTION_GRACE"""
+    for ok, expected in ((True, None), (False, "seek")):
+        detector = StallDetector(stall_timeout=30)
+        for now in range(0, 40, 10):
+            detector.observe(STILL, 0.4, now=now)
+        assert detector.next_action(now=30) == "click_video"
+        detector.record_action("click_video", ok, now=30)
+        assert detector.next_action(now=31) == expected
+
+
+def test_recovery_is_recorded():
+    """Video chạy lại sau hành động khôi phục thì ghi nhận hành động đã khôi phục được"""
+    detector = StallDetector(stall_timeout=30)
+    assert _run(detector, range(0, 50, 10), progress=0.4) == ["click_video"]
+    
+    record = detector.observe(_moving(1), 0.4, now=60)
+    assert record is not None and record['recovered']
+    assert record['recovered_by'] == "click_video"
+    assert detector.get_stats()['recovered_by'] == {"click_video": 1}
+
+
+def test_reset_during_stall_is_not_a_recovery():
+    """Reset khi đang đứng hình (video kết thúc, lượt chạy mới) không được tính là đã khôi phục"""
+    detector = StallDetector(stall_timeout=30)
+    _run(detector, range(0, 50, 10), progress=0.4)
+    
+    detector.reset()
+    stats = detector.get_stats()
+    assert (stats['recovered'], stats['unrecovered'], stats['interrupted']) == (0, 0, 1)
+    assert not stats['stalled']
+
+
+def test_still_video_without_evidence_is_unconfirmed():
+    """Slide tĩnh không đọc được tiến độ, không thấy buffering: không khôi phục, chỉ đếm unconfirmed một lần"""
+    detector = StallDetector(stall_timeout=30)
+    assert _run(detector, range(0, 300, 15)) == []
+    stats = detector.get_stats()
+    assert stats['unconfirmed'] == 1 and stats['stalls'] == 0
+
+
+def test_buffering_is_evidence():
+    """Icon buffering xuất hiện muộn thì bắt đầu leo thang từ lúc đó"""
+    detector = StallDetector(stall_timeout=30)
+    actions = []
+    for now in range(0, 200, 10):
+        detector.observe(STILL, None, now >= 100, now=now)
+        action = detector.next_action(now=now)
+        if action:
+            actions.append((now, action))
+            detector.record_action(action, True, now=now)
+    assert actions[0] == (100, "click_video")
+    assert detector.get_stats()['evidence'] == ["buffering"]
+
+
+def test_recovery_without_evidence_when_not_required():
+    """require_evidence=False: hình đứng yên là đủ để khôi phục"""
+    detector = StallDetector(stall_timeout=30, require_evidence=False)
+    assert _run(detector, range(0, 50, 10))[0] == "click_video"
+
+
+def test_video_rect_uses_configured_roi():
+    """Vùng video theo pixel tính từ video_roi đã cấu hình"""
+    detector = StallDetector(video_roi=(0.5, 0.25, 0.5, 0.5))
+    assert detector.get_video_rect((400, 800, 3)) == (400, 100, 400, 200)
+    assert StallDetector().video_roi == StallDetector.VIDEO_ROI
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Test StatsManager: các chỉ số dẫn xuất từ ring buffer event
+"""
+import time
+
+from components.stats_manager import StatsManager
+
+
+def test_derived_rates():
+    """Lessons/giờ, độ trễ click, thời gian detect và tỉ lệ click thành công trong cửa sổ tính toán"""
+    stats = StatsManager(rollup_path=None)
+    now = time.time()
+    stats.stats['start_time'] = now - 1800
+    
+    stats.record_event('play_buttons_detected', timestamp=now - 600)
+    stats.record_event('lessons_clicked', timestamp=now - 590)
+    stats.record_event('play_buttons_detected', timestamp=now - 300)
+    stats.record_event('lesson_click_retries', timestamp=now - 296)
+    stats.record_event('lessons_clicked', timestamp=now - 290)
+    stats.record_event('lessons_clicked', timestamp=now - 100)
+    stats.record_event('auto_restart', timestamp=now - 50)
+    stats.record_event('detection_time', 0.2, timestamp=now - 40)
+    stats.record_event('detection_time', 0.4, timestamp=now - 30)
+    
+    rates = stats.get_derived_rates()
+    assert abs(rates['lessons_per_hour'] - 6.0) < 0.01
+    assert abs(rates['restarts_per_hour'] - 2.0) < 0.01
+    assert abs(rates['mean_click_latency'] - 10.0) < 1e-6
+    assert abs(rates['mean_detection_time'] - 0.3) < 1e-9
+    assert rates['click_success_rate'] == 0.75
+
+
+def test_rate_window_floor():
+    """Vừa bắt đầu chạy thì cửa sổ tính rate tối thiểu MIN_RATE_WINDOW (không thổi phồng lessons/giờ)"""
+    stats = StatsManager(rollup_path=None)
+    stats.start_timer()
+    stats.record_stat('lessons_clicked')
+    
+    assert stats.get_derived_rates()['lessons_per_hour'] <= 3600.0 / StatsManager.MIN_RATE_WINDOW
+    assert stats.stats['lessons_clicked'] == 1
+
+
+def test_window_excludes_old_events():
+    """Event ngoài cửa sổ không được tính"""
+    stats = StatsManager(rollup_path=None)
+    now = time.time()
+    stats.record_event('lessons_clicked', timestamp=now - 7200)
+    stats.record_event('lessons_clicked', timestamp=now - 60)
+    
+    assert abs(stats.get_derived_rates(window=3600.0)['lessons_per_hour'] - 1.0) < 0.01
+    assert stats.get_derived_rates(window=3600.0)['click_success_rate'] == 1.0
+
+
+def test_dashboard_matches_separate_queries_after_wraparound():
+    """get_dashboard() (một lần đọc) giống get_derived_rates() + get_sparkline(), kể cả khi ring buffer đã quay vòng"""
+    stats = StatsManager(capacity=64, rollup_path=None)
+    now = time.time()
+    for i in range(150):
+        event_type = ('play_buttons_detected', 'lessons_clicked', 'detection_time')[i % 3]
+        stats.record_event(event_type, 0.01 * i, timestamp=now - 3000 + 20 * i)
+    
+    assert len(stats.get_events()) == 64
+    rates, sparklines = stats.get_dashboard([('lessons_clicked', 'count'), ('detection_time', 'mean')])
+    assert rates == stats.get_derived_rates()
+    assert sparklines['lessons_clicked'] == stats.get_sparkline('lessons_clicked')
+    assert sparklines['detection_time'] == stats.get_sparkline('detection_time', mode='mean')
+    assert sum(sparklines['lessons_clicked']) == 21
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Test VideoScheduler.next_delay: ngủ đến ngay trước thời điểm kết thúc dự đoán rồi kiểm tra dày
+"""
+from components.video_scheduler import VideoScheduler
+
+
+def _scheduler() -> VideoScheduler:
+    return VideoScheduler(course="khoa1", history_path=None, default_interval=60.0)
+
+
+def test_default_interval_without_prediction():
+    """Chưa có lịch sử và tiến độ thì dùng default_interval"""
+    scheduler = _scheduler()
+    scheduler.start_lesson(now=0)
+    assert scheduler.next_delay(now=10) == 60.0
+    assert scheduler.prediction_source == "none"
+
+
+def test_history_prediction():
+    """Dự đoán theo lịch sử: ngủ tối đa MAX_SLEEP, thức trước LEAD_TIME, kiểm tra dày quanh thời điểm kết thúc"""
+    scheduler = _scheduler()
+    scheduler.history = {"khoa1": [580.0, 600.0, 620.0]}
+    scheduler.start_lesson(now=0)
+    
+    assert scheduler.next_delay(now=100) == VideoScheduler.MAX_SLEEP
+    assert scheduler.prediction_source == "history"
+    assert scheduler.next_delay(now=500) == 600 - 500 - VideoScheduler.LEAD_TIME
+    assert scheduler.next_delay(now=598) == VideoScheduler.TIGHT_INTERVAL
+    assert scheduler.next_delay(now=640) == VideoScheduler.TIGHT_INTERVAL
+    assert scheduler.next_delay(now=700) == 60.0
+
+
+def test_progress_rate_prediction_refines_early():
+    """Dự đoán theo tốc độ tiến độ: còn xa thì thức dậy sớm hơn (REFINE_FRACTION) để đọc lại tiến độ"""
+    scheduler = _scheduler()
+    scheduler.start_lesson(now=0)
+    scheduler.observe_progress(0.1, now=100)
+    scheduler.observe_progress(0.2, now=200)
+    
+    delay = scheduler.next_delay(now=900)
+    assert scheduler.prediction_source == "progress_rate"
+    assert abs(scheduler.predicted_end - 1000) < 1e-6
+    assert abs(delay - (100 - VideoScheduler.LEAD_TIME) * VideoScheduler.REFINE_FRACTION) < 1e-6
+
+
+def test_history_is_kept_per_course():
+    """Độ dài lesson lưu theo khóa học, đổi khóa học thì không dùng lịch sử của khóa khác"""
+    scheduler = _scheduler()
+    scheduler.start_lesson(now=0)
+    assert scheduler.finish_lesson(now=300) == 300
+    assert scheduler.get_expected_duration() == 300
+    
+    scheduler.set_course("khoa2")
+    assert scheduler.get_expected_duration() is None